@@ -0,0 +1,292 @@
+"""
+-----------------------------------------------------------------------------------------------------------------
+benchmark.py
+Programmer: Chris DeMolles
+
+Tested with Python 2.7.3
+
+This script times the main steps of counting a bug on a fixed set of reference genomes: a small archaeon
+(Nanoarchaeum equitans), a 4 MB bacterium (Caulobacter crescentus) and a yeast chromosome (Saccharomyces cerevisiae
+chromosome I). For each bug it times loading the genome (reading every base of it, since a memory-mapped genome is
+otherwise only read when it is first used), retrieving the RNA and intergenic DNA sequences, counting their 4-mers,
+and counting their perfect and 1-mismatch inverted repeats of stem-length 3 to 5. Each step is reported with its
+time, its throughput in bases per second and the peak resident memory of the process so far, along with a checksum
+of the counts, so a change that alters the results shows up as well as one that is slower.
+
+Every bug is run in a process of its own, so the memory of one does not count against the next, and with an empty
+result cache held in memory, so nothing counted earlier is reused. The bugs must be in the database (see
+buildDatabase.py). The results are written as JSON (benchmark.json in the data directory by default); pass
+--compare with the file of an earlier run to print the change in every time and any checksum that differs.
+
+Usage: python benchmark.py [--repeats N] [--output FILE] [--compare FILE] [--bug NAME ...]
+-----------------------------------------------------------------------------------------------------------------
+"""
+
+import argparse
+import database
+import hashlib
+import json
+import os
+import platform
+import resource
+import resultCache
+import subprocess
+import sys
+import time
+from bug import Bug
+
+# the reference bugs, by the label they are reported under
+REFERENCE_BUGS = [('small archaeon',   'Nanoarchaeum_equitans_Kin4_M_chromosome_complete_genome'),
+                  ('bacterium',        'Caulobacter_crescentus_CB15_chromosome_complete_genome'),
+                  ('yeast chromosome', 'Saccharomyces_cerevisiae_S288c_chromosome_I_complete_sequence')]
+
+# the steps, in the order they are run
+STAGES = ['load', 'retrieve', 'count_4mers', 'count_irs_perfect', 'count_irs_1_mismatch']
+
+STEM_MIN = 3
+STEM_MAX = 5
+
+DEFAULT_OUTPUT_FILE_NAME = 'benchmark.json'
+
+
+def main():
+
+    argumentParser = argparse.ArgumentParser(description='Times genome loading, sequence retrieval, 4-mer counting and inverted repeat counting on reference bugs.')
+    argumentParser.add_argument('--repeats', type=int, default=1, help='number of times each step is run; the fastest is reported (default: 1)')
+    argumentParser.add_argument('--output', help='JSON file to write the results to (default: ' + DEFAULT_OUTPUT_FILE_NAME + ' in the data directory)')
+    argumentParser.add_argument('--compare', help='JSON file of an earlier run to compare the results with')
+    argumentParser.add_argument('--bug', action='append', help='benchmark this bug instead of the reference bugs; may be given more than once')
+    argumentParser.add_argument('--single', help=argparse.SUPPRESS)
+    arguments = argumentParser.parse_args()
+
+    # a worker process runs one bug and hands its results back on standard output
+    if arguments.single is not None:
+        json.dump(benchmarkBug(arguments.single, arguments.repeats), sys.stdout)
+        return
+
+    if arguments.bug:
+        bugs = [(bugName, bugName) for bugName in arguments.bug]
+    else:
+        bugs = REFERENCE_BUGS
+
+    results = {'commit': gitCommit(),
+               'python': platform.python_version(),
+               'machine': platform.platform(),
+               'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+               'repeats': arguments.repeats,
+               'bugs': []}
+
+    for label, bugName in bugs:
+
+        print "Benchmarking", bugName, "..."
+
+        process = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--single', bugName, '--repeats', str(arguments.repeats)], stdout=subprocess.PIPE)
+        output  = process.communicate()[0]
+
+        if process.returncode != 0:
+            print "Failed benchmarking", bugName, "..."
+            results['bugs'].append({'label': label, 'bug': bugName, 'error': 'exit status ' + str(process.returncode)})
+            continue
+
+        bugResults          = json.loads(output)
+        bugResults['label'] = label
+
+        results['bugs'].append(bugResults)
+
+        printResults(bugResults)
+
+    outputFileName = arguments.output
+
+    if outputFileName is None:
+        outputFileName = os.path.join(database.getDataDirectory(), DEFAULT_OUTPUT_FILE_NAME)
+
+    outputFile = open(outputFileName, 'w')
+    json.dump(results, outputFile, indent=2, sort_keys=True)
+    outputFile.write('\n')
+    outputFile.close()
+
+    print "Results written to", outputFileName
+
+    if arguments.compare is not None:
+        compareFile = open(arguments.compare)
+        compareResults(json.load(compareFile), results)
+        compareFile.close()
+
+
+def benchmarkBug(bugName, repeats):
+
+    stages    = {}
+    checksums = {}
+
+    # the fastest of the repeats of each step is kept
+    def timeStage(stage, bases, function):
+
+        best = None
+
+        for repeat in xrange(repeats):
+
+            # start every repeat from an empty cache, so nothing is looked up instead of counted
+            resultCache.setCache(resultCache.ResultCache(None))
+
+            started = time.time()
+            result  = function()
+            seconds = time.time() - started
+
+            if best is None or seconds < best:
+                best = seconds
+
+        stages[stage] = {'seconds': best,
+                         'bases_per_second': bases / best if best > 0 else None,
+                         'peak_rss_kb': peakMemory()}
+
+        return result
+
+    # loading reads every base of the genome, so a memory-mapped genome is read here rather than by the
+    # first step that uses it; the checksum of the bases is kept like the checksums of the counts
+    def load():
+
+        bug = Bug(bugName)
+
+        return bug, hashlib.sha1(str(bug.genome)).hexdigest()
+
+    bug, checksums['load'] = timeStage('load', 0, load)
+
+    genomeBases = len(bug.genome)
+    stages['load']['bases_per_second'] = genomeBases / stages['load']['seconds'] if stages['load']['seconds'] > 0 else None
+
+    # retrieving includes cutting the bases of every sequence out of the genome
+    def retrieve():
+
+        sequences = {'RNA': bug.getRNA(), 'DNA': bug.getDNA()}
+
+        for type in sequences:
+            for sequence in sequences[type].itervalues():
+                sequence.sequence
+
+        return sequences
+
+    sequences = timeStage('retrieve', 0, retrieve)
+
+    sequenceBases = sum(len(sequence) for type in sequences for sequence in sequences[type].itervalues())
+    stages['retrieve']['bases_per_second'] = sequenceBases / stages['retrieve']['seconds'] if stages['retrieve']['seconds'] > 0 else None
+
+    def countFourMers():
+        return dict((type, bug.countMotifsBatch(type, 4, sequences[type])) for type in sequences)
+
+    fourMers = timeStage('count_4mers', sequenceBases, countFourMers)
+
+    rows = []
+
+    for type in sorted(fourMers):
+        keys, counts = fourMers[type]
+        for key, row in zip(keys, counts):
+            rows.append(type + ' ' + repr(key) + ' ' + ','.join(str(int(count)) for count in row))
+
+    checksums['count_4mers'] = checksum(rows)
+
+    for stage, mismatches in (('count_irs_perfect', 0), ('count_irs_1_mismatch', 1)):
+
+        def countInvertedRepeats():
+            return dict(((type, key), sequences[type][key].countInvertedRepeats(STEM_MIN, STEM_MAX, mismatches)) for type in sequences for key in sequences[type])
+
+        invertedRepeats = timeStage(stage, sequenceBases, countInvertedRepeats)
+
+        rows = [type + ' ' + repr(key) + ' ' + ','.join(str(invertedRepeats[(type, key)][length]) for length in xrange(STEM_MIN, STEM_MAX + 1)) for type, key in sorted(invertedRepeats)]
+
+        checksums[stage] = checksum(rows)
+
+    return {'bug': bugName,
+            'genome_bases': genomeBases,
+            'rna_sequences': len(sequences['RNA']),
+            'dna_sequences': len(sequences['DNA']),
+            'sequence_bases': sequenceBases,
+            'stages': stages,
+            'checksums': checksums,
+            'peak_rss_kb': peakMemory()}
+
+
+def peakMemory():
+
+    # the largest resident set of this process so far (in kilobytes on Linux, bytes on Mac OS X)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    if sys.platform == 'darwin':
+        peak //= 1024
+
+    return peak
+
+
+def checksum(rows):
+
+    digest = hashlib.sha1()
+
+    for row in rows:
+        digest.update(row + '\n')
+
+    return digest.hexdigest()
+
+
+def gitCommit():
+
+    try:
+        process = subprocess.Popen(['git', 'rev-parse', 'HEAD'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=os.path.dirname(os.path.abspath(__file__)))
+        commit  = process.communicate()[0].strip()
+    except OSError:
+        return None
+
+    if process.returncode != 0:
+        return None
+
+    return commit
+
+
+def printResults(bugResults):
+
+    print '  %d bases in the genome, %d RNA and %d DNA sequences (%d bases)' % (bugResults['genome_bases'], bugResults['rna_sequences'], bugResults['dna_sequences'], bugResults['sequence_bases'])
+
+    for stage in STAGES:
+
+        stageResults = bugResults['stages'][stage]
+
+        print '  %-22s %9.3f s %14s bases/s %10d KB peak' % (stage, stageResults['seconds'], formatRate(stageResults['bases_per_second']), stageResults['peak_rss_kb'])
+
+
+def formatRate(rate):
+
+    if rate is None:
+        return '-'
+
+    return '%.0f' % rate
+
+
+def compareResults(before, after):
+
+    print "Compared with", before.get('commit') or 'an earlier run', "..."
+
+    earlier = dict((bugResults['bug'], bugResults) for bugResults in before['bugs'] if 'error' not in bugResults)
+
+    for bugResults in after['bugs']:
+
+        if 'error' in bugResults or bugResults['bug'] not in earlier:
+            continue
+
+        earlierResults = earlier[bugResults['bug']]
+
+        print ' ', bugResults['bug']
+
+        for stage in STAGES:
+
+            seconds        = bugResults['stages'][stage]['seconds']
+            earlierSeconds = earlierResults['stages'][stage]['seconds']
+
+            if earlierSeconds > 0:
+                print '    %-22s %9.3f s -> %9.3f s (%+.1f%%)' % (stage, earlierSeconds, seconds, 100.0 * (seconds - earlierSeconds) / earlierSeconds)
+
+        # an earlier run may not have checksummed every stage
+        for stage in sorted(bugResults['checksums']):
+            if stage in earlierResults['checksums'] and bugResults['checksums'][stage] != earlierResults['checksums'][stage]:
+                print '    the counts of', stage, 'have changed'
+
+
+if __name__ == '__main__':
+    main()
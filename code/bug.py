@@ -10,9 +10,21 @@ to which it belongs, and whether it is single cellular or multicelluar.
 -----------------------------------------------------------------------------------------------------------------
 """
 
-import os, sqlite3
+from array import array
+import bisect, copy, os
+import database
+import fasta
+import genomeIndex
+import genomeStorage
+import instrumentation as INSTRUMENT
+import dnaFunctions as DNA
+import irFunctions as IR
+import kmerFunctions as KMER
+import parallelCounting
+import profileFunctions as PROFILE
+import resultCache
+from intervalIndex import IntervalIndex
 from sequence import Sequence
-from ConfigParser import SafeConfigParser
 
 
 class Bug(object):
@@ -23,42 +35,50 @@ class Bug(object):
         ==============================================================================================
         SUMMARY: Initializes bug object
         PRE: Expects name to be the name of a bug in the database of bugs
-        POST: Initializes a new bug object with name and genome based on that name
+        POST: Initializes a new bug object with name and genome based on that name; raises ValueError if
+              name is not in the database and IOError if its genome file cannot be read
         ==============================================================================================
         """
 
-        # use a parser to open the configuration file
-        parser = SafeConfigParser()
-        parser.read('config.ini')
+        with INSTRUMENT.stage('bug.config'):
 
-        # get the data directory from the configuration file
-        dataDirectory = os.path.join(parser.get('directories', 'root_dir'), parser.get('directories', 'data_subdir'))
+            # get the bug directory from the configuration file (parsed once per process)
+            bugDirectory = database.getBugDirectory()
 
-        # get the bug directory from the configuration file
-        bugDirectory  = os.path.join(dataDirectory, parser.get('directories', 'bug_subdir'))
+            # get the database file name and the name of the bug
+            self.databaseFileName = database.getDatabaseFileName()
 
-        # get the database file name and the name of the bug
-        self.databaseFileName = os.path.join(dataDirectory, parser.get('files', 'database_file_name'))
-        
-        # make a new connection to the database
-        dbConnection = sqlite3.connect(self.databaseFileName)
-        cursor = dbConnection.cursor()
-        
-        # query the database for the information about this bug
-        bugDataQuery = "SELECT name, type, subfolder, file_prefix, kingdom, cellular, category FROM organisms WHERE name = ?"
-        parameters = (name,)
+        with INSTRUMENT.stage('bug.database'):
+
+            # get the pooled connection to the database
+            dbConnection = database.getConnection(self.databaseFileName)
+            cursor = dbConnection.cursor()
+
+            # query the database for the information about this bug
+            bugDataQuery = "SELECT name, type, subfolder, file_prefix, kingdom, cellular, category FROM organisms WHERE name = ?"
+            parameters = (name,)
+
+            # execute the query
+            cursor.execute(bugDataQuery, parameters)
 
-        # execute the query
-        cursor.execute(bugDataQuery, parameters)
+            # fetch the results from this query (at most one row since name is a primary key)
+            bugData = cursor.fetchone()
 
-        # fetch the results from this query (at most one row since name is a primary key)
-        bugData = cursor.fetchone()
+        # the interval index of the sequences is built the first time getAnnotation is called
+        self.annotationIndex = None
+
+        # the .fna file of the genome (None once the genome no longer matches it, like a shuffled one)
+        self.genomeFileName = None
+
+        # the full-text index of the genome is loaded the first time a motif is queried
+        self.genomeIndex         = None
+        self.genomeIndexFileName = None
 
         # if the results are not None
         if bugData is not None:
 
             # retrieve the name of the file where the genome is stored
-            genomeFileName = os.path.join(bugDirectory + '/' + bugData[1].encode('ascii', 'ignore') + '/' + bugData[2].encode('ascii', 'ignore') + '/' + bugData[3].encode('ascii', 'ignore') + '.fna.oneline')
+            genomeFileName = os.path.join(bugDirectory + '/' + bugData[1].encode('ascii', 'ignore') + '/' + bugData[2].encode('ascii', 'ignore') + '/' + bugData[3].encode('ascii', 'ignore') + '.fna')
             
             # initialize the following data members of bug
             self.bugName  = bugData[0].encode('ascii', 'ignore')
@@ -66,14 +86,18 @@ class Bug(object):
             self.cellular = bugData[5]#.encode('ascii', 'ignore')
             self.group    = bugData[6]#.encode('ascii', 'ignore')
             self.genome   = Sequence(self.loadGenome(genomeFileName))
+
+            # remember the .fna file so the genome can also be streamed from it
+            self.genomeFileName = genomeFileName
+
+            # the full-text index of the genome is kept next to it
+            self.genomeIndexFileName = genomeFileName + '.fmi'
             
-        # otherwise, no results found, so the bug name must be incorrect
+        # otherwise, no results found, so the bug name must be incorrect; fail rather than leave a
+        # half-initialized bug behind
         else:
 
-            print 'Invalid bug name. Check to make sure the bug name is spelled correctly or its genome file exists in its directory.'
-        
-        # close the connection to the database
-        dbConnection.close()
+            raise ValueError('Invalid bug name ' + repr(name) + '. Check to make sure the bug name is spelled correctly.')
     #-----------------------------------------------------------------------------------------------------------------#
 
 
@@ -83,11 +107,11 @@ class Bug(object):
         ==============================================================================================
         SUMMARY: Overloads the string casting operator
         PRE: assigned(self.genome)
-        POST: Returns self.genome.sequence
+        POST: Returns self.genome.sequence as a string
         ==============================================================================================
         """
 
-        return self.genome.sequence
+        return str(self.genome)
     #-----------------------------------------------------------------------------------------------------------------#
 
 
@@ -123,20 +147,23 @@ class Bug(object):
 
 
     #-----------------------------------------------------------------------------------------------------------------#
+    @INSTRUMENT.timed('bug.getSequences')
     def getSequences(self, type):
         """
         ==============================================================================================
         SUMMARY: Retrieves a dictionary of sequences of a user-defined type (RNA or DNA)
         PRE: assigned(self.bugName), assigned(self.databaseName), assigned(type)
-        POST: Returns a dictionary with the starting position of the sequence as the key and the sequence as the value
+        POST: Returns a dictionary with the (starting position, ending position, strand) of the sequence as the
+              key and the sequence as the value; the sequences are views of the genome, so no bases are
+              read until they are used
         ==============================================================================================
         """
 
         # initialize an empty dictionary to hold the sequences
         sequences = {}
 
-        # connect to the database
-        dbConnection = sqlite3.connect(self.databaseFileName)
+        # get the pooled connection to the database
+        dbConnection = database.getConnection(self.databaseFileName)
 
         # make a database cursor
         cursor = dbConnection.cursor()
@@ -144,31 +171,29 @@ class Bug(object):
         # store the parameters for the query
         parameters = (self.bugName, type,)
 
-        # extract the sequence data from the database given the name of the bug and the type of sequence
-        sqlString = "SELECT sequence, starting_location, ending_location, strand, type, sequence_name FROM sequences WHERE organism_name = ? AND type = ?"
+        # extract the coordinates of the sequences from the database given the name of the bug and the type of
+        # sequence; the bases are cut out of the genome instead of read from the sequence column
+        sqlString = "SELECT starting_location, ending_location, strand, type, sequence_name FROM sequences WHERE organism_name = ? AND type = ?"
 
         # for each row in the result set
         for row in cursor.execute(sqlString, parameters):
     
             # assign the following attributes from the database values
-            sequenceStr = row[0].encode('ascii', 'ignore')
-            start       = row[1]
-            end         = row[2]
-            strand      = row[3].encode('ascii', 'ignore')
-            type        = row[4].encode('ascii', 'ignore')
-            name        = row[5]
+            start       = row[0]
+            end         = row[1]
+            strand      = row[2].encode('ascii', 'ignore')
+            type        = row[3].encode('ascii', 'ignore')
+            name        = row[4]
 
             if name is None or len(name) == 0:
                 name = 'unknown'
             else:
                 name = name.encode('ascii', 'ignore')
             
-            # create a new sequence object with the attributes above
-            sequence = Sequence(sequenceStr, start, end, strand, type, name)
-            sequences[start] = sequence
-
-        # close the connection to the database
-        dbConnection.close()
+            # create a new view of the genome with the attributes above; features that share a starting
+            # location (on different strands, or ending elsewhere) are all kept
+            sequence = Sequence.fromGenome(self.genome.sequence, start, end, strand, type, name)
+            sequences[(start, end, strand)] = sequence
 
         return sequences
     #-----------------------------------------------------------------------------------------------------------------#
@@ -187,8 +212,8 @@ class Bug(object):
         # initialize an empty dictionary to hold the sequences
         sequences = {}
 
-        # connect to the database
-        dbConnection = sqlite3.connect(self.databaseFileName)
+        # get the pooled connection to the database
+        dbConnection = database.getConnection(self.databaseFileName)
 
         # make a new database cursor
         cursor = dbConnection.cursor()
@@ -196,32 +221,28 @@ class Bug(object):
         # store the parameters for the query
         parameters = (self.bugName, 'RNA',)
 
-        # extract the sequence data from the database given the name of the bug and the type of sequence
-        sqlString = "SELECT sequence, starting_location, ending_location, strand, type, sequence_name FROM sequences WHERE organism_name = ? AND type = ? GROUP BY sequence_name"
+        # extract the coordinates of the sequences from the database given the name of the bug and the type of sequence
+        sqlString = "SELECT starting_location, ending_location, strand, type, sequence_name FROM sequences WHERE organism_name = ? AND type = ? GROUP BY sequence_name"
 
         # for each row in the result set
         for row in cursor.execute(sqlString, parameters):
 
             # assign the following attributes from the database values
-            sequenceStr = row[0].encode('ascii', 'ignore')
-            start       = row[1]
-            end         = row[2]
-            strand      = row[3].encode('ascii', 'ignore')
-            type        = row[4].encode('ascii', 'ignore')
-            name        = row[5]
+            start       = row[0]
+            end         = row[1]
+            strand      = row[2].encode('ascii', 'ignore')
+            type        = row[3].encode('ascii', 'ignore')
+            name        = row[4]
 
             if name is None or name == '':
                 name = 'unknown'
             else:
                 name = name.encode('ascii', 'ignore')
             
-            # create a new sequence object with the attributes above
-            sequence = Sequence(sequenceStr, start, end, strand, type, name)
+            # create a new view of the genome with the attributes above
+            sequence = Sequence.fromGenome(self.genome.sequence, start, end, strand, type, name)
             sequences[name] = sequence
 
-        # close the connection to the database
-        dbConnection.close()
-
         return sequences
     #-----------------------------------------------------------------------------------------------------------------#
 
@@ -232,7 +253,8 @@ class Bug(object):
         ==============================================================================================
         SUMMARY: Retrieves a dictionary of sequences of the RNA in this bug
         PRE: assigned(self.bugName), assigned(self.databaseName)
-        POST: Returns a dictionary with the starting position of the sequence as the key and the sequence as the value
+        POST: Returns a dictionary with the (starting position, ending position, strand) of the sequence as the
+              key and the sequence as the value
         ==============================================================================================
         """
 
@@ -246,7 +268,8 @@ class Bug(object):
         ==============================================================================================
         SUMMARY: Retrieves a dictionary of sequences of integenic DNA in this bug
         PRE: assigned(self.bugName), assigned(self.databaseName)
-        POST: Returns a dictionary with the starting position of the sequence as the key and the sequence as the value
+        POST: Returns a dictionary with the (starting position, ending position, strand) of the sequence as the
+              key and the sequence as the value
         ==============================================================================================
         """
 
@@ -255,71 +278,264 @@ class Bug(object):
 
 
     #-----------------------------------------------------------------------------------------------------------------#
-    def getAnnotation(self, start, end):
+    @INSTRUMENT.timed('bug.countMotifsBatch', bases=lambda self, type, k, sequences=None: sum(len(sequence) for sequence in sequences.itervalues()) if sequences is not None else 0)
+    def countMotifsBatch(self, type, k, sequences=None):
+        """
+        ==============================================================================================
+        SUMMARY: Counts the motifs of length k in all the sequences of a user-defined type (RNA or DNA) at once
+        PRE: assigned(self.bugName), assigned(self.databaseName), assigned(type), assigned(k), optional(sequences)
+             (a dictionary returned by getSequences(type), to avoid querying the database again)
+        POST: Returns a list of the keys of the sequences and an array with one row of 4^k motif counts
+              per key, in the order of dnaFunctions.allPossibleMotifs(k); sequences counted before are
+              looked up in the result cache
+        ==============================================================================================
+        """
+
+        # get the sequences from the database if they were not passed in
+        if sequences is None:
+            sequences = self.getSequences(type)
+
+        # fix the order of the rows (by location)
+        keys = sorted(sequences.keys())
+
+        # look every sequence up in the result cache first
+        cache = resultCache.getCache()
+        rows  = [cache.get('countKmers', (k,), sequences[key]) for key in keys]
+
+        missing = [i for i in xrange(len(keys)) if rows[i] is None]
+
+        # count the rest in one pass instead of one loop per sequence
+        if len(missing) > 0:
+
+            counted = KMER.countKmersBatch([sequences[keys[i]] for i in missing], k)
+
+            for i, row in zip(missing, counted):
+                rows[i] = [int(count) for count in row]
+                cache.put('countKmers', (k,), sequences[keys[i]], rows[i])
+
+        # hand back the same kind of array countKmersBatch does
+        if KMER.numpy is not None:
+            counts = KMER.numpy.array(rows, dtype=KMER.numpy.int64).reshape(len(keys), 4 ** k)
+        else:
+            counts = [array(KMER.CODE_TYPE, row) for row in rows]
+
+        return keys, counts
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def getAnnotation(self, start, end, sequences=True):
         """
         ==============================================================================================
         SUMMARY: Gets a list of sequences between start and end to prepare for annotation
-        PRE: assigned(self.bugName), assigned(self.databaseName), assigned(start), assigned(end)
-        POST: Returns a list of sequences between start and end
+        PRE: assigned(self.bugName), assigned(self.databaseName), assigned(start), assigned(end), optional(sequences)
+        POST: Returns a list of sequences between start and end, ordered by starting and ending location;
+              if sequences is False, returns (start, end, strand, type, name) tuples instead, without
+              cutting any sequence out of the genome
         ==============================================================================================
         """
 
+        # build the interval index the first time an annotation is asked for
+        if self.annotationIndex is None:
+            self.annotationIndex = self.buildAnnotationIndex()
+
+        # find the features overlapping start to end
+        features = self.annotationIndex.query(start, end)
+
+        # if only the coordinates are wanted, we are done
+        if not sequences:
+            return features
+
         # make a blank list to hold the sequences for annotation
         annotationList = []
 
-        # connect to the database
-        dbConnection = sqlite3.connect(self.databaseFileName)
+        for featureStart, featureEnd, strand, type, name in features:
+
+            # create a new view of the genome with the attributes above; the bases are only cut out
+            # when they are used
+            sequence = Sequence.fromGenome(self.genome.sequence, featureStart, featureEnd, strand, type, name)
+
+            # add the sequence to the list
+            annotationList.append(sequence)
+
+        return annotationList
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def buildAnnotationIndex(self):
+        """
+        ==============================================================================================
+        SUMMARY: Builds an interval index of every sequence of this bug
+        PRE: assigned(self.bugName), assigned(self.databaseName)
+        POST: Returns an IntervalIndex whose values are (start, end, strand, type, name) tuples
+        ==============================================================================================
+        """
+
+        # make a blank list to hold the intervals
+        intervals = []
+
+        # get the pooled connection to the database
+        dbConnection = database.getConnection(self.databaseFileName)
 
         # make a new database cursor
         cursor = dbConnection.cursor()
 
         # store the parameters for the query
-        parameters = (self.bugName, start, end, start, end, start, end)
+        parameters = (self.bugName,)
 
-        # for each row in the result set
-        for row in cursor.execute("SELECT sequence, starting_location, ending_location, strand, type, sequence_name FROM sequences WHERE organism_name = ? AND (((? BETWEEN starting_location AND ending_location) OR (? BETWEEN starting_location AND ending_location)) OR ((starting_location BETWEEN ? AND ?) OR (ending_location BETWEEN ? AND ?))) ORDER BY starting_location, ending_location", parameters):
+        # only the coordinates are read; the sequences themselves are cut from the genome on demand
+        for row in cursor.execute("SELECT starting_location, ending_location, strand, type, sequence_name FROM sequences WHERE organism_name = ?", parameters):
 
             # assign the following attributes from the database values
-            sequenceStr = row[0].encode('ascii', 'ignore')
-            start       = row[1]
-            end         = row[2]
-            strand      = row[3].encode('ascii', 'ignore')
-            type        = row[4].encode('ascii', 'ignore')
-            name        = row[5]
+            start  = row[0]
+            end    = row[1]
+            strand = row[2].encode('ascii', 'ignore')
+            type   = row[3].encode('ascii', 'ignore')
+            name   = row[4]
 
             if name is None:
                 name = 'unknown'
             else:
                 name = name.encode('ascii', 'ignore')
-            
-            # create a new sequence object with the attributes above
-            sequence = Sequence(sequenceStr, start, end, strand, type, name)
 
-            # add the sequence to the list
-            annotationList.append(sequence)
+            intervals.append((start, end, (start, end, strand, type, name)))
 
-        # close the connection to the database
-        dbConnection.close()
+        return IntervalIndex(intervals)
+    #-----------------------------------------------------------------------------------------------------------------#
 
-        return annotationList
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def getSequenceText(self, start, end, strand):
+        """
+        ==============================================================================================
+        SUMMARY: Cuts a sequence out of the genome
+        PRE: assigned(self.genome), assigned(start), assigned(end), assigned(strand)
+        POST: Returns the bases from start to end (inclusive, 1-based, across the origin if start > end),
+              reverse complemented if strand is '-'
+        ==============================================================================================
+        """
+
+        return Sequence.fromGenome(self.genome.sequence, start, end, strand).sequence
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def getGenomeIndex(self):
+        """
+        ==============================================================================================
+        SUMMARY: Returns the full-text index of the genome
+        PRE: assigned(self.genome), assigned(self.genomeIndexFileName)
+        POST: Returns the genomeIndex.GenomeIndex of the genome, memory-mapped from the .fna.fmi file next to
+              the genome (built the first time it is needed, or in memory for a shuffled genome) and kept
+              for later queries
+        ==============================================================================================
+        """
+
+        if self.genomeIndex is None:
+            self.genomeIndex = genomeIndex.loadIndex(self.genome.sequence, self.genomeIndexFileName)
+
+        return self.genomeIndex
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def countMotif(self, motif, mismatches=0):
+        """
+        ==============================================================================================
+        SUMMARY: Counts the occurrences of a motif of any length on both strands of the genome
+        PRE: assigned(self.genome), assigned(motif), optional(mismatches)
+        POST: Returns a dictionary with the strand ('+' or '-') as the key and the value as the number of
+              locations where that strand matches motif with up to mismatches mismatches
+        ==============================================================================================
+        """
+
+        index = self.getGenomeIndex()
+
+        # the motif occurs on the - strand wherever its reverse complement occurs on the + strand
+        return {'+': index.count(motif, mismatches),
+                '-': index.count(DNA.reverseComplement(motif), mismatches)}
     #-----------------------------------------------------------------------------------------------------------------#
 
 
     #-----------------------------------------------------------------------------------------------------------------#
-    def shuffle(self):
+    def locateMotif(self, motif, mismatches=0):
+        """
+        ==============================================================================================
+        SUMMARY: Finds the occurrences of a motif of any length on both strands of the genome
+        PRE: assigned(self.genome), assigned(motif), optional(mismatches)
+        POST: Returns a dictionary with the strand ('+' or '-') as the key and the value as a sorted array
+              of the locations (1-based, on the + strand) of the first base of every match of motif with
+              up to mismatches mismatches; on the - strand, that is the first base of the reverse
+              complement of the match
+        ==============================================================================================
+        """
+
+        index = self.getGenomeIndex()
+
+        return {'+': index.locate(motif, mismatches),
+                '-': index.locate(DNA.reverseComplement(motif), mismatches)}
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def locateInvertedRepeats(self, motif, mismatches=0, maxLoop=None):
+        """
+        ==============================================================================================
+        SUMMARY: Finds the potential inverted repeats of the genome whose first stem is a motif of any length
+        PRE: assigned(self.genome), assigned(motif), optional(mismatches), optional(maxLoop)
+        POST: Returns a sorted list of (first, second) pairs of locations (1-based): motif starts at first
+              and a reverse complement of motif (with up to mismatches mismatches) starts at second,
+              after the end of the first stem and, if maxLoop is given, at most maxLoop bases after it
+        ==============================================================================================
+        """
+
+        index = self.getGenomeIndex()
+
+        # only the two stems are looked up, so long stems do not need every k-mer of the genome
+        firstStems  = index.locate(motif)
+        secondStems = index.locate(DNA.reverseComplement(motif), mismatches)
+
+        pairs = []
+
+        for first in firstStems:
+
+            start = bisect.bisect_left(secondStems, first + len(motif))
+
+            if maxLoop is None:
+                stop = len(secondStems)
+            else:
+                stop = bisect.bisect_right(secondStems, first + len(motif) + maxLoop)
+
+            for second in secondStems[start:stop]:
+                pairs.append((first, second))
+
+        return pairs
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def shuffle(self, seed=None, dinucleotide=False):
         """
         ==============================================================================================
         SUMMARY: Duplicates this bug and shuffles the genome of the new bug
-        PRE: assigned(self.bugName), assigned(self.databaseName), assigned(start), assigned(end)
-        POST: Returns a list of sequences between start and end
+        PRE: assigned(self.genome), optional(seed), optional(dinucleotide)
+        POST: Returns a copy of this bug whose genome is shuffled (see Sequence.shuffle); the database
+              is not queried and the genome is not loaded again
         ==============================================================================================
         """
 
-        # make a new bug object with the same information as this bug
-        shuffledBug = Bug(self.bugName)
+        # make a new bug object sharing this bug's information (and annotation index)
+        shuffledBug = copy.copy(self)
 
         # shuffle the new bug's genome
-        shuffledBug.genome = shuffledBug.genome.shuffle()
+        shuffledBug.genome = self.genome.shuffle(seed, dinucleotide)
+
+        # the files of the genome on disk do not fit the shuffled one, which is streamed and indexed
+        # from memory
+        shuffledBug.genomeFileName      = None
+        shuffledBug.genomeIndex         = None
+        shuffledBug.genomeIndexFileName = None
 
         return shuffledBug
     #-----------------------------------------------------------------------------------------------------------------#
@@ -346,7 +562,7 @@ class Bug(object):
         print ''
 
         # for each RNA in the genome
-        for rnaName, sequence in rna.iteritems():
+        for sequence in rna.itervalues():
 
             # count the number of potential perfect inverted repeats of stem-length 3 and 4
             perfectIRs = sequence.countInvertedRepeats(3, 4, 0)
@@ -361,7 +577,7 @@ class Bug(object):
                 strand = 'indirect'
 
             # print the report to the console
-            print 'There is a', rnaName, 'RNA on the', strand, 'strand that begins at', sequence.start, 'and ends at', sequence.end
+            print 'There is a', sequence.name, 'RNA on the', strand, 'strand that begins at', sequence.start, 'and ends at', sequence.end
             print 'The length of the sequence is', len(sequence)
             print 'The ratio of potential perfect IRs of length 6 to the length of the sequence is', perfectIRs[3]
             print 'The ratio of potential perfect IRs of length 8 to the length of the sequence is', perfectIRs[4]
@@ -370,7 +586,7 @@ class Bug(object):
             print ''
 
         # for each intergenic DNA in the genome
-        for dnaStart, sequence in dna.iteritems():
+        for sequence in dna.itervalues():
 
             # count the number of potential perfect inverted repeats of stem-length 3 and 4
             perfectIRs = sequence.countInvertedRepeats(3, 4, 0)
@@ -398,29 +614,125 @@ class Bug(object):
 
 
     #-----------------------------------------------------------------------------------------------------------------#
+    @INSTRUMENT.timed('bug.loadGenome')
     def loadGenome(self, genomeFileName):
         """
         ==============================================================================================
         SUMMARY: Loads the bug's genome from genomeFileName
-        PRE: assigned(genomeFileName)
-        POST: Stores the bug's genome in a string
+        PRE: assigned(genomeFileName) (the .fna file of the bug)
+        POST: Returns the bug's genome as loaded by genomeStorage.loadGenome
+        ==============================================================================================
+        """
+
+        return genomeStorage.loadGenome(genomeFileName)
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def genomeChunks(self, chunkSize=1048576, margin=0):
+        """
+        ==============================================================================================
+        SUMMARY: Reads the bug's genome in overlapping chunks
+        PRE: optional(self.genomeFileName), optional(chunkSize), optional(margin)
+        POST: Returns an iterator of fasta.FastaChunks, streamed from the .fna file (one or more
+              records) if it exists, otherwise cut from self.genome as a single record
+        ==============================================================================================
+        """
+
+        if self.genomeFileName is not None:
+
+            fastaFileName = genomeStorage.findFasta(self.genomeFileName)
+
+            if os.path.exists(fastaFileName):
+                return fasta.readChunks(fastaFileName, chunkSize, margin)
+
+        return fasta.splitChunks(self.genome.sequence, chunkSize, margin)
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def genomeRecordLengths(self):
+        """
+        ==============================================================================================
+        SUMMARY: Counts the bases of every record of the bug's genome
+        PRE: optional(self.genomeFileName)
+        POST: Returns a list with the number of bases of each record of the .fna file, in the order they
+              are laid end to end in self.genome, or the length of self.genome if there is no .fna file
         ==============================================================================================
         """
 
-        # open genomeFileName
-        f = open(genomeFileName)
+        if self.genomeFileName is not None:
+
+            fastaFileName = genomeStorage.findFasta(self.genomeFileName)
+
+            if os.path.exists(fastaFileName):
+                return fasta.recordLengths(fastaFileName)
+
+        return [len(self.genome)]
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def countGenomeMotifs(self, k, chunkSize=1048576, workers=1):
+        """
+        ==============================================================================================
+        SUMMARY: Counts the motifs of length k in the whole genome without holding it in memory
+        PRE: assigned(self.genome), assigned(k), optional(chunkSize), optional(workers) (the number
+             of processes that count the chunks; more than 1 counts the chunks of self.genome in parallel)
+        POST: Returns an array of 4^k motif counts in the order of dnaFunctions.allPossibleMotifs(k)
+        ==============================================================================================
+        """
 
-        # read the contents of the file and store it in genomeStr
-        genomeStr = f.readline()
+        if workers > 1:
+            return parallelCounting.countKmersInParallel(self.genome.sequence, k, workers, self.genomeRecordLengths(), chunkSize)
+
+        return KMER.countKmersInChunks(self.genomeChunks(chunkSize, k - 1), k)
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def countGenomeInvertedRepeats(self, min, max, mismatches, type='pairings', chunkSize=1048576, workers=1):
+        """
+        ==============================================================================================
+        SUMMARY: Counts the potential inverted repeats in the whole genome without holding it in memory
+        PRE: assigned(self.genome), assigned(min), assigned(max), assigned(mismatches),
+             optional(type), optional(chunkSize), optional(workers) (as for countGenomeMotifs)
+        POST: Returns a dictionary with the key as the stem-length of the IR and the value as the
+              number of IRs of that stem-length ('pairings') or the number of bases covered by
+              IRs of that stem-length ('nucleotides')
+        ==============================================================================================
+        """
+
+        if workers > 1:
+            return parallelCounting.countInvertedRepeatsInParallel(self.genome.sequence, min, max, mismatches, workers, type, self.genomeRecordLengths(), chunkSize)
+
+        margin = 2 * max - 2
+
+        return IR.countInvertedRepeatsInChunks(lambda: self.genomeChunks(chunkSize, margin), min, max, mismatches, type)
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def profileGenome(self, window, step, k=4, min=3, max=5, mismatches=0):
+        """
+        ==============================================================================================
+        SUMMARY: Profiles the whole genome along its length with a sliding window
+        PRE: assigned(self.genome), assigned(window), assigned(step), optional(k), optional(min), optional(max),
+             optional(mismatches)
+        POST: Returns two arrays: the 4^k k-mer counts of each window (see profileFunctions.profileKmers)
+              and the number of potential inverted repeats of stem-length min to max in each window
+              (see profileFunctions.profileInvertedRepeats)
+        ==============================================================================================
+        """
 
-        # strip any whitespace from the string
-        genomeStr = genomeStr.strip()
+        # encode every motif length in the same pass over the genome
+        shortest = k if k < min else min
+        longest  = k if k > max else max
 
-        # remove the first character from the string (there is a bogus 'X' character at the beginning of the string)
-        genomeStr = genomeStr[1:]
+        codes = KMER.encodeKmerRange(self.genome.sequence, shortest, longest)
 
-        # close the file
-        f.close()
+        kmerProfile = PROFILE.profileKmers(codes[k], k, window, step)
+        irProfile   = PROFILE.profileInvertedRepeats(codes, min, max, mismatches, window, step)
 
-        return genomeStr
+        return kmerProfile, irProfile
     #-----------------------------------------------------------------------------------------------------------------#
@@ -0,0 +1,299 @@
+"""
+-----------------------------------------------------------------------------------------------------------------
+buildDatabase.py
+Programmer: Chris DeMolles
+
+Tested with Python 2.7.3
+
+This script builds the organisms and sequences tables of the genomics database from the bug directory. Every
+<kingdom>/<organism>/<prefix>.ptt and .rnt pair is one organism, named by its file prefix. The RNA sequences are
+the features of the .rnt table (reverse complemented on the - strand) and the intergenic DNA sequences are the gaps
+between the features of both tables, read from the + strand of the genome (<prefix>.fna).
+
+Organisms are parsed in parallel by worker processes; the main process is the only writer, and inserts their rows
+with executemany in large transactions. The size and modification time of each organism's files are stored in the
+sources table, so a later run only rebuilds the organisms whose files have changed (and removes the ones whose files
+are gone). The indexes used by Bug are created at the end.
+
+Usage: python buildDatabase.py [--workers N] [--force]
+-----------------------------------------------------------------------------------------------------------------
+"""
+
+import argparse
+import database
+import genomeStorage
+import multiprocessing
+import os
+import traceback
+import dnaFunctions as DNA
+
+# tables of the database; cellular and category cannot be found from the files, so they are left for the user
+SCHEMA = ["CREATE TABLE IF NOT EXISTS organisms (name TEXT PRIMARY KEY, type TEXT, subfolder TEXT, file_prefix TEXT, kingdom TEXT, cellular TEXT, category TEXT)",
+          "CREATE TABLE IF NOT EXISTS sequences (organism_name TEXT, sequence TEXT, starting_location INTEGER, ending_location INTEGER, strand TEXT, type TEXT, sequence_name TEXT)",
+          "CREATE TABLE IF NOT EXISTS sources (organism_name TEXT PRIMARY KEY, fingerprint TEXT)"]
+
+# Bug.getSequences and Bug.getUniqueRNA look sequences up by organism and type (and group by name), and
+# Bug.getAnnotation reads every sequence of one organism
+INDEXES = {'sequences_organism_type': "CREATE INDEX IF NOT EXISTS sequences_organism_type ON sequences (organism_name, type, sequence_name)",
+           'organisms_kingdom':       "CREATE INDEX IF NOT EXISTS organisms_kingdom ON organisms (kingdom)"}
+
+# number of rows inserted before the transaction is committed
+TRANSACTION_ROWS = 200000
+
+# the annotation tables start with a title, a count and the column names
+ANNOTATION_HEADER_LINES = 3
+
+# the files of an organism that its rows are built from
+SOURCE_EXTENSIONS = ['.fna', '.fna.gz', '.ptt', '.rnt']
+
+
+def main():
+
+    argumentParser = argparse.ArgumentParser(description='Builds the organisms and sequences tables from the .ptt and .rnt files in the bug directory.')
+    argumentParser.add_argument('--workers', type=int, default=1, help='number of processes parsing organisms in parallel (default: 1)')
+    argumentParser.add_argument('--force', action='store_true', help='rebuild every organism, even if its files are unchanged')
+    arguments = argumentParser.parse_args()
+
+    dbConnection = database.connectForWriting()
+
+    for statement in SCHEMA:
+        dbConnection.execute(statement)
+
+    if arguments.force:
+
+        # rebuilding everything is faster without the indexes, which are created again at the end
+        for indexName in INDEXES:
+            dbConnection.execute("DROP INDEX IF EXISTS " + indexName)
+
+        dbConnection.execute("DELETE FROM sequences")
+        dbConnection.execute("DELETE FROM sources")
+        dbConnection.commit()
+
+    organisms = findOrganisms(database.getBugDirectory())
+
+    # the fingerprints of the files each organism was last built from
+    builtFingerprints = dict(dbConnection.execute("SELECT organism_name, fingerprint FROM sources").fetchall())
+
+    # forget the organisms whose files are gone
+    names = set(organism[0] for organism in organisms)
+
+    for name in sorted(builtFingerprints):
+        if name not in names:
+            print "Removing", name, "..."
+            removeOrganism(dbConnection, name)
+
+    dbConnection.commit()
+
+    changed = [organism for organism in organisms if builtFingerprints.get(organism[0]) != organism[5]]
+
+    print "Building", len(changed), "of", len(organisms), "organisms ..."
+
+    if arguments.workers > 1:
+        pool    = multiprocessing.Pool(arguments.workers)
+        results = pool.imap_unordered(buildOrganism, changed, 1)
+    else:
+        pool    = None
+        results = (buildOrganism(organism) for organism in changed)
+
+    failed      = []
+    pendingRows = 0
+
+    for organism, rows, error in results:
+
+        name = organism[0]
+
+        if error is not None:
+            print "Failed building", name, "..."
+            print error
+            failed.append(name)
+            continue
+
+        insertOrganism(dbConnection, organism, rows)
+
+        print "Done building", name, "(" + str(len(rows)), "sequences) ..."
+
+        # commit in large batches; an organism's rows and fingerprint always land in the same transaction
+        pendingRows += len(rows)
+
+        if pendingRows >= TRANSACTION_ROWS:
+            dbConnection.commit()
+            pendingRows = 0
+
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+    dbConnection.commit()
+
+    print "Creating indexes ..."
+
+    for indexName in sorted(INDEXES):
+        dbConnection.execute(INDEXES[indexName])
+
+    dbConnection.execute("ANALYZE")
+    dbConnection.commit()
+    dbConnection.close()
+
+    if len(failed) > 0:
+        print "Failed building", len(failed), "organisms:", ', '.join(failed)
+
+
+def findOrganisms(bugDirectory):
+
+    organisms = {}
+
+    for directory, subdirectories, fileNames in os.walk(bugDirectory):
+
+        # organisms are two levels down: <kingdom>/<organism>
+        path = os.path.relpath(directory, bugDirectory).split(os.sep)
+
+        if len(path) != 2:
+            continue
+
+        for fileName in fileNames:
+
+            prefix, extension = os.path.splitext(fileName)
+
+            if extension not in ('.ptt', '.rnt'):
+                continue
+
+            organisms[prefix] = (prefix, path[0], path[1], prefix, directory, sourceFingerprint(directory, prefix))
+
+    return [organisms[name] for name in sorted(organisms)]
+
+
+def sourceFingerprint(directory, prefix):
+
+    fingerprint = []
+
+    for extension in SOURCE_EXTENSIONS:
+
+        fileName = os.path.join(directory, prefix + extension)
+
+        if os.path.exists(fileName):
+            fileStatus = os.stat(fileName)
+            fingerprint.append(extension + ':' + str(fileStatus.st_size) + ':' + str(int(fileStatus.st_mtime)))
+
+    return ';'.join(fingerprint)
+
+
+def buildOrganism(organism):
+
+    name, type, subfolder, prefix, directory, fingerprint = organism
+
+    try:
+
+        genome       = genomeStorage.loadGenome(os.path.join(directory, prefix + '.fna'))
+        genomeLength = len(genome)
+
+        rnaFeatures = readAnnotation(os.path.join(directory, prefix + '.rnt'))
+        cdsFeatures = readAnnotation(os.path.join(directory, prefix + '.ptt'))
+
+        rows = []
+
+        for start, end, strand, sequenceName in rnaFeatures:
+
+            # a feature that crosses the origin of a circular genome is listed with start > end
+            if start <= end:
+                sequence = genome[start - 1:end]
+            else:
+                sequence = genome[start - 1:genomeLength] + genome[0:end]
+
+            if strand == '-':
+                sequence = DNA.reverseComplement(sequence)
+
+            rows.append((name, sequence, start, end, strand, 'RNA', sequenceName))
+
+        # the bases covered by a feature of either table, splitting the ones that cross the origin
+        covered = []
+
+        for start, end, strand, sequenceName in rnaFeatures + cdsFeatures:
+            if start <= end:
+                covered.append((start, end))
+            else:
+                covered.append((start, genomeLength))
+                covered.append((1, end))
+
+        covered.sort()
+
+        # every gap between the features is intergenic DNA
+        last = 0
+
+        for start, end in covered + [(genomeLength + 1, genomeLength + 1)]:
+
+            if start > last + 1:
+                rows.append((name, genome[last:start - 1], last + 1, start - 1, '+', 'DNA', None))
+
+            if end > last:
+                last = end
+
+    # a missing genome file only needs its name reported
+    except IOError as error:
+        return organism, None, str(error)
+
+    except Exception:
+        return organism, None, traceback.format_exc()
+
+    return organism, rows, None
+
+
+def readAnnotation(fileName):
+
+    features = []
+
+    # an organism may have no RNA (or no protein) table
+    if not os.path.exists(fileName):
+        return features
+
+    annotationFile = open(fileName)
+
+    for lineNumber, line in enumerate(annotationFile):
+
+        if lineNumber < ANNOTATION_HEADER_LINES:
+            continue
+
+        columns = line.rstrip('\r\n').split('\t')
+
+        if len(columns) < 6:
+            continue
+
+        # Location, Strand, Length, PID, Gene, Synonym, ...
+        start, end = columns[0].split('..')
+
+        # name the feature by its locus tag, or by its gene if it has none
+        sequenceName = columns[5]
+
+        if sequenceName == '-':
+            sequenceName = columns[4]
+
+        features.append((int(start), int(end), columns[1], sequenceName))
+
+    annotationFile.close()
+
+    return features
+
+
+def insertOrganism(dbConnection, organism, rows):
+
+    name, type, subfolder, prefix, directory, fingerprint = organism
+
+    dbConnection.execute("DELETE FROM sequences WHERE organism_name = ?", (name,))
+
+    dbConnection.executemany("INSERT INTO sequences (organism_name, sequence, starting_location, ending_location, strand, type, sequence_name) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    # keep the cellular and category columns of an organism that is already in the table
+    dbConnection.execute("INSERT OR IGNORE INTO organisms (name) VALUES (?)", (name,))
+    dbConnection.execute("UPDATE organisms SET type = ?, subfolder = ?, file_prefix = ?, kingdom = ? WHERE name = ?", (type, subfolder, prefix, type, name))
+
+    dbConnection.execute("INSERT OR REPLACE INTO sources (organism_name, fingerprint) VALUES (?, ?)", (name, fingerprint))
+
+
+def removeOrganism(dbConnection, name):
+
+    dbConnection.execute("DELETE FROM sequences WHERE organism_name = ?", (name,))
+    dbConnection.execute("DELETE FROM organisms WHERE name = ?", (name,))
+    dbConnection.execute("DELETE FROM sources WHERE organism_name = ?", (name,))
+
+
+if __name__ == '__main__':
+    main()
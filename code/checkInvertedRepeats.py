@@ -0,0 +1,150 @@
+"""
+-----------------------------------------------------------------------------------------------------------------
+checkInvertedRepeats.py
+Programmer: Chris DeMolles
+
+Tested with Python 2.7.3
+
+This script checks that Sequence.countInvertedRepeats (which counts inverted repeats arithmetically) agrees with the
+sizes of the sets built by Sequence.getInvertedRepeats. Random sections are cut from every genome under the bug
+directory and both are run on each section for perfect IRs and IRs with one mismatch, counting pairings and
+nucleotides.
+
+Both of those find the partners of a motif the same way, so the start of each section is also checked against a
+brute-force reference that compares every pair of windows base by base, for stems of 3 to 12 with up to 3
+mismatches (which uses the seed index of irFunctions).
+
+Usage: python checkInvertedRepeats.py [number of sections per genome] [seed]
+-----------------------------------------------------------------------------------------------------------------
+"""
+
+from sequence import Sequence
+from ConfigParser import SafeConfigParser
+import os, random, sys
+
+# number of bases of each section compared with the brute-force reference
+BRUTE_FORCE_LENGTH = 120
+
+
+def main():
+
+    parser = SafeConfigParser()
+    parser.read('config.ini')
+
+    # get the bug directory from the configuration file
+    dataDirectory = os.path.join(parser.get('directories', 'root_dir'), parser.get('directories', 'data_subdir'))
+    bugDirectory  = os.path.join(dataDirectory, parser.get('directories', 'bug_subdir'))
+
+    numberOfSections = 3
+    seed             = 0
+
+    if len(sys.argv) > 1:
+        numberOfSections = int(sys.argv[1])
+
+    if len(sys.argv) > 2:
+        seed = int(sys.argv[2])
+
+    generator = random.Random(seed)
+
+    checked = 0
+    failed  = 0
+
+    for directory, subdirectories, fileNames in sorted(os.walk(bugDirectory)):
+
+        for fileName in sorted(fileNames):
+
+            if not fileName.endswith('.fna.oneline'):
+                continue
+
+            # skip the bogus 'X' at the beginning of the file
+            genome = open(os.path.join(directory, fileName)).readline().strip()[1:]
+
+            for i in xrange(numberOfSections):
+
+                # intergenic regions and RNAs are a few dozen to a few thousand bases long
+                length = generator.randint(20, 1500)
+                start  = generator.randint(0, max(0, len(genome) - length))
+
+                sequence = Sequence(genome[start:start + length])
+
+                for mismatches in (0, 1):
+                    for type in ('pairings', 'nucleotides'):
+
+                        counts   = sequence.countInvertedRepeats(3, 5, mismatches, type=type)
+                        expected = sequence.getInvertedRepeats(3, 5, mismatches, type)
+
+                        for stemLength in xrange(3, 6):
+
+                            checked += 1
+
+                            if counts[stemLength] != len(expected.get(stemLength, ())):
+                                failed += 1
+                                print 'Mismatch in', fileName, 'at', start + 1, 'length', length, type, mismatches, 'mismatches, stem-length', stemLength, ':', counts[stemLength], '!=', len(expected.get(stemLength, ()))
+
+                # the brute-force reference is quadratic, so only a short piece is checked
+                text     = genome[start:start + BRUTE_FORCE_LENGTH]
+                sequence = Sequence(text)
+
+                for mismatches in xrange(0, 4):
+                    for type in ('pairings', 'nucleotides'):
+
+                        counts = sequence.countInvertedRepeats(3, 12, mismatches, type=type)
+
+                        for stemLength in xrange(3, 13):
+
+                            checked += 1
+
+                            expected = bruteForceInvertedRepeats(text, stemLength, mismatches, type)
+
+                            if counts[stemLength] != expected:
+                                failed += 1
+                                print 'Mismatch with brute force in', fileName, 'at', start + 1, type, mismatches, 'mismatches, stem-length', stemLength, ':', counts[stemLength], '!=', expected
+
+    print 'Checked', checked, 'counts,', failed, 'mismatches'
+
+    if failed > 0:
+        sys.exit(1)
+
+
+def bruteForceInvertedRepeats(text, stemLength, mismatches, type):
+
+    complements = {'A': 'T', 'C': 'G', 'G': 'C', 'T': 'A'}
+
+    # the reverse complement of every window that is only made of A, C, G and T
+    windows = []
+
+    for location in xrange(len(text) - stemLength + 1):
+
+        window = text[location:location + stemLength]
+
+        if all(base in complements for base in window):
+            windows.append((location, window, ''.join(complements[base] for base in reversed(window))))
+
+    pairings = 0
+    covered  = set()
+
+    # compare every pair of windows that do not share a base
+    for i in xrange(len(windows)):
+
+        location, window, reverseComplement = windows[i]
+
+        for otherLocation, otherWindow, otherReverseComplement in windows[i + 1:]:
+
+            if otherLocation - location < stemLength:
+                continue
+
+            differences = sum(1 for first, second in zip(reverseComplement, otherWindow) if first != second)
+
+            if differences <= mismatches:
+                pairings += 1
+                covered.update(xrange(location, location + stemLength))
+                covered.update(xrange(otherLocation, otherLocation + stemLength))
+
+    if type == 'pairings':
+        return pairings
+
+    return len(covered)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,117 +7,364 @@ Tested with Python 2.7.3
 
 This script counts each of the 256 4-mers for each of the RNA and intergenic DNA sequences in the bug. It also
 counts the number of potential perfect interted repeats and the number of inverted repeats with one mismatch.
+
+The k-mer lengths (--k), stem-lengths (--stems) and numbers of mismatches (--mismatches) can be changed. The
+inverted repeats of every stem-length and number of mismatches are counted together from one set of motif codes
+per sequence, with the partners of each motif found once for the largest number of mismatches.
+
+The rows are written by outputWriters, as a tab-separated value file (IR_counts_345.tsv) and/or a .npy count matrix
+with a metadata table (--format npy).
+
+Each bug's rows are first saved to a shard of their own (in IR_counts_345_shards in the data directory), written to
+a temporary file and renamed so it is either complete or missing. The shards are merged into the output in the order
+of the query once every bug has been counted, and removed if none failed, so the output files only exist once a run
+is complete; a run without --resume removes the output of an earlier run first, so it cannot be mistaken for new
+results. A run that crashed or had failures keeps its shards and can be finished with --resume, which only counts
+the bugs that have no shard.
+
+With --instrument (or the WG_INSTRUMENT environment variable set), the time, calls and bases of every stage of each
+bug (see instrumentation) and the largest inverted repeat sets are written as one JSON object per line to
+IR_counts_345_timings.jsonl, next to the other output files.
 -----------------------------------------------------------------------------------------------------------------
 """
 
 from bug import *
 from sequence import *
-import sqlite3
+import argparse
+import database
+import instrumentation
+import json
+import marshal
+import multiprocessing
 import os
+import outputWriters
+import resultCache
+import shutil
+import time
+import traceback
 import dnaFunctions
 
+# the statistics counted by default: the 4-mers, and stems of 3 to 5 with no mismatches and with one
+DEFAULT_K          = [4]
+DEFAULT_STEMS      = '3-5'
+DEFAULT_MISMATCHES = '0,1'
+DEFAULT_OUTPUT     = 'IR_counts_345'
+
+# the shards of a run are kept in a directory named after the output (in the data directory) until they are
+# merged, with a file recording what they were counted with
+SHARD_DIRECTORY_SUFFIX = '_shards'
+SHARD_EXTENSION        = '.shard'
+SETTINGS_FILE_NAME     = 'settings'
+
+# the per-bug timing log of an instrumented run is named after the output
+TIMINGS_SUFFIX = '_timings.jsonl'
+
 def main():
 
-    parser = SafeConfigParser()
-    parser.read('config.ini')
+    argumentParser = argparse.ArgumentParser(description='Counts k-mers and potential inverted repeats for the RNA and intergenic DNA of each bug.')
+    argumentParser.add_argument('--workers', type=int, default=1, help='number of processes counting bugs in parallel (default: 1)')
+    argumentParser.add_argument('--format', action='append', choices=sorted(outputWriters.WRITERS), help='output format, tsv or npy (a matrix plus a metadata table); may be given more than once (default: tsv)')
+    argumentParser.add_argument('--resume', action='store_true', help='skip the bugs counted by an earlier run that did not finish')
+    argumentParser.add_argument('--k', type=int, action='append', help='length of the k-mers to count; may be given more than once (default: 4)')
+    argumentParser.add_argument('--stems', default=DEFAULT_STEMS, help='range of stem-lengths of the inverted repeats, as MIN-MAX (default: ' + DEFAULT_STEMS + ')')
+    argumentParser.add_argument('--mismatches', default=DEFAULT_MISMATCHES, help='comma-separated numbers of mismatches of the inverted repeats (default: ' + DEFAULT_MISMATCHES + ')')
+    argumentParser.add_argument('--output', default=DEFAULT_OUTPUT, help='name of the output files in the data directory, without the extension (default: ' + DEFAULT_OUTPUT + ')')
+    argumentParser.add_argument('--instrument', action='store_true', help='log the time of every stage of each bug to <output>' + TIMINGS_SUFFIX + ' (also turned on by the ' + instrumentation.ENVIRONMENT_VARIABLE + ' environment variable)')
+    arguments = argumentParser.parse_args()
 
-    # get the root directory from the configuration file
-    rootDirectory = parser.get('directories', 'root_dir')
+    # turn instrumentation on before any worker process is started
+    if arguments.instrument:
+        instrumentation.enable()
 
-    # get the data directory from the configuration file
-    dataDirectory = os.path.join(rootDirectory, parser.get('directories', 'data_subdir'))
+    settings = parseSettings(argumentParser, arguments)
 
-    # get the database file name
-    databaseFileName = os.path.join(dataDirectory, parser.get('files', 'database_file_name'))
+    # get the data directory from the configuration file
+    dataDirectory = database.getDataDirectory()
 
-    # connect to the database
-    dbConnection = sqlite3.connect(databaseFileName)
+    # get the pooled connection to the database
+    dbConnection = database.getConnection()
 
     # make a database cursor
     cursor = dbConnection.cursor()
 
-    # open a new file for output
-    tsvOutput = open(os.path.join(dataDirectory + '/IR_counts_345.tsv'), 'w')
-    
-    allPossibleFourMers = dnaFunctions.allPossibleMotifs(4)
+    bugDataQuery = "SELECT name, kingdom, category FROM organisms WHERE kingdom <> 'Human_Microbiom'"
 
-    outputHeading(tsvOutput, allPossibleFourMers)
+    # fetch the list of bugs up front (worker processes open connections of their own)
+    bugs = cursor.execute(bugDataQuery).fetchall()
 
-    bugDataQuery = "SELECT name, kingdom, category FROM organisms WHERE kingdom <> 'Human_Microbiom' AND kingdom <> 'Eukaryotic'"
+    # the rows of each bug are saved to a shard of their own as soon as it is counted, and the shards
+    # are merged into the output at the end
+    shardDirectory = os.path.join(dataDirectory, arguments.output + SHARD_DIRECTORY_SUFFIX)
 
-    # for each tuple of bug data in the result set
-    for bugData in cursor.execute(bugDataQuery):
+    if not os.path.isdir(shardDirectory):
+        os.makedirs(shardDirectory)
 
-        # the bug name is the first column in the result set
-        bugName  = bugData[0].encode('ascii', 'ignore')
-        kingdom  = bugData[1].encode('ascii', 'ignore')
-        category = bugData[2]
+    # shards counted with other settings cannot be merged with these
+    settingsFileName = os.path.join(shardDirectory, SETTINGS_FILE_NAME)
 
-        if category is not None:
-            category = category.encode('ascii', 'ignore')
-        else:
-            category = ''
+    if arguments.resume and os.path.exists(settingsFileName):
+
+        settingsFile = open(settingsFileName)
+        shardSettings = settingsFile.read()
+        settingsFile.close()
+
+        if shardSettings != repr(settings):
+            argumentParser.error('the shards in ' + shardDirectory + ' were counted with other settings (' + shardSettings + '); run without --resume')
+
+    # a shard only exists once its bug is completely counted, so it is the record that the bug is done
+    completed = set()
+
+    for fileName in os.listdir(shardDirectory):
+
+        bugName, extension = os.path.splitext(fileName)
+
+        if extension == SHARD_EXTENSION and arguments.resume:
+            completed.add(bugName)
+        elif fileName != SETTINGS_FILE_NAME:
+            # shards of an earlier run (and pieces of shards that were never finished)
+            os.remove(os.path.join(shardDirectory, fileName))
+
+    settingsFile = open(settingsFileName, 'w')
+    settingsFile.write(repr(settings))
+    settingsFile.close()
+
+    # the output of an earlier run would look current until this one is merged
+    if not arguments.resume:
+        for fileName in outputWriters.removeOutput(os.path.join(dataDirectory, arguments.output)):
+            print "Removed the earlier output", fileName, "..."
+
+    remaining = [(bugData, shardDirectory, settings) for bugData in bugs if bugData[0].encode('ascii', 'ignore') not in completed]
+
+    if arguments.resume:
+        print "Resuming:", len(bugs) - len(remaining), "of", len(bugs), "bugs already counted ..."
+
+    if arguments.workers > 1:
+        # each worker process opens its own database connections and writes its own shards
+        pool    = multiprocessing.Pool(arguments.workers)
+        results = pool.imap_unordered(countBug, remaining, 1)
+    else:
+        pool    = None
+        results = (countBug(task) for task in remaining)
+
+    # the timings of each bug are logged as soon as it is counted
+    if instrumentation.isEnabled():
+        timingsFile = open(os.path.join(dataDirectory, arguments.output + TIMINGS_SUFFIX), 'a' if arguments.resume else 'w')
+    else:
+        timingsFile = None
+
+    failed = []
+
+    for bugName, error, timings in results:
+
+        if timingsFile is not None and timings is not None:
+            timingsFile.write(json.dumps(timings, sort_keys=True) + '\n')
+            timingsFile.flush()
+
+        # a bad genome file only loses that bug
+        if error is not None:
+            print "Failed counting", bugName, "..."
+            print error
+            failed.append(bugName)
+            continue
+
+        print "Done counting", bugName, "..."
+
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+    if timingsFile is not None:
+        timingsFile.close()
+
+    columns = outputHeading(settings)
+
+    # open a new file (or set of files) for each output format
+    writers = [outputWriters.openWriter(format, os.path.join(dataDirectory, arguments.output), columns) for format in (arguments.format or ['tsv'])]
+
+    print "Merging", len(bugs) - len(failed), "bugs ..."
+
+    failedNames = set(failed)
+
+    # merge the shards in the order of the query, so the output is the same as a serial run
+    for bugData in bugs:
+
+        bugName = bugData[0].encode('ascii', 'ignore')
+
+        if bugName in failedNames:
+            continue
+
+        rows = readShard(shardDirectory, bugName)
+
+        # write each bug's rows in one batch; only the shard of one bug is held in memory at a time
+        for writer in writers:
+            writer.writeRows(rows)
+
+    for writer in writers:
+        writer.close()
+
+    if len(failed) > 0:
+        # keep the shards so the run can be finished with --resume
+        print "Failed counting", len(failed), "bugs:", ', '.join(failed)
+        print "Fix them and run again with --resume to count only the bugs that are missing."
+    else:
+        shutil.rmtree(shardDirectory)
+
+
+def parseSettings(argumentParser, arguments):
+
+    kValues = arguments.k or DEFAULT_K
 
-        print "Counting", bugName, "..."
+    try:
+        stemMin, stemMax = [int(length) for length in arguments.stems.split('-')]
+        mismatchLevels   = sorted(set(int(mismatches) for mismatches in arguments.mismatches.split(',')))
+    except ValueError:
+        argumentParser.error('--stems must be MIN-MAX and --mismatches a comma-separated list of numbers')
+
+    # the codes of the k-mers and stems are C ints
+    if min(kValues) < 1 or max(kValues) > 15 or stemMin < 1 or stemMax > 15 or stemMin > stemMax or mismatchLevels[0] < 0:
+        argumentParser.error('k and the stem-lengths must be from 1 to 15, and the numbers of mismatches at least 0')
+
+    return (tuple(kValues), stemMin, stemMax, tuple(mismatchLevels))
+
+
+def countBug(task):
+
+    bugData, shardDirectory, settings = task
+
+    kValues, stemMin, stemMax, mismatchLevels = settings
+
+    # the bug name is the first column in the result set
+    bugName  = bugData[0].encode('ascii', 'ignore')
+    kingdom  = bugData[1].encode('ascii', 'ignore')
+    category = bugData[2]
+
+    if category is not None:
+        category = category.encode('ascii', 'ignore')
+    else:
+        category = ''
+
+    print "Counting", bugName, "..."
+
+    # keep the rows for this bug in memory so they can be handed back to the main process
+    rows = []
+
+    # time this bug's stages on their own
+    instrumentation.reset()
+    started = time.time()
+
+    try:
 
         # make a new bug object given the bug name
         bug = Bug(bugName)
 
-        # gets a dictionary of RNA sequences (with the key as the name of the RNA and the value as a sequence object)
+        # gets a dictionary of RNA sequences (with the key as the location of the RNA and the value as a sequence object)
         bugRNA = bug.getRNA()
 
-        # gets a dictionary of DNA sequences (with the key as the starting location of the DNA and the value as a sequence object)
+        # gets a dictionary of DNA sequences (with the key as the location of the DNA and the value as a sequence object)
         bugDNA = bug.getDNA()
 
-        outputData(tsvOutput, bugRNA, bugName, kingdom, category, 'RNA', allPossibleFourMers)
-        outputData(tsvOutput, bugDNA, bugName, kingdom, category, 'DNA', allPossibleFourMers)
+        # count the k-mers of all the RNA and all the DNA sequences at once (the keys come back in the
+        # same order for every k)
+        rnaKmers = [bug.countMotifsBatch('RNA', k, bugRNA) for k in kValues]
+        dnaKmers = [bug.countMotifsBatch('DNA', k, bugDNA) for k in kValues]
 
-        print "Done counting", bugName, "..."
+        outputData(rows, bugRNA, rnaKmers[0][0], [counts for keys, counts in rnaKmers], bugName, kingdom, category, 'RNA', settings)
+        outputData(rows, bugDNA, dnaKmers[0][0], [counts for keys, counts in dnaKmers], bugName, kingdom, category, 'DNA', settings)
+
+    except Exception:
+        return bugName, traceback.format_exc(), bugTimings(bugName, kingdom, category, started, None, True)
+
+    finally:
+        # write this bug's new counts to the result cache (pool workers never reach the exit handler)
+        resultCache.flushCache()
+
+    # save the rows where a later run with --resume can find them
+    writeShard(shardDirectory, bugName, rows)
+
+    return bugName, None, bugTimings(bugName, kingdom, category, started, bugRNA.values() + bugDNA.values(), False)
+
+
+def bugTimings(bugName, kingdom, category, started, sequences, failed):
+
+    if not instrumentation.isEnabled():
+        return None
+
+    # the totals of the bug, with the stages it went through
+    timings = instrumentation.snapshot()
+
+    timings['bug']      = bugName
+    timings['kingdom']  = kingdom
+    timings['category'] = category
+    timings['seconds']  = time.time() - started
+    timings['failed']   = failed
 
-    tsvOutput.close()
+    if sequences is not None:
+        timings['sequences'] = len(sequences)
+        timings['bases']     = sum(len(sequence) for sequence in sequences)
 
+    return timings
 
-def outputHeading(outputFile, allPossibleFourMers):
 
-    outputFile.write('Name')
-    outputFile.write('\t')
+def writeShard(shardDirectory, bugName, rows):
 
-    outputFile.write('Kingdom')
-    outputFile.write('\t')
+    shardFileName = os.path.join(shardDirectory, bugName + SHARD_EXTENSION)
 
-    for motif in allPossibleFourMers:
-       outputFile.write(motif)
-       outputFile.write('\t')
+    # write to a temporary file and rename it, so a shard is either complete or missing
+    temporaryFileName = shardFileName + '.' + str(os.getpid()) + '.tmp'
 
-    outputFile.write('IRs_Stem_Len_3_Perfect')
-    outputFile.write('\t')
+    shardFile = open(temporaryFileName, 'wb')
+    marshal.dump(rows, shardFile)
+    shardFile.flush()
+    os.fsync(shardFile.fileno())
+    shardFile.close()
 
-    outputFile.write('IRs_Stem_Len_4_Perfect')
-    outputFile.write('\t')
+    os.rename(temporaryFileName, shardFileName)
 
-    outputFile.write('IRs_Stem_Len_5_Perfect')
-    outputFile.write('\t')
 
-    outputFile.write('IRs_Stem_Len_3_1_Mismatch')
-    outputFile.write('\t')
+def readShard(shardDirectory, bugName):
 
-    outputFile.write('IRs_Stem_Len_4_1_Mismatch')
-    outputFile.write('\t')
+    shardFile = open(os.path.join(shardDirectory, bugName + SHARD_EXTENSION), 'rb')
+    rows      = marshal.load(shardFile)
+    shardFile.close()
 
-    outputFile.write('IRs_Stem_Len_5_1_Mismatch')
-    outputFile.write('\t')
+    return rows
 
-    outputFile.write('Type')
-    outputFile.write('\n')
 
+def outputHeading(settings):
 
-def outputData(outputFile, data, bugName, kingdom, category, type, allPossibleFourMers):
+    kValues, stemMin, stemMax, mismatchLevels = settings
 
-    for sequenceName, sequence in data.iteritems():
+    # the count columns, between the name and kingdom at the start of each row and the type at the end
+    columns = []
 
-        motifs                  = sequence.countMotifs(4, 4)
-        invertedRepeats         = sequence.countInvertedRepeats(3, 5, 0)
-        invertedRepeatsMismatch = sequence.countInvertedRepeats(3, 5, 1)
+    for k in kValues:
+        columns += dnaFunctions.allPossibleMotifs(k)
+
+    for mismatches in mismatchLevels:
+
+        for length in xrange(stemMin, stemMax + 1):
+
+            if mismatches == 0:
+                columns.append('IRs_Stem_Len_' + str(length) + '_Perfect')
+            else:
+                columns.append('IRs_Stem_Len_' + str(length) + '_' + str(mismatches) + '_Mismatch')
+
+    return columns
+
+
+def outputData(rows, data, keys, kmerCounts, bugName, kingdom, category, type, settings):
+
+    kValues, stemMin, stemMax, mismatchLevels = settings
+
+    # the k-mer counts are already in the order of the heading, one row per key
+    for row in xrange(len(keys)):
+
+        sequenceName = keys[row]
+
+        sequence = data[sequenceName]
+
+        # every number of mismatches comes from the same motif codes and partners
+        invertedRepeats = sequence.countInvertedRepeatsByMismatches(stemMin, stemMax, mismatchLevels)
 
         strandName = ''
 
@@ -128,53 +375,28 @@ def outputData(outputFile, data, bugName, kingdom, category, type, allPossibleFo
 
         outputName = ''
 
+        # RNA are named by where they start
         if type == 'DNA':
             outputName = 'XXX'
         else:
-            outputName = sequenceName
+            outputName = sequence.start
 
         outputName = str(bugName) + '_' + str(type) + '_' + str(outputName) + '_' + str(sequence.start) + '_' + str(sequence.end) + '_' + str(strandName)
 
-        outputFile.write(outputName)
-        outputFile.write('\t')
-
-        outputFile.write(kingdom)
-        outputFile.write('\t')
-
-        for motif in allPossibleFourMers:
-
-            if motif in motifs:
-                strCount = str(motifs[motif])
-                outputFile.write(strCount)
-            else:
-                outputFile.write('0')
-
-            outputFile.write('\t')
-
-        outputFile.write(str(invertedRepeats[3]))
-        outputFile.write('\t')
-
-        outputFile.write(str(invertedRepeats[4]))
-        outputFile.write('\t')
-
-        outputFile.write(str(invertedRepeats[5]))
-        outputFile.write('\t')
-
-        outputFile.write(str(invertedRepeatsMismatch[3]))
-        outputFile.write('\t')
+        counts = []
 
-        outputFile.write(str(invertedRepeatsMismatch[4]))
-        outputFile.write('\t')
+        for kCounts in kmerCounts:
+            counts += [int(count) for count in kCounts[row]]
 
-        outputFile.write(str(invertedRepeatsMismatch[5]))
-        outputFile.write('\t')
+        for mismatches in mismatchLevels:
+            counts += [invertedRepeats[mismatches][length] for length in xrange(stemMin, stemMax + 1)]
 
         if type == 'DNA':
-            outputFile.write('notRNA')
+            outputType = 'notRNA'
         else:
-            outputFile.write(type)
+            outputType = type
 
-        outputFile.write('\n')
+        rows.append((outputName, kingdom, counts, outputType))
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,174 @@
+"""
+-----------------------------------------------------------------------------------------------------------------
+database.py
+Programmer: Chris DeMolles
+
+Tested with Python 2.7.3
+
+This module reads the configuration file once and hands out connections to the genomics database. Connections are
+read-only, tuned for many small queries, and pooled: each thread of each process gets one connection that is reused
+by every Bug (and by count.py) instead of connecting and disconnecting around every query. Reusing a connection also
+reuses its cache of prepared statements. buildDatabase.py opens the one writable connection with connectForWriting.
+-----------------------------------------------------------------------------------------------------------------
+"""
+
+from ConfigParser import SafeConfigParser
+import os, sqlite3, threading
+
+# name of the configuration file (relative to the working directory)
+CONFIG_FILE_NAME = 'config.ini'
+
+# pragmas run on every new connection
+PRAGMAS = ['PRAGMA query_only = ON',
+           'PRAGMA mmap_size = 268435456',
+           'PRAGMA cache_size = -65536',
+           'PRAGMA temp_store = MEMORY']
+
+# pragmas run on a connection that builds the database: the journal is written ahead so readers are not
+# blocked, and the disk is only synced at checkpoints
+BUILD_PRAGMAS = ['PRAGMA journal_mode = WAL',
+                 'PRAGMA synchronous = NORMAL',
+                 'PRAGMA cache_size = -262144',
+                 'PRAGMA temp_store = MEMORY']
+
+_config      = None
+_connections = threading.local()
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def getConfig():
+    """
+    ==============================================================================================
+    SUMMARY: Returns the parsed configuration file
+    PRE: None
+    POST: Returns a SafeConfigParser for config.ini, parsing it the first time only
+    ==============================================================================================
+    """
+
+    global _config
+
+    if _config is None:
+        parser = SafeConfigParser()
+        parser.read(CONFIG_FILE_NAME)
+        _config = parser
+
+    return _config
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def getDataDirectory():
+    """
+    ==============================================================================================
+    SUMMARY: Returns the data directory from the configuration file
+    PRE: None
+    POST: Returns root_dir joined with data_subdir
+    ==============================================================================================
+    """
+
+    parser = getConfig()
+
+    return os.path.join(parser.get('directories', 'root_dir'), parser.get('directories', 'data_subdir'))
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def getBugDirectory():
+    """
+    ==============================================================================================
+    SUMMARY: Returns the bug directory from the configuration file
+    PRE: None
+    POST: Returns the data directory joined with bug_subdir
+    ==============================================================================================
+    """
+
+    return os.path.join(getDataDirectory(), getConfig().get('directories', 'bug_subdir'))
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def getDatabaseFileName():
+    """
+    ==============================================================================================
+    SUMMARY: Returns the name of the database file from the configuration file
+    PRE: None
+    POST: Returns the data directory joined with database_file_name
+    ==============================================================================================
+    """
+
+    return os.path.join(getDataDirectory(), getConfig().get('files', 'database_file_name'))
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def getConnection(databaseFileName=None):
+    """
+    ==============================================================================================
+    SUMMARY: Returns the pooled read-only connection to the database for this thread and process
+    PRE: optional(databaseFileName) (defaults to the database in the configuration file)
+    POST: Returns an open sqlite3 connection, creating it the first time it is asked for
+    ==============================================================================================
+    """
+
+    if databaseFileName is None:
+        databaseFileName = getDatabaseFileName()
+
+    # a connection inherited from the parent process cannot be used after a fork, so the pool is
+    # thrown away whenever the process id changes
+    if getattr(_connections, 'pid', None) != os.getpid():
+        _connections.pid  = os.getpid()
+        _connections.pool = {}
+
+    if databaseFileName not in _connections.pool:
+
+        dbConnection = sqlite3.connect(databaseFileName, cached_statements=256)
+
+        for pragma in PRAGMAS:
+            dbConnection.execute(pragma)
+
+        _connections.pool[databaseFileName] = dbConnection
+
+    return _connections.pool[databaseFileName]
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def closeConnections():
+    """
+    ==============================================================================================
+    SUMMARY: Closes the pooled connections of this thread
+    PRE: None
+    POST: Closes and forgets every connection opened by this thread in this process
+    ==============================================================================================
+    """
+
+    if getattr(_connections, 'pid', None) == os.getpid():
+        for dbConnection in _connections.pool.values():
+            dbConnection.close()
+
+    _connections.pid  = os.getpid()
+    _connections.pool = {}
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def connectForWriting(databaseFileName=None):
+    """
+    ==============================================================================================
+    SUMMARY: Opens a connection that can write to the database
+    PRE: optional(databaseFileName) (defaults to the database in the configuration file)
+    POST: Returns a new sqlite3 connection, tuned for bulk inserts, that is not pooled; the
+          database file is created if it does not exist
+    ==============================================================================================
+    """
+
+    if databaseFileName is None:
+        databaseFileName = getDatabaseFileName()
+
+    dbConnection = sqlite3.connect(databaseFileName)
+
+    for pragma in BUILD_PRAGMAS:
+        dbConnection.execute(pragma)
+
+    return dbConnection
+#-----------------------------------------------------------------------------------------------------------------#
@@ -1,68 +1,131 @@
-import itertools
+import itertools, string
+import kmerFunctions as KMER
+
+# the complement of each base; any other character has no complement and is dropped
+COMPLEMENTS = {'A': 'T', 'T': 'A', 'G': 'C', 'C': 'G'}
+
+COMPLEMENT_TABLE = string.maketrans('ACGT', 'TGCA')
+NON_BASES        = ''.join(chr(i) for i in xrange(256) if chr(i) not in 'ACGT')
+
+# the reverse complement of the 4 bases packed in each byte of 2-bit codes (A = 0, C = 1, G = 2, T = 3)
+BYTE_REVERSE_COMPLEMENTS = [sum((3 - ((byte >> (2 * i)) & 3)) << (6 - 2 * i) for i in xrange(4)) for byte in xrange(256)]
+
+# every motif of each length, keyed by the length
+_motifs = {}
+
+# the masks that change at most m bases of a code of length k, keyed by (k, m); they depend on
+# nothing else, so there are only a few of them however many codes are looked up
+_mismatchMasks = {}
+
 
 #==============================================================================================#
 def complementBase(base):
-	
-		if base == 'A':
-			return 'T'
-		elif base == 'T':
-			return 'A'
-		elif base == 'G':
-			return 'C'
-		elif base == 'C':
-			return 'G'
-		else:
-			return ''
+
+		return COMPLEMENTS.get(base, '')
 
 
 #==============================================================================================#
 def reverseComplement(motif):
 
-	# initalize the reverse complement string
-	reverseComplement = ''
+	# complement every base with one table lookup (dropping anything that is not a base, like
+	# complementBase does) and reverse the result
+	return str(motif).translate(COMPLEMENT_TABLE, NON_BASES)[::-1]
+
+
+#==============================================================================================#
+def reverseComplementMismatches(motif, numberOfMismatches):
 
-	# for each base pair in the motif
-	for base in motif:
+	# found at every call, so nothing is kept per motif
+	return list(mismatchNeighborhood(reverseComplement(motif), numberOfMismatches))
 
-		# find the complement of the base
-		complement = complementBase(base)
 
-		# add it to the beginning of the reverseComplement
-		reverseComplement = complement + reverseComplement
+#==============================================================================================#
+def mismatchNeighborhood(motif, numberOfMismatches):
 
-	return reverseComplement
+	# every motif within numberOfMismatches of a motif of A, C, G and T, found at every call from
+	# the masks of (len(motif), numberOfMismatches) like mismatchCodes, so nothing is kept per motif
+	k = len(motif)
 
+	return frozenset(KMER.decodeKmer(code, k) for code in mismatchCodes(KMER.encodeKmer(motif), k, numberOfMismatches))
 
-def reverseComplementMismatches(motif, numberOfMismatches):
 
-	rComplement = reverseComplement(motif)
+#==============================================================================================#
+def allPossibleMotifs(length):
 
-	if numberOfMismatches == 1:
+	# the motifs of each length are only built once
+	if length not in _motifs:
+		_motifs[length] = tuple(map(''.join, itertools.product('ACGT', repeat=length)))
 
-		mismatches = set()
+	return list(_motifs[length])
 
-		for i in range(len(rComplement)):
 
-			for basePair in allPossibleMotifs(1):
+#==============================================================================================#
+def reverseComplementCode(code, k):
 
-				reverseComplementList = list(rComplement)
-				reverseComplementList[i] = basePair
+	# reverse complement a byte (4 bases) at a time; the bases above the k-th are A, which
+	# become T at the low end of the result and are shifted away
+	numberOfBytes     = (k + 3) // 4
+	reverseComplement = 0
 
-				mismatch = ''.join(reverseComplementList)
-				mismatches.add(mismatch)
+	for i in xrange(numberOfBytes):
+		reverseComplement = (reverseComplement << 8) | BYTE_REVERSE_COMPLEMENTS[code & 255]
+		code >>= 8
 
-		mismatches = list(mismatches)
+	return reverseComplement >> (2 * (4 * numberOfBytes - k))
 
-		return mismatches
 
-	else:
+#==============================================================================================#
+def mismatchCodes(code, k, numberOfMismatches):
 
-		return [rComplement]
+	# found at every call from the masks of (k, numberOfMismatches), so nothing is kept per code
+	return frozenset(code ^ mask for mask, mismatches in mismatchMasks(k, numberOfMismatches))
 
 
 #==============================================================================================#
-def allPossibleMotifs(length):
+def mismatchMasks(k, numberOfMismatches):
+
+	key = (k, numberOfMismatches)
+
+	# changing a base is an XOR with a nonzero 2-bit value at its position, so every code within
+	# numberOfMismatches of a code is code ^ mask for one of these masks, with as many mismatches
+	# as the mask has nonzero 2-bit digits
+	if key not in _mismatchMasks:
 
-	motifs = map(''.join, itertools.product('ACGT', repeat=length))
+		masks = []
+
+		for mismatches in xrange(min(numberOfMismatches, k) + 1):
+
+			for positions in itertools.combinations(xrange(k), mismatches):
+
+				for values in itertools.product((1, 2, 3), repeat=mismatches):
+
+					mask = 0
+
+					for position, value in zip(positions, values):
+						mask |= value << (2 * position)
+
+					masks.append((mask, mismatches))
+
+		_mismatchMasks[key] = tuple(masks)
+
+	return _mismatchMasks[key]
+
+
+#==============================================================================================#
+def mismatchDistances(code, k, numberOfMismatches):
+
+	# the number of mismatches of every code within numberOfMismatches of code
+	return dict((code ^ mask, mismatches) for mask, mismatches in mismatchMasks(k, numberOfMismatches))
+
+
+#==============================================================================================#
+def reverseComplementMismatchCodes(code, k, numberOfMismatches):
+
+	return mismatchCodes(reverseComplementCode(code, k), k, numberOfMismatches)
+
+
+#==============================================================================================#
+def reverseComplementMismatchDistances(code, k, numberOfMismatches):
 
-	return motifs
+	# found at every call from the masks of (k, numberOfMismatches), so nothing is kept per code
+	return mismatchDistances(reverseComplementCode(code, k), k, numberOfMismatches)
@@ -0,0 +1,247 @@
+"""
+-----------------------------------------------------------------------------------------------------------------
+fasta.py
+Programmer: Chris DeMolles
+
+Tested with Python 2.7.3
+
+This module reads FASTA (.fna) files a piece at a time, so a genome never has to be held in memory (or converted to a
+.fna.oneline file first). Files may hold any number of records (chromosomes, plasmids) and may be gzipped.
+
+readChunks yields the bases of each record in chunks that overlap their neighbors by 2 * margin bases. Each chunk
+"owns" the bases from ownedStart to ownedStop (indexes into its text): every base of a record is owned by exactly one
+chunk, and at least margin bases of context are available on either side of the owned bases (except at the ends of
+the record). With margin = k - 1, counting the k-mers that start at an owned base counts every k-mer of the record
+exactly once.
+-----------------------------------------------------------------------------------------------------------------
+"""
+
+from collections import namedtuple
+import gzip
+
+# the first two bytes of a gzipped file
+GZIP_MAGIC = '\x1f\x8b'
+
+# a piece of a record: the record number (0-based) and its description line, the location in the record of the
+# first base of text (0-based), the bases, and the part of text owned by this chunk
+FastaChunk = namedtuple('FastaChunk', 'record description start text ownedStart ownedStop')
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def openFasta(fileName):
+    """
+    ==============================================================================================
+    SUMMARY: Opens a FASTA file, gzipped or not
+    PRE: assigned(fileName)
+    POST: Returns a file object reading the uncompressed text of fileName
+    ==============================================================================================
+    """
+
+    fastaFile = open(fileName, 'rb')
+    magic     = fastaFile.read(2)
+    fastaFile.close()
+
+    if magic == GZIP_MAGIC:
+        return gzip.open(fileName, 'rb')
+
+    return open(fileName, 'rb')
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def readChunks(fileName, chunkSize=1048576, margin=0):
+    """
+    ==============================================================================================
+    SUMMARY: Reads the records of a FASTA file in overlapping chunks
+    PRE: assigned(fileName), optional(chunkSize) (bases owned by each chunk, at least margin), optional(margin)
+    POST: Yields a FastaChunk for each piece of each record, in order; consecutive chunks of a
+          record share 2 * margin bases, and chunks never span two records
+    ==============================================================================================
+    """
+
+    # a chunk must own at least as many bases as its margin, so the next chunk starts inside the record
+    chunkSize = max(chunkSize, margin, 1)
+
+    fastaFile = openFasta(fileName)
+
+    record      = -1
+    description = None
+
+    pieces       = []
+    bufferLength = 0
+    bufferStart  = 0
+    first        = True
+
+    try:
+
+        for line in fastaFile:
+
+            # a description line starts a new record
+            if line.startswith('>'):
+
+                if record >= 0:
+                    for chunk in finishRecord(record, description, pieces, bufferStart, first, margin):
+                        yield chunk
+
+                record      = record + 1
+                description = line[1:].strip()
+
+                pieces       = []
+                bufferLength = 0
+                bufferStart  = 0
+                first        = True
+
+                continue
+
+            bases = line.strip()
+
+            if len(bases) == 0:
+                continue
+
+            # some files have no description line at all
+            if record < 0:
+                record      = 0
+                description = ''
+
+            pieces.append(bases)
+            bufferLength += len(bases)
+
+            # the first chunk of a record has no margin on its left
+            leftMargin = 0 if first else margin
+            needed     = leftMargin + chunkSize + margin
+
+            while bufferLength >= needed:
+
+                text = ''.join(pieces)
+
+                yield FastaChunk(record, description, bufferStart, text[:needed], leftMargin, leftMargin + chunkSize)
+
+                # keep the bases the next chunk shares with this one
+                cut = needed - 2 * margin
+
+                pieces       = [text[cut:]]
+                bufferLength = len(pieces[0])
+                bufferStart += cut
+                first        = False
+
+                leftMargin = margin
+                needed     = leftMargin + chunkSize + margin
+
+        if record >= 0:
+            for chunk in finishRecord(record, description, pieces, bufferStart, first, margin):
+                yield chunk
+
+    finally:
+        fastaFile.close()
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def finishRecord(record, description, pieces, bufferStart, first, margin):
+    """
+    ==============================================================================================
+    SUMMARY: Makes the last chunk of a record from the bases left in the buffer
+    PRE: assigned(record), assigned(description), assigned(pieces), assigned(bufferStart), assigned(first),
+         assigned(margin)
+    POST: Returns a list with the last FastaChunk of the record (empty if it would own no bases)
+    ==============================================================================================
+    """
+
+    text       = ''.join(pieces)
+    leftMargin = 0 if first else margin
+
+    if len(text) <= leftMargin:
+        return []
+
+    return [FastaChunk(record, description, bufferStart, text, leftMargin, len(text))]
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def splitChunks(sequence, chunkSize=1048576, margin=0):
+    """
+    ==============================================================================================
+    SUMMARY: Cuts a sequence that is already available (a string or genome storage backend) into chunks
+    PRE: assigned(sequence), optional(chunkSize), optional(margin)
+    POST: Yields FastaChunks laid out exactly like readChunks does for a single record
+    ==============================================================================================
+    """
+
+    for textStart, textStop, ownedStart, ownedStop in splitRanges(len(sequence), chunkSize, margin):
+        yield FastaChunk(0, '', textStart, sequence[textStart:textStop], ownedStart, ownedStop)
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def splitRanges(length, chunkSize=1048576, margin=0):
+    """
+    ==============================================================================================
+    SUMMARY: Lays out the chunks of a sequence without cutting them
+    PRE: assigned(length), optional(chunkSize), optional(margin)
+    POST: Yields (textStart, textStop, ownedStart, ownedStop) for each chunk splitChunks would make: the
+          bases of its text (0-based, textStop excluded) and the part of the text it owns
+    ==============================================================================================
+    """
+
+    chunkSize = max(chunkSize, margin, 1)
+
+    start = 0
+
+    while start < length:
+
+        # the first chunk has no margin on its left, the last none on its right
+        textStart = max(0, start - margin)
+        textStop  = min(length, start + chunkSize + margin)
+        ownedStop = min(length, start + chunkSize)
+
+        if length - ownedStop <= margin:
+            # the rest of the sequence would only fill a right margin, so this chunk owns it
+            ownedStop = length
+            textStop  = length
+
+        yield textStart, textStop, start - textStart, ownedStop - textStart
+
+        start = ownedStop
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def recordLengths(fileName):
+    """
+    ==============================================================================================
+    SUMMARY: Counts the bases of every record of a FASTA file
+    PRE: assigned(fileName)
+    POST: Returns a list with the number of bases of each record, in order (the records are laid end to
+          end, in this order, by the genome storage backends)
+    ==============================================================================================
+    """
+
+    lengths = []
+
+    fastaFile = openFasta(fileName)
+
+    try:
+
+        for line in fastaFile:
+
+            if line.startswith('>'):
+                lengths.append(0)
+                continue
+
+            bases = line.strip()
+
+            if len(bases) == 0:
+                continue
+
+            # some files have no description line at all
+            if len(lengths) == 0:
+                lengths.append(0)
+
+            lengths[-1] += len(bases)
+
+    finally:
+        fastaFile.close()
+
+    # records without bases make no chunks, so they are left out like readChunks leaves them out
+    return [length for length in lengths if length > 0]
+#-----------------------------------------------------------------------------------------------------------------#
@@ -0,0 +1,619 @@
+"""
+-----------------------------------------------------------------------------------------------------------------
+genomeIndex.py
+Programmer: Chris DeMolles
+
+Tested with Python 2.7.3
+
+This module builds a full-text index of a genome (an FM-index with its whole suffix array), so the occurrences of
+a motif of any length can be counted and located without listing every k-mer of the genome. A motif is searched
+for backward, one base at a time, and each base narrows the range of suffixes that start with the motif read so far
+in constant time, so a query takes time proportional to the length of the motif (plus the number of occurrences to
+locate them). Queries may allow mismatches: every base is then tried at each position while mismatches are left.
+
+The index is written to a .fna.fmi file next to the genome and memory-mapped, so it is built once and shared by
+every process that uses it:
+
+    header       magic 'WGFM', format version, number of bases, checkpoint interval, CRC-32 of the bases, and the
+                 number of times each symbol occurs (the end of the genome, A, C, G, T and any other character)
+    suffixes     the starting location (0-based) of every suffix of the genome, in sorted order, as 32-bit integers
+    bwt          the symbol before each of those suffixes (the Burrows-Wheeler transform), one byte per symbol
+    checkpoints  the number of A, C, G and T in the bwt before every CHECKPOINT_INTERVAL-th row, as 32-bit integers
+
+Every character other than A, C, G or T is one symbol that no query matches, so motifs never span an N. The records
+of a genome with several of them are indexed as if they were joined end to end (like the genome backends), and
+motifs are not found across the origin of a circular genome.
+
+The suffix array is built by prefix doubling: the suffixes are sorted by their first few symbols, then by twice as
+many, each round from the ranks of the last, until every suffix has a rank of its own. With numpy each round is a
+vectorized O(n log n) sort; without it each round is two linear passes of a counting sort on the ranks, kept in
+arrays of 32-bit integers, so the sort takes O(n log n) time and a few arrays of 4 bytes per base.
+
+An index file is only used for the genome it was built from: the number of bases and the CRC-32 of the bases in its
+header must match the genome, otherwise it is rebuilt.
+-----------------------------------------------------------------------------------------------------------------
+"""
+
+from array import array
+from cStringIO import StringIO
+import mmap, os, string, struct, sys, zlib
+import kmerFunctions as KMER
+
+# layout of the .fna.fmi header (little-endian) and of the sections after it
+INDEX_MAGIC   = 'WGFM'
+INDEX_VERSION = 2
+INDEX_HEADER  = struct.Struct('<4sIQII6Q')
+INDEX_TYPE    = 'i'
+INDEX_INTEGER = struct.Struct('<i')
+
+# the bwt rows between checkpoints
+CHECKPOINT_INTERVAL = 64
+
+# the bases read at a time to find the checksum of a genome
+CHECKSUM_CHUNK = 1048576
+
+# the number of symbols the vectorized suffix sort ranks the suffixes on before it starts doubling, and the most
+# the counting sort of the suffixes without numpy does (6 ** 8 buckets)
+INITIAL_SPAN = 12
+RADIX_SPAN   = 8
+
+# the symbols: 0 ends the genome, 1 to 4 are A, C, G and T, and every other character is 5
+END_SYMBOL      = 0
+OTHER_SYMBOL    = 5
+SYMBOLS         = 6
+BASE_SYMBOLS    = {'A': 1, 'C': 2, 'G': 3, 'T': 4}
+SYMBOL_TABLE    = string.maketrans('ACGT' + ''.join(chr(i) for i in xrange(256) if chr(i) not in 'ACGT'),
+                                   '\x01\x02\x03\x04' + '\x05' * 252)
+SYMBOL_CHARACTERS = [chr(symbol) for symbol in xrange(SYMBOLS)]
+
+
+class GenomeIndex(object):
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def __init__(self, fileName):
+        """
+        ==============================================================================================
+        SUMMARY: Initializes genome index object
+        PRE: assigned(fileName) (a .fna.fmi file written by buildIndex)
+        POST: Memory-maps fileName and reads its header
+        ==============================================================================================
+        """
+
+        self.fileName = fileName
+
+        indexFile = open(fileName, 'rb')
+
+        try:
+            self.map = mmap.mmap(indexFile.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            # the map keeps its own handle on the file
+            indexFile.close()
+
+        self.readHeader()
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    @classmethod
+    def fromGenome(cls, genome):
+        """
+        ==============================================================================================
+        SUMMARY: Builds the index of a genome in memory
+        PRE: assigned(genome) (a string of the bases or a genome backend from genomeStorage)
+        POST: Returns a genome index object holding the index in a string instead of a memory-mapped file
+        ==============================================================================================
+        """
+
+        indexFile = StringIO()
+
+        writeIndex(genome, indexFile)
+
+        index = cls.__new__(cls)
+
+        index.fileName = None
+        index.map      = indexFile.getvalue()
+
+        index.readHeader()
+
+        return index
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def readHeader(self):
+        """
+        ==============================================================================================
+        SUMMARY: Reads the header of the index
+        PRE: assigned(self.map)
+        POST: Sets the length, the checksum, the first row of each symbol and the offsets of the sections
+        ==============================================================================================
+        """
+
+        header = INDEX_HEADER.unpack_from(self.map, 0)
+
+        magic, version, self.length, self.interval, self.checksum = header[:5]
+
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            raise ValueError(str(self.fileName) + ' is not a genome index file')
+
+        # one row per suffix, including the empty one at the end of the genome
+        self.rows = self.length + 1
+
+        # the suffixes starting with each symbol follow the ones starting with a smaller symbol
+        self.firstRows = [0] * SYMBOLS
+
+        for symbol in xrange(1, SYMBOLS):
+            self.firstRows[symbol] = self.firstRows[symbol - 1] + header[5 + symbol - 1]
+
+        self.suffixOffset     = INDEX_HEADER.size
+        self.bwtOffset        = self.suffixOffset + 4 * self.rows
+        self.checkpointOffset = self.bwtOffset + self.rows
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def __len__(self):
+        """
+        ==============================================================================================
+        SUMMARY: Returns the number of bases in the indexed genome
+        PRE: assigned(self.length)
+        POST: Returns self.length
+        ==============================================================================================
+        """
+
+        return self.length
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def occurrences(self, symbol, row):
+        """
+        ==============================================================================================
+        SUMMARY: Counts a base in the bwt before a row
+        PRE: assigned(symbol) (1 to 4), assigned(row) (0 to self.rows)
+        POST: Returns the number of times symbol occurs in the first row rows of the bwt, from the last
+              checkpoint and at most CHECKPOINT_INTERVAL - 1 rows after it
+        ==============================================================================================
+        """
+
+        checkpoint = row // self.interval
+
+        count = INDEX_INTEGER.unpack_from(self.map, self.checkpointOffset + 4 * (4 * checkpoint + symbol - 1))[0]
+
+        start = self.bwtOffset + checkpoint * self.interval
+
+        return count + self.map[start:self.bwtOffset + row].count(SYMBOL_CHARACTERS[symbol])
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def ranges(self, motif, mismatches=0):
+        """
+        ==============================================================================================
+        SUMMARY: Finds the rows of the suffixes that start with a motif
+        PRE: assigned(motif), optional(mismatches)
+        POST: Returns a list of (first, stop) ranges of rows, one for every distinct string within
+              mismatches mismatches of motif that occurs in the genome; the ranges do not overlap
+        ==============================================================================================
+        """
+
+        found = []
+
+        # (bases of the motif left to match, first row, stop row, mismatches left)
+        stack = [(len(motif), 0, self.rows, mismatches)]
+
+        while len(stack) > 0:
+
+            remaining, first, stop, left = stack.pop()
+
+            if remaining == 0:
+                found.append((first, stop))
+                continue
+
+            # a character other than A, C, G or T never matches, so any base there is a mismatch
+            expected = BASE_SYMBOLS.get(motif[remaining - 1])
+
+            for symbol in xrange(1, 5):
+
+                if symbol == expected:
+                    cost = 0
+                elif left > 0:
+                    cost = 1
+                else:
+                    continue
+
+                symbolFirst = self.firstRows[symbol] + self.occurrences(symbol, first)
+                symbolStop  = self.firstRows[symbol] + self.occurrences(symbol, stop)
+
+                if symbolFirst < symbolStop:
+                    stack.append((remaining - 1, symbolFirst, symbolStop, left - cost))
+
+        return found
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def count(self, motif, mismatches=0):
+        """
+        ==============================================================================================
+        SUMMARY: Counts the occurrences of a motif in the genome
+        PRE: assigned(motif), optional(mismatches)
+        POST: Returns the number of locations where the genome matches motif with up to mismatches
+              mismatches
+        ==============================================================================================
+        """
+
+        return sum(stop - first for first, stop in self.ranges(motif, mismatches))
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def locate(self, motif, mismatches=0):
+        """
+        ==============================================================================================
+        SUMMARY: Finds the occurrences of a motif in the genome
+        PRE: assigned(motif), optional(mismatches)
+        POST: Returns a sorted array of the starting locations (1-based, like Sequence.motifs) where the
+              genome matches motif with up to mismatches mismatches
+        ==============================================================================================
+        """
+
+        locations = array(INDEX_TYPE)
+
+        for first, stop in self.ranges(motif, mismatches):
+
+            suffixes = array(INDEX_TYPE, self.map[self.suffixOffset + 4 * first:self.suffixOffset + 4 * stop])
+
+            # the suffix array is little-endian
+            if sys.byteorder == 'big':
+                suffixes.byteswap()
+
+            locations.extend(suffixes)
+
+        return array(INDEX_TYPE, sorted(location + 1 for location in locations))
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def buildIndex(genome, indexFileName):
+    """
+    ==============================================================================================
+    SUMMARY: Builds the index file of a genome
+    PRE: assigned(genome) (a string of the bases or a genome backend from genomeStorage),
+         assigned(indexFileName)
+    POST: Writes the index of genome to indexFileName and returns the number of bases; the file is
+          written under a temporary name and renamed when complete
+    ==============================================================================================
+    """
+
+    temporaryFileName = indexFileName + '.tmp'
+
+    indexFile = open(temporaryFileName, 'wb')
+
+    try:
+        length = writeIndex(genome, indexFile)
+    finally:
+        indexFile.close()
+
+    os.rename(temporaryFileName, indexFileName)
+
+    return length
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def writeIndex(genome, indexFile):
+    """
+    ==============================================================================================
+    SUMMARY: Writes the index of a genome to an open file
+    PRE: assigned(genome), assigned(indexFile) (open for writing)
+    POST: Writes the header, the suffix array, the bwt and the checkpoints to indexFile and returns the
+          number of bases
+    ==============================================================================================
+    """
+
+    # the symbols of the genome, ended by the symbol that is smaller than every other
+    symbols = str(genome).translate(SYMBOL_TABLE) + SYMBOL_CHARACTERS[END_SYMBOL]
+    length  = len(symbols) - 1
+
+    if length >= 2 ** 31 - 1:
+        raise ValueError('A genome of ' + str(length) + ' bases is too long to index')
+
+    totals = [symbols.count(SYMBOL_CHARACTERS[symbol]) for symbol in xrange(SYMBOLS)]
+
+    indexFile.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, length, CHECKPOINT_INTERVAL, genomeChecksum(genome), *totals))
+
+    if KMER.numpy is not None:
+        suffixes, bwt, checkpoints = indexSectionsVectorized(symbols)
+    else:
+        suffixes, bwt, checkpoints = indexSections(symbols)
+
+    indexFile.write(suffixes)
+    indexFile.write(bwt)
+    indexFile.write(checkpoints)
+
+    return length
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def indexSections(symbols):
+    """
+    ==============================================================================================
+    SUMMARY: Builds the sections of an index
+    PRE: assigned(symbols) (the genome translated with SYMBOL_TABLE and ended by END_SYMBOL)
+    POST: Returns the suffix array, the bwt and the checkpoints as strings in the layout of the file
+    ==============================================================================================
+    """
+
+    symbols  = bytearray(symbols)
+    rows     = len(symbols)
+    suffixes = suffixArray(symbols)
+
+    # the symbol before each suffix; the one before the whole genome is the end of it
+    bwt = bytearray(symbols[suffix - 1] for suffix in suffixes)
+
+    checkpoints = array(INDEX_TYPE)
+    counts      = [0] * SYMBOLS
+
+    for row in xrange(rows + 1):
+
+        if row % CHECKPOINT_INTERVAL == 0:
+            checkpoints.extend(counts[1:5])
+
+        if row < rows:
+            counts[bwt[row]] += 1
+
+    # the file is little-endian
+    if sys.byteorder == 'big':
+        suffixes.byteswap()
+        checkpoints.byteswap()
+
+    return suffixes.tostring(), str(bwt), checkpoints.tostring()
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def suffixArray(symbols):
+    """
+    ==============================================================================================
+    SUMMARY: Sorts the suffixes of a string of symbols by prefix doubling
+    PRE: assigned(symbols) (a bytearray ended by a symbol that occurs nowhere else and is smaller than
+         all the others)
+    POST: Returns an array of the starting locations (0-based) of the suffixes in sorted order
+    ==============================================================================================
+    """
+
+    rows = len(symbols)
+    span = 1
+
+    # the suffixes are first ranked on their first span symbols at once, up to RADIX_SPAN but with no more keys
+    # than suffixes (the symbols past the end count as the end of the genome, which is only ever compared with
+    # itself); each key is found from the one after it
+    while span < RADIX_SPAN and SYMBOLS ** (span + 1) <= rows:
+        span += 1
+
+    keys = array(INDEX_TYPE, [0]) * rows
+    top  = SYMBOLS ** (span - 1)
+    key  = 0
+
+    for suffix in xrange(rows - 1, -1, -1):
+        key = symbols[suffix] * top + key // SYMBOLS
+        keys[suffix] = key
+
+    suffixes    = countingSort(xrange(rows), keys, SYMBOLS ** span)
+    ranks, rank = rankSorted(suffixes, keys)
+    keys        = None
+
+    # then by their first 2 * span symbols, from the ranks of their first span and of the span after them, until
+    # no two are tied
+    while rank < rows - 1:
+
+        # the suffixes in the order of the span after them: those shorter than the span (already ranked on
+        # their own, so in any order), then the rest in the order of the suffix span symbols later
+        following = array(INDEX_TYPE, xrange(max(rows - span, 0), rows))
+        following.extend(suffix - span for suffix in suffixes if suffix >= span)
+        suffixes  = None
+
+        # a stable sort on the ranks of their first span symbols then orders them by both
+        suffixes    = countingSort(following, ranks, rank + 1)
+        following   = None
+        ranks, rank = rankSorted(suffixes, ranks, span)
+        span       *= 2
+
+    return suffixes
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def countingSort(suffixes, keys, size):
+    """
+    ==============================================================================================
+    SUMMARY: Sorts suffixes by a key of each
+    PRE: assigned(suffixes) (an iterable of locations), assigned(keys) (an array of the key of every location,
+         0 to size - 1), assigned(size)
+    POST: Returns an array of the suffixes sorted by their keys; suffixes with the same key stay in the
+          order they are given in
+    ==============================================================================================
+    """
+
+    # the first location of each key in the sorted array
+    starts = array(INDEX_TYPE, [0]) * (size + 1)
+
+    for key in keys:
+        starts[key + 1] += 1
+
+    for key in xrange(size):
+        starts[key + 1] += starts[key]
+
+    sortedSuffixes = array(INDEX_TYPE, [0]) * len(keys)
+
+    for suffix in suffixes:
+        key = keys[suffix]
+        sortedSuffixes[starts[key]] = suffix
+        starts[key] += 1
+
+    return sortedSuffixes
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def rankSorted(suffixes, keys, span=0):
+    """
+    ==============================================================================================
+    SUMMARY: Ranks sorted suffixes
+    PRE: assigned(suffixes) (an array sorted by the keys), assigned(keys) (an array of the key of every
+         location), optional(span) (if given, a suffix is keyed by keys[suffix] and then by keys[suffix + span],
+         which is smallest past the end)
+    POST: Returns an array of the rank of every suffix (the number of distinct keys sorted before its own) and
+          the highest rank
+    ==============================================================================================
+    """
+
+    rows  = len(suffixes)
+    ranks = array(INDEX_TYPE, [0]) * rows
+    rank  = 0
+
+    previous          = suffixes[0]
+    previousKey       = keys[previous]
+    previousFollowing = keys[previous + span] if span and previous + span < rows else -1
+
+    for i in xrange(1, rows):
+
+        suffix    = suffixes[i]
+        key       = keys[suffix]
+        following = keys[suffix + span] if span and suffix + span < rows else -1
+
+        if key != previousKey or following != previousFollowing:
+            rank += 1
+
+        ranks[suffix]     = rank
+        previousKey       = key
+        previousFollowing = following
+
+    return ranks, rank
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def indexSectionsVectorized(symbols):
+    """
+    ==============================================================================================
+    SUMMARY: Builds the sections of an index with numpy
+    PRE: assigned(symbols), numpy is installed
+    POST: Returns the same strings as indexSections
+    ==============================================================================================
+    """
+
+    numpy = KMER.numpy
+
+    symbols = numpy.frombuffer(symbols, dtype=numpy.uint8)
+    rows    = len(symbols)
+
+    # the first rounds are skipped by ranking the suffixes on their first INITIAL_SPAN symbols at once
+    # (the symbols past the end count as the end of the genome, which is only ever compared with itself)
+    keys = numpy.zeros(rows, dtype=numpy.int64)
+
+    for i in xrange(min(INITIAL_SPAN, rows)):
+        keys[:rows - i] += symbols[i:].astype(numpy.int64) * SYMBOLS ** (INITIAL_SPAN - 1 - i)
+
+    distinct, ranks = numpy.unique(keys, return_inverse=True)
+
+    ranks = ranks.astype(numpy.int64)
+    span  = INITIAL_SPAN
+
+    if len(distinct) == rows:
+        suffixes = numpy.empty(rows, dtype=numpy.int64)
+        suffixes[ranks] = numpy.arange(rows, dtype=numpy.int64)
+        span = 0
+
+    while span > 0:
+
+        following = numpy.zeros(rows, dtype=numpy.int64)
+        following[:rows - span] = ranks[span:] + 1
+
+        # ties get the same rank, so the sort need not be stable
+        keys     = (ranks << 32) | following
+        suffixes = numpy.argsort(keys)
+
+        sortedKeys = keys[suffixes]
+
+        # a new rank starts wherever the key changes
+        changes    = numpy.zeros(rows, dtype=numpy.int64)
+        changes[1:] = sortedKeys[1:] != sortedKeys[:-1]
+
+        newRanks = numpy.cumsum(changes)
+
+        ranks = numpy.empty(rows, dtype=numpy.int64)
+        ranks[suffixes] = newRanks
+
+        if newRanks[-1] == rows - 1:
+            break
+
+        span *= 2
+
+    bwt = symbols[suffixes - 1]
+
+    checkpoints = numpy.zeros((rows // CHECKPOINT_INTERVAL + 1, 4), dtype='<i4')
+
+    for symbol in xrange(1, 5):
+        counts = numpy.concatenate(([0], numpy.cumsum(bwt == symbol)))
+        checkpoints[:, symbol - 1] = counts[::CHECKPOINT_INTERVAL]
+
+    return suffixes.astype('<i4').tostring(), bwt.tostring(), checkpoints.tostring()
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def genomeChecksum(genome):
+    """
+    ==============================================================================================
+    SUMMARY: Finds the checksum of the bases of a genome
+    PRE: assigned(genome) (a string of the bases or a genome backend from genomeStorage)
+    POST: Returns the CRC-32 of the bases as an unsigned 32-bit integer, read CHECKSUM_CHUNK bases at a time
+    ==============================================================================================
+    """
+
+    checksum = 0
+
+    for start in xrange(0, len(genome), CHECKSUM_CHUNK):
+        checksum = zlib.crc32(genome[start:start + CHECKSUM_CHUNK], checksum)
+
+    return checksum & 0xffffffff
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def loadIndex(genome, indexFileName):
+    """
+    ==============================================================================================
+    SUMMARY: Loads the index of a genome, building it the first time
+    PRE: assigned(genome) (the genome backend), optional(indexFileName) (the .fna.fmi file next to the genome)
+    POST: Returns the index memory-mapped from indexFileName, building that file first if it does not
+          exist or was built from other bases (its length or checksum differs from the genome's, or it
+          is in an older format); if indexFileName is None or cannot be written, the index is built in
+          memory
+    ==============================================================================================
+    """
+
+    if indexFileName is None:
+        return GenomeIndex.fromGenome(genome)
+
+    if os.path.exists(indexFileName):
+
+        try:
+            index = GenomeIndex(indexFileName)
+        except (ValueError, struct.error):
+            index = None
+
+        # the length is checked first, so a stale index of another length is rejected without reading the genome
+        if index is not None and len(index) == len(genome) and index.checksum == genomeChecksum(genome):
+            return index
+
+    try:
+        buildIndex(genome, indexFileName)
+    except (IOError, OSError):
+        return GenomeIndex.fromGenome(genome)
+
+    return GenomeIndex(indexFileName)
+#-----------------------------------------------------------------------------------------------------------------#
@@ -0,0 +1,506 @@
+"""
+-----------------------------------------------------------------------------------------------------------------
+genomeStorage.py
+Programmer: Chris DeMolles
+
+Tested with Python 2.7.3
+
+This module defines the storage backends for a bug's genome. A backend behaves like a read-only string of the bases
+(len, 0-based indexing and slicing, iteration, str), so Sequence can wrap it in place of a string, but it does not
+keep the genome on the heap.
+
+MappedGenome memory-maps a .fna.oneline file. Indexing or slicing only reads the bases asked for, and every process
+that maps the same file shares its pages through the page cache.
+
+PackedGenome memory-maps a .fna.packed file, which stores two bits per base (a quarter of the size of the text):
+
+    header      magic 'WGPK', format version, number of bases, number of exception runs, offset of the runs
+    bases       4 bases per byte, the first base in the two highest bits (A = 0, C = 1, G = 2, T = 3), so each
+                byte is also the code of a 4-mer in kmerFunctions
+    exceptions  one (start, length, character) run for every stretch of a character other than A, C, G or T
+                (N and the other ambiguity codes), stored as A in the packed bases
+
+packFasta builds a .fna.packed file from a .fna file, and PackedGenome.fromFasta packs a .fna file in memory when no
+.fna.packed file has been built.
+-----------------------------------------------------------------------------------------------------------------
+"""
+
+from array import array
+from cStringIO import StringIO
+import bisect, mmap, os, struct
+import fasta
+
+# layout of the .fna.packed header and of each exception run (all little-endian)
+PACKED_MAGIC     = 'WGPK'
+PACKED_VERSION   = 1
+PACKED_HEADER    = struct.Struct('<4sIQQQ')
+PACKED_EXCEPTION = struct.Struct('<QQc')
+
+# the four bases (as text and as 2-bit codes) stored in each possible byte
+PACKED_BASES = [''.join('ACGT'[(byte >> shift) & 3] for shift in (6, 4, 2, 0)) for byte in xrange(256)]
+PACKED_CODES = [''.join(chr((byte >> shift) & 3) for shift in (6, 4, 2, 0)) for byte in xrange(256)]
+
+# the byte holding four bases of text
+PACKED_BYTES = dict((PACKED_BASES[byte], chr(byte)) for byte in xrange(256))
+
+
+class MappedGenome(object):
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def __init__(self, fileName):
+        """
+        ==============================================================================================
+        SUMMARY: Initializes mapped genome object
+        PRE: assigned(fileName) (a .fna.oneline file: a bogus 'X' followed by the genome on one line)
+        POST: Memory-maps fileName and finds the number of bases in it
+        ==============================================================================================
+        """
+
+        self.fileName = fileName
+
+        genomeFile = open(fileName, 'rb')
+
+        try:
+            self.map = mmap.mmap(genomeFile.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            # the map keeps its own handle on the file
+            genomeFile.close()
+
+        # the bases start after the bogus 'X'; any whitespace at the end of the line is not a base
+        end = len(self.map)
+        while end > 1 and self.map[end - 1].isspace():
+            end -= 1
+
+        self.offset = 1
+        self.length = max(0, end - self.offset)
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def __len__(self):
+        """
+        ==============================================================================================
+        SUMMARY: Returns the number of bases in the genome
+        PRE: assigned(self.length)
+        POST: Returns self.length
+        ==============================================================================================
+        """
+
+        return self.length
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def __getitem__(self, key):
+        """
+        ==============================================================================================
+        SUMMARY: Overloads indexing and slicing operator (0-based, like a string)
+        PRE: assigned(self.map), assigned(key)
+        POST: Returns the base or bases at key as a string, reading only those bases from the file
+        ==============================================================================================
+        """
+
+        if isinstance(key, slice):
+
+            start, stop, step = key.indices(self.length)
+
+            if step == 1:
+                if stop <= start:
+                    return ''
+                return self.map[self.offset + start:self.offset + stop]
+
+            return ''.join(self.map[self.offset + i] for i in xrange(start, stop, step))
+
+        if key < 0:
+            key += self.length
+
+        if key < 0 or key >= self.length:
+            raise IndexError('genome index out of range')
+
+        return self.map[self.offset + key]
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def __iter__(self):
+        """
+        ==============================================================================================
+        SUMMARY: Iterates over the bases of the genome
+        PRE: assigned(self.map)
+        POST: Yields each base in order
+        ==============================================================================================
+        """
+
+        return iter(str(self))
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def __str__(self):
+        """
+        ==============================================================================================
+        SUMMARY: Overloads the string casting operator
+        PRE: assigned(self.map)
+        POST: Returns the whole genome as a string (this reads the whole file)
+        ==============================================================================================
+        """
+
+        return self.map[self.offset:self.offset + self.length]
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+class PackedGenome(object):
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def __init__(self, fileName):
+        """
+        ==============================================================================================
+        SUMMARY: Initializes packed genome object
+        PRE: assigned(fileName) (a .fna.packed file written by packFasta)
+        POST: Memory-maps fileName and reads its header and exception runs
+        ==============================================================================================
+        """
+
+        self.fileName = fileName
+
+        genomeFile = open(fileName, 'rb')
+
+        try:
+            self.map = mmap.mmap(genomeFile.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            # the map keeps its own handle on the file
+            genomeFile.close()
+
+        self.readHeader()
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    @classmethod
+    def fromFasta(cls, fastaFileName):
+        """
+        ==============================================================================================
+        SUMMARY: Packs a FASTA (.fna or gzipped .fna) file in memory
+        PRE: assigned(fastaFileName)
+        POST: Returns a packed genome object holding the packed bases of fastaFileName in a string
+              (a quarter of the size of the text) instead of a memory-mapped file
+        ==============================================================================================
+        """
+
+        packedFile = StringIO()
+
+        writePacked(fastaFileName, packedFile)
+
+        genome = cls.__new__(cls)
+
+        genome.fileName = fastaFileName
+        genome.map      = packedFile.getvalue()
+
+        genome.readHeader()
+
+        return genome
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def readHeader(self):
+        """
+        ==============================================================================================
+        SUMMARY: Reads the header and the exception runs of the packed genome
+        PRE: assigned(self.map), assigned(self.fileName)
+        POST: Sets the length, the offset of the bases and the arrays of exception runs
+        ==============================================================================================
+        """
+
+        magic, version, self.length, numberOfExceptions, exceptionOffset = PACKED_HEADER.unpack_from(self.map, 0)
+
+        if magic != PACKED_MAGIC or version != PACKED_VERSION:
+            raise ValueError(self.fileName + ' is not a packed genome file')
+
+        self.offset = PACKED_HEADER.size
+
+        # the exception runs are few, so they are read into sorted arrays
+        self.exceptionStarts     = array('l')
+        self.exceptionEnds       = array('l')
+        self.exceptionCharacters = []
+
+        for i in xrange(numberOfExceptions):
+            start, length, character = PACKED_EXCEPTION.unpack_from(self.map, exceptionOffset + i * PACKED_EXCEPTION.size)
+            self.exceptionStarts.append(start)
+            self.exceptionEnds.append(start + length)
+            self.exceptionCharacters.append(character)
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def __len__(self):
+        """
+        ==============================================================================================
+        SUMMARY: Returns the number of bases in the genome
+        PRE: assigned(self.length)
+        POST: Returns self.length
+        ==============================================================================================
+        """
+
+        return self.length
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def __getitem__(self, key):
+        """
+        ==============================================================================================
+        SUMMARY: Overloads indexing and slicing operator (0-based, like a string)
+        PRE: assigned(self.map), assigned(key)
+        POST: Returns the base or bases at key as a string, unpacking only the bytes that hold them
+        ==============================================================================================
+        """
+
+        if isinstance(key, slice):
+
+            start, stop, step = key.indices(self.length)
+
+            if step == 1:
+                return self.unpack(start, stop, PACKED_BASES, True)
+
+            return ''.join(self[i] for i in xrange(start, stop, step))
+
+        if key < 0:
+            key += self.length
+
+        if key < 0 or key >= self.length:
+            raise IndexError('genome index out of range')
+
+        return self.unpack(key, key + 1, PACKED_BASES, True)
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def __iter__(self):
+        """
+        ==============================================================================================
+        SUMMARY: Iterates over the bases of the genome
+        PRE: assigned(self.map)
+        POST: Yields each base in order
+        ==============================================================================================
+        """
+
+        return iter(str(self))
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def __str__(self):
+        """
+        ==============================================================================================
+        SUMMARY: Overloads the string casting operator
+        PRE: assigned(self.map)
+        POST: Returns the whole genome as a string (this unpacks the whole file)
+        ==============================================================================================
+        """
+
+        return self.unpack(0, self.length, PACKED_BASES, True)
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def baseCodes(self, start=0, stop=None):
+        """
+        ==============================================================================================
+        SUMMARY: Returns the 2-bit codes of the bases from start to stop (0-based, stop excluded)
+        PRE: assigned(self.map), optional(start), optional(stop)
+        POST: Returns a bytearray like kmerFunctions.encodeBases, without going through text
+        ==============================================================================================
+        """
+
+        if stop is None:
+            stop = self.length
+
+        return bytearray(self.unpack(start, stop, PACKED_CODES, False))
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def unpack(self, start, stop, table, text):
+        """
+        ==============================================================================================
+        SUMMARY: Unpacks the bases from start to stop (0-based, stop excluded)
+        PRE: assigned(self.map), assigned(start), assigned(stop), assigned(table) (PACKED_BASES or PACKED_CODES),
+             assigned(text) (True for PACKED_BASES)
+        POST: Returns the bases as a string of characters (text) or of codes, with the exception runs
+              put back as their characters (text) or as code 4
+        ==============================================================================================
+        """
+
+        if stop <= start:
+            return ''
+
+        # unpack every byte that holds part of the range, then trim the bases outside of it
+        firstByte = start >> 2
+        lastByte  = (stop + 3) >> 2
+
+        packed   = self.map[self.offset + firstByte:self.offset + lastByte]
+        unpacked = ''.join(map(table.__getitem__, bytearray(packed)))
+        unpacked = unpacked[start - (firstByte << 2):stop - (firstByte << 2)]
+
+        # find the exception runs that end after start; the ones that also begin before stop overlap
+        first = bisect.bisect_right(self.exceptionEnds, start)
+
+        if first == len(self.exceptionStarts) or self.exceptionStarts[first] >= stop:
+            return unpacked
+
+        unpacked = bytearray(unpacked)
+
+        for i in xrange(first, len(self.exceptionStarts)):
+
+            if self.exceptionStarts[i] >= stop:
+                break
+
+            runStart = max(self.exceptionStarts[i], start) - start
+            runStop  = min(self.exceptionEnds[i], stop) - start
+
+            character = self.exceptionCharacters[i] if text else '\x04'
+
+            unpacked[runStart:runStop] = character * (runStop - runStart)
+
+        return str(unpacked)
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def packFasta(fastaFileName, packedFileName):
+    """
+    ==============================================================================================
+    SUMMARY: Converts a FASTA (.fna or gzipped .fna) file to a packed genome file
+    PRE: assigned(fastaFileName), assigned(packedFileName)
+    POST: Writes the bases of every record of fastaFileName, one after the other, to packedFileName
+          and returns the number of bases; the file is written under a temporary name and renamed
+          when complete
+    ==============================================================================================
+    """
+
+    temporaryFileName = packedFileName + '.tmp'
+
+    packedFile = open(temporaryFileName, 'wb')
+
+    try:
+        length = writePacked(fastaFileName, packedFile)
+    finally:
+        packedFile.close()
+
+    os.rename(temporaryFileName, packedFileName)
+
+    return length
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def writePacked(fastaFileName, packedFile):
+    """
+    ==============================================================================================
+    SUMMARY: Packs the bases of a FASTA (.fna or gzipped .fna) file into an open file
+    PRE: assigned(fastaFileName), assigned(packedFile) (open for writing and seekable, at its start)
+    POST: Writes the header, the packed bases and the exception runs to packedFile and returns the
+          number of bases; the FASTA file is read a chunk at a time
+    ==============================================================================================
+    """
+
+    # leave room for the header, which is written once the length is known
+    packedFile.write('\x00' * PACKED_HEADER.size)
+
+    exceptions = []
+    length     = 0
+
+    # bases left over from the previous chunk (fewer than 4)
+    leftover = ''
+
+    for chunk in fasta.readChunks(fastaFileName):
+
+        bases = chunk.text
+
+        # record the runs of characters other than A, C, G or T and pack them as A
+        if bases.translate(None, 'ACGT') != '':
+
+            cleaned = bytearray(bases)
+
+            for i in xrange(len(bases)):
+
+                character = bases[i]
+
+                if character in 'ACGT':
+                    continue
+
+                location = length + i
+
+                # extend the previous run if it is the same character and ends here
+                if len(exceptions) > 0 and exceptions[-1][2] == character and exceptions[-1][0] + exceptions[-1][1] == location:
+                    exceptions[-1][1] += 1
+                else:
+                    exceptions.append([location, 1, character])
+
+                cleaned[i] = 'A'
+
+            bases = str(cleaned)
+
+        length += len(bases)
+
+        bases     = leftover + bases
+        whole     = len(bases) - len(bases) % 4
+        leftover  = bases[whole:]
+
+        packedFile.write(''.join(PACKED_BYTES[bases[i:i + 4]] for i in xrange(0, whole, 4)))
+
+    # pad the last byte with A
+    if len(leftover) > 0:
+        packedFile.write(PACKED_BYTES[leftover + 'A' * (4 - len(leftover))])
+
+    exceptionOffset = packedFile.tell()
+
+    for start, runLength, character in exceptions:
+        packedFile.write(PACKED_EXCEPTION.pack(start, runLength, character))
+
+    packedFile.seek(0)
+    packedFile.write(PACKED_HEADER.pack(PACKED_MAGIC, PACKED_VERSION, length, len(exceptions), exceptionOffset))
+
+    return length
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def findFasta(genomeFileName):
+    """
+    ==============================================================================================
+    SUMMARY: Finds the FASTA file holding a genome
+    PRE: assigned(genomeFileName) (a .fna file name)
+    POST: Returns genomeFileName, or genomeFileName + '.gz' if only the gzipped file exists
+    ==============================================================================================
+    """
+
+    if not os.path.exists(genomeFileName) and os.path.exists(genomeFileName + '.gz'):
+        return genomeFileName + '.gz'
+
+    return genomeFileName
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def loadGenome(genomeFileName):
+    """
+    ==============================================================================================
+    SUMMARY: Loads a genome from the best copy there is
+    PRE: assigned(genomeFileName) (a .fna file name)
+    POST: Returns the genome memory-mapped from the packed copy (genomeFileName + '.packed') or the
+          oneline copy (genomeFileName + '.oneline') if there is one; otherwise the .fna file (or a
+          gzipped genomeFileName + '.gz') is read a chunk at a time and packed in memory
+    ==============================================================================================
+    """
+
+    # the packed copy is a quarter of the size, so read it if it has been built
+    if os.path.exists(genomeFileName + '.packed'):
+        return PackedGenome(genomeFileName + '.packed')
+
+    if os.path.exists(genomeFileName + '.oneline'):
+        return MappedGenome(genomeFileName + '.oneline')
+
+    return PackedGenome.fromFasta(findFasta(genomeFileName))
+#-----------------------------------------------------------------------------------------------------------------#
@@ -0,0 +1,283 @@
+"""
+-----------------------------------------------------------------------------------------------------------------
+instrumentation.py
+Programmer: Chris DeMolles
+
+Tested with Python 2.7.3
+
+This module measures where the time of a run goes. Each stage (loading a bug, retrieving its sequences, finding
+motifs, building inverted repeat sets, ...) records its wall time, its number of calls and the number of bases it
+processed, and the largest sets and dictionaries built along the way are recorded as peaks. snapshot hands back
+everything recorded since the last reset, so a script can reset before each bug and log its stages after it.
+
+Instrumentation is off unless the WG_INSTRUMENT environment variable is set (to anything but 0) or enable is called.
+When it is off, a timed function costs one extra call and test, and stage hands back one shared object that does
+nothing, so it can be left in place around the main steps. enable also sets WG_INSTRUMENT, so processes started
+after it (for example pool workers) are instrumented as well.
+-----------------------------------------------------------------------------------------------------------------
+"""
+
+import functools, os, time
+
+# the environment variable that turns instrumentation on
+ENVIRONMENT_VARIABLE = 'WG_INSTRUMENT'
+
+_enabled = os.environ.get(ENVIRONMENT_VARIABLE, '0') not in ('', '0')
+
+# the seconds, calls and bases of each stage, and the largest size of each peak, since the last reset
+_stages = {}
+_peaks  = {}
+
+
+class Stage(object):
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def __init__(self, name, bases):
+        """
+        ==============================================================================================
+        SUMMARY: Initializes stage object
+        PRE: assigned(name), assigned(bases)
+        POST: Initializes a stage that records name with bases bases when its with block ends
+        ==============================================================================================
+        """
+
+        self.name  = name
+        self.bases = bases
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def __enter__(self):
+        """
+        ==============================================================================================
+        SUMMARY: Starts timing the stage
+        PRE: None
+        POST: Notes the time and returns the stage
+        ==============================================================================================
+        """
+
+        self.started = time.time()
+
+        return self
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def __exit__(self, exceptionType, exception, traceback):
+        """
+        ==============================================================================================
+        SUMMARY: Stops timing the stage
+        PRE: assigned(self.started)
+        POST: Records the time since __enter__ (even if the block raised an exception, which is not caught)
+        ==============================================================================================
+        """
+
+        record(self.name, time.time() - self.started, self.bases)
+
+        return False
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+class NullStage(object):
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def __enter__(self):
+        """
+        ==============================================================================================
+        SUMMARY: Does nothing (instrumentation is off)
+        PRE: None
+        POST: Returns the stage
+        ==============================================================================================
+        """
+
+        return self
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def __exit__(self, exceptionType, exception, traceback):
+        """
+        ==============================================================================================
+        SUMMARY: Does nothing (instrumentation is off)
+        PRE: None
+        POST: Returns False, so exceptions are not caught
+        ==============================================================================================
+        """
+
+        return False
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+# the stage handed back by every call to stage while instrumentation is off
+NULL_STAGE = NullStage()
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def enable():
+    """
+    ==============================================================================================
+    SUMMARY: Turns instrumentation on
+    PRE: None
+    POST: Records stages and peaks from now on, in this process and in the processes it starts
+    ==============================================================================================
+    """
+
+    global _enabled
+
+    _enabled = True
+
+    os.environ[ENVIRONMENT_VARIABLE] = '1'
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def isEnabled():
+    """
+    ==============================================================================================
+    SUMMARY: Tells whether instrumentation is on
+    PRE: None
+    POST: Returns True if stages and peaks are being recorded
+    ==============================================================================================
+    """
+
+    return _enabled
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def record(name, seconds, bases=0):
+    """
+    ==============================================================================================
+    SUMMARY: Records one call of a stage
+    PRE: assigned(name), assigned(seconds), optional(bases)
+    POST: Adds seconds, one call and bases to the totals of name if instrumentation is on
+    ==============================================================================================
+    """
+
+    if not _enabled:
+        return
+
+    totals = _stages.get(name)
+
+    if totals is None:
+        totals = _stages[name] = [0.0, 0, 0]
+
+    totals[0] += seconds
+    totals[1] += 1
+    totals[2] += bases
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def peak(name, size):
+    """
+    ==============================================================================================
+    SUMMARY: Records the size of a set or dictionary
+    PRE: assigned(name), assigned(size)
+    POST: Keeps size as the peak of name if it is the largest so far and instrumentation is on
+    ==============================================================================================
+    """
+
+    if _enabled and size > _peaks.get(name, -1):
+        _peaks[name] = size
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def stage(name, bases=0):
+    """
+    ==============================================================================================
+    SUMMARY: Times a block of code as a stage
+    PRE: assigned(name), optional(bases)
+    POST: Returns a context manager that records the time of its with block under name (with bases
+          bases), or NULL_STAGE if instrumentation is off
+    ==============================================================================================
+    """
+
+    if not _enabled:
+        return NULL_STAGE
+
+    return Stage(name, bases)
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def timed(name, bases=None):
+    """
+    ==============================================================================================
+    SUMMARY: Decorates a function so each of its calls is recorded as a stage
+    PRE: assigned(name), optional(bases) (a function of the same arguments that returns the number of
+         bases the call processes; only called when instrumentation is on)
+    POST: Returns the decorator
+    ==============================================================================================
+    """
+
+    def decorate(function):
+
+        @functools.wraps(function)
+        def wrapper(*arguments, **keywords):
+
+            if not _enabled:
+                return function(*arguments, **keywords)
+
+            started = time.time()
+
+            try:
+                return function(*arguments, **keywords)
+            finally:
+                record(name, time.time() - started, bases(*arguments, **keywords) if bases is not None else 0)
+
+        return wrapper
+
+    return decorate
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def sequenceLength(sequence, *arguments, **keywords):
+    """
+    ==============================================================================================
+    SUMMARY: Counts the bases processed by a method of a sequence (for the bases of timed)
+    PRE: assigned(sequence) (the sequence the method was called on)
+    POST: Returns the length of sequence
+    ==============================================================================================
+    """
+
+    return len(sequence)
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def reset():
+    """
+    ==============================================================================================
+    SUMMARY: Forgets the stages and peaks recorded so far
+    PRE: None
+    POST: Empties the totals of every stage and peak
+    ==============================================================================================
+    """
+
+    _stages.clear()
+    _peaks.clear()
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def snapshot():
+    """
+    ==============================================================================================
+    SUMMARY: Returns what has been recorded since the last reset
+    PRE: None
+    POST: Returns a dictionary (made of numbers, strings and dictionaries, so it can be written as JSON)
+          with 'stages', a dictionary from each stage to its 'seconds', 'calls' and 'bases', and
+          'peaks', a dictionary from each peak to its largest size
+    ==============================================================================================
+    """
+
+    stages = {}
+
+    for name, (seconds, calls, bases) in _stages.iteritems():
+        stages[name] = {'seconds': seconds, 'calls': calls, 'bases': bases}
+
+    return {'stages': stages, 'peaks': dict(_peaks)}
+#-----------------------------------------------------------------------------------------------------------------#
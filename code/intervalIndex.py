@@ -0,0 +1,186 @@
+"""
+-----------------------------------------------------------------------------------------------------------------
+intervalIndex.py
+Programmer: Chris DeMolles
+
+Tested with Python 2.7.3
+
+This module defines the IntervalIndex class. An IntervalIndex stores closed intervals [start, end] sorted by their
+start and answers "which intervals overlap [start, end]?" in O(log n + k) time, where k is the number of intervals
+reported.
+
+The sorted array is treated as an implicit binary search tree (the element in the middle of every run of 2^i
+elements is the parent of the two halves), and every node also stores the largest end in its subtree. A query only
+descends into subtrees whose largest end reaches the start of the query and whose first start is not past its end.
+-----------------------------------------------------------------------------------------------------------------
+"""
+
+from array import array
+
+
+class IntervalIndex(object):
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def __init__(self, intervals):
+        """
+        ==============================================================================================
+        SUMMARY: Initializes interval index object
+        PRE: assigned(intervals) (a list of (start, end, value) tuples with start <= end)
+        POST: Sorts the intervals by start and end and builds the largest end of every subtree
+        ==============================================================================================
+        """
+
+        intervals = sorted(intervals, key=lambda interval: (interval[0], interval[1]))
+
+        self.starts  = array('l', [interval[0] for interval in intervals])
+        self.ends    = array('l', [interval[1] for interval in intervals])
+        self.values  = [interval[2] for interval in intervals]
+        self.maxEnds = array('l', self.ends)
+
+        self.levels = self.buildMaxEnds()
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def __len__(self):
+        """
+        ==============================================================================================
+        SUMMARY: Returns the number of intervals in the index
+        PRE: assigned(self.starts)
+        POST: Returns the length of self.starts
+        ==============================================================================================
+        """
+
+        return len(self.starts)
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def buildMaxEnds(self):
+        """
+        ==============================================================================================
+        SUMMARY: Stores the largest end of every subtree of the implicit tree in self.maxEnds
+        PRE: assigned(self.ends), assigned(self.maxEnds) (a copy of self.ends)
+        POST: Returns the level of the root of the tree (-1 if there are no intervals)
+        ==============================================================================================
+        """
+
+        n = len(self.ends)
+
+        if n == 0:
+            return -1
+
+        # the leaves are the even elements; lastIndex follows the right-most node at each level,
+        # whose subtree may be missing its right half
+        lastIndex = 0
+        lastEnd   = 0
+
+        for i in xrange(0, n, 2):
+            lastIndex = i
+            lastEnd   = self.maxEnds[i]
+
+        level = 1
+
+        while (1 << level) <= n:
+
+            half = 1 << (level - 1)
+
+            for i in xrange((half << 1) - 1, n, half << 2):
+
+                leftEnd  = self.maxEnds[i - half]
+                rightEnd = self.maxEnds[i + half] if i + half < n else lastEnd
+
+                self.maxEnds[i] = max(self.ends[i], leftEnd, rightEnd)
+
+            # move lastIndex up to its parent
+            if (lastIndex >> level) & 1:
+                lastIndex -= half
+            else:
+                lastIndex += half
+
+            if lastIndex < n and self.maxEnds[lastIndex] > lastEnd:
+                lastEnd = self.maxEnds[lastIndex]
+
+            level += 1
+
+        return level - 1
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def overlapping(self, start, end):
+        """
+        ==============================================================================================
+        SUMMARY: Finds the positions of the intervals that overlap [start, end]
+        PRE: assigned(start), assigned(end)
+        POST: Returns a sorted list of the positions (in start order) of every interval that shares
+              at least one location with [start, end]
+        ==============================================================================================
+        """
+
+        positions = []
+
+        n = len(self.starts)
+
+        if self.levels < 0:
+            return positions
+
+        # each entry is (node, level, whether the left subtree has already been visited)
+        stack = [((1 << self.levels) - 1, self.levels, False)]
+
+        while stack:
+
+            node, level, leftVisited = stack.pop()
+
+            # small subtrees are scanned directly
+            if level <= 3:
+
+                first = node >> level << level
+                last  = min(first + (1 << (level + 1)) - 1, n)
+
+                for i in xrange(first, last):
+
+                    if self.starts[i] > end:
+                        break
+
+                    if self.ends[i] >= start:
+                        positions.append(i)
+
+            elif not leftVisited:
+
+                # come back to this node after the left subtree
+                stack.append((node, level, True))
+
+                left = node - (1 << (level - 1))
+
+                # only go left if some interval there may reach start
+                if left >= n or self.maxEnds[left] >= start:
+                    stack.append((left, level - 1, False))
+
+            elif node < n and self.starts[node] <= end:
+
+                if self.ends[node] >= start:
+                    positions.append(node)
+
+                # the right subtree only starts at or after this node
+                stack.append((node + (1 << (level - 1)), level - 1, False))
+
+        positions.sort()
+
+        return positions
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def query(self, start, end):
+        """
+        ==============================================================================================
+        SUMMARY: Finds the intervals that overlap [start, end]
+        PRE: assigned(start), assigned(end)
+        POST: Returns a list of the values of every interval that shares at least one location with
+              [start, end], ordered by start and end
+        ==============================================================================================
+        """
+
+        return [self.values[i] for i in self.overlapping(start, end)]
+    #-----------------------------------------------------------------------------------------------------------------#
@@ -0,0 +1,867 @@
+"""
+-----------------------------------------------------------------------------------------------------------------
+irFunctions.py
+Programmer: Chris DeMolles
+
+Tested with Python 2.7.3
+
+This module counts potential inverted repeats without enumerating them. Instead of building an identifier for every
+pairing of a motif with one of its reverse complements, the number of pairings is computed from the number of times
+each motif occurs. Only the pairings that overlap (which are never counted) have to be found, and they can only be
+less than a stem-length apart, so they are found by looking a few codes to either side of each location. Motifs are
+the integer codes from kmerFunctions.
+
+Any number of mismatches is allowed. For short stems or few mismatches, the reverse complements of a motif with
+mismatches are few enough to list (dnaFunctions). Otherwise (stems of 10 to 12 with 2 or 3 mismatches have thousands)
+the partners are found with a pigeonhole seed index: the stem is split into mismatches + 1 blocks, two motifs within
+that many mismatches agree exactly on at least one block, so only the motifs sharing a block with the reverse
+complement are compared to it.
+
+The counts are identical to the sizes of the sets built by Sequence.getInvertedRepeats. countInvertedRepeatsInChunks
+gives the same counts for a genome read a chunk at a time by the fasta module.
+
+findHairpins only pairs stems separated by a loop of a bounded length. It makes one pass over the sequence per
+stem-length, keeping the second stems that start the right distance ahead in a window keyed by code, so its work is
+linear in the length of the sequence times the size of the window. The hairpins are packed into an array as they are
+found, already in order, and the stem-lengths are merged at the end.
+-----------------------------------------------------------------------------------------------------------------
+"""
+
+from array import array
+from collections import deque
+import functools, heapq, itertools
+import dnaFunctions as DNA
+import instrumentation as INSTRUMENT
+import kmerFunctions as KMER
+
+# largest number of reverse complements with mismatches that are listed rather than found with a seed index
+ENUMERATION_LIMIT = 128
+
+# findHairpins packs each hairpin into this many integers of this array type
+HAIRPIN_FIELDS = 4
+HAIRPIN_TYPE   = 'i'
+
+# the low bit of every base of a motif, for each length
+LOW_BITS = [int('01' * length, 2) if length > 0 else 0 for length in xrange(33)]
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def countInvertedRepeats(codes, sequenceLength, min, max, mismatches, type='pairings'):
+    """
+    ==============================================================================================
+    SUMMARY: Counts the potential inverted repeats of stem-length min to max (inclusive) with mismatches
+    PRE: assigned(codes) (a dictionary from each stem-length to KMER.encodeKmers(sequence, stem-length)),
+         assigned(sequenceLength), assigned(min), assigned(max), assigned(mismatches), optional(type)
+    POST: Returns a dictionary with the key as the stem-length of the IR and the value as the
+          number of IRs of that stem-length ('pairings') or the number of bases covered by
+          IRs of that stem-length ('nucleotides')
+    ==============================================================================================
+    """
+
+    return countInvertedRepeatsByMismatches(codes, sequenceLength, min, max, [mismatches], type)[mismatches]
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def countInvertedRepeatsByMismatches(codes, sequenceLength, min, max, mismatchLevels, type='pairings'):
+    """
+    ==============================================================================================
+    SUMMARY: Counts the potential inverted repeats of stem-length min to max (inclusive) for several
+             numbers of mismatches at once
+    PRE: assigned(codes) (a dictionary from each stem-length to KMER.encodeKmers(sequence, stem-length)),
+         assigned(sequenceLength), assigned(min), assigned(max), assigned(mismatchLevels) (a list of
+         numbers of mismatches), optional(type)
+    POST: Returns a dictionary with each number of mismatches as the key and the dictionary returned by
+          countInvertedRepeats for that number of mismatches as the value; with type 'coverage', the
+          value of each stem-length is a bytearray of sequenceLength + 1 flags instead (flag i is 1 if
+          base i, 1-based, is covered by an IR), so memory stays proportional to the sequence
+    ==============================================================================================
+    """
+
+    levels = sorted(set(mismatchLevels))
+    most   = levels[-1]
+
+    # initialize a zero count for every number of mismatches and stem-length
+    counts = dict((mismatches, dict((length, 0) for length in xrange(min, max + 1))) for mismatches in levels)
+
+    for length in xrange(min, max + 1):
+
+        motifCodes = codes[length]
+
+        # the number of times each motif occurs
+        motifCounts = KMER.codeCounts(motifCodes, length)
+
+        # the partners with the most mismatches include the ones with fewer, so they are only found once,
+        # along with the number of mismatches of each
+        partnerMismatches = findPartnerMismatches(motifCounts, length, most)
+
+        INSTRUMENT.peak('countInvertedRepeats.motifs', len(motifCounts))
+        # the entries of the partner dictionaries, not the motifs that have partners
+        if INSTRUMENT.isEnabled():
+            INSTRUMENT.peak('countInvertedRepeats.partners', sum(len(motifMismatches) for motifMismatches in partnerMismatches.itervalues()))
+
+        # the total number of times the partners of each motif with up to each number of mismatches occur
+        levelTotals = dict((mismatches, {}) for mismatches in levels)
+
+        for motif, motifMismatches in partnerMismatches.iteritems():
+
+            totals = [0] * (most + 1)
+
+            for partner, mismatches in motifMismatches.iteritems():
+                totals[mismatches] += motifCounts[partner]
+
+            total = 0
+            level = 0
+
+            for mismatches in levels:
+
+                while level <= mismatches:
+                    total += totals[level]
+                    level += 1
+
+                levelTotals[mismatches][motif] = total
+
+        if type == 'pairings':
+
+            # every pairing is seen once from each of its two motifs, so count ordered pairings here
+            # and halve the total at the end
+            orderedPairings = {}
+
+            for mismatches in levels:
+                orderedPairings[mismatches] = sum(motifCounts[motif] * total for motif, total in levelTotals[mismatches].iteritems())
+
+            # take away the pairings that share a base: a location paired with itself, and the ones
+            # less than a stem-length to the right (twice, since they are also seen from the left);
+            # overlaps[d] is the number of overlapping partners with exactly d mismatches
+            overlaps = [0] * (most + 1)
+
+            for location in xrange(len(motifCodes)):
+
+                motif = motifCodes[location]
+
+                if motif not in partnerMismatches:
+                    continue
+
+                motifMismatches = partnerMismatches[motif]
+
+                if motif in motifMismatches:
+                    overlaps[motifMismatches[motif]] += 1
+
+                for neighbor in xrange(location + 1, location + length):
+
+                    if neighbor >= len(motifCodes):
+                        break
+
+                    mismatches = motifMismatches.get(motifCodes[neighbor])
+
+                    if mismatches is not None:
+                        overlaps[mismatches] += 2
+
+            for mismatches in levels:
+                counts[mismatches][length] = (orderedPairings[mismatches] - sum(overlaps[:mismatches + 1])) // 2
+
+        elif type == 'nucleotides' or type == 'coverage':
+
+            # keep a flag per base (1-based, so one extra byte) for every number of mismatches
+            covered = dict((mismatches, bytearray(sequenceLength + 1)) for mismatches in levels)
+            stem    = '\x01' * length
+
+            # a location is part of an IR if at least one of the reverse complements does not overlap it;
+            # its partner is marked when the partner's own location is visited
+            for location in xrange(len(motifCodes)):
+
+                motif = motifCodes[location]
+
+                if motif not in partnerMismatches:
+                    continue
+
+                motifMismatches = partnerMismatches[motif]
+
+                # the overlapping partners (the motif itself and its neighbors on either side) by mismatches
+                overlaps = [0] * (most + 1)
+
+                if motif in motifMismatches:
+                    overlaps[motifMismatches[motif]] += 1
+
+                for distance in xrange(1 - length, length):
+
+                    neighbor = location + distance
+
+                    if distance == 0 or neighbor < 0 or neighbor >= len(motifCodes):
+                        continue
+
+                    mismatches = motifMismatches.get(motifCodes[neighbor])
+
+                    if mismatches is not None:
+                        overlaps[mismatches] += 1
+
+                overlapping = 0
+                level       = 0
+
+                for mismatches in levels:
+
+                    while level <= mismatches:
+                        overlapping += overlaps[level]
+                        level       += 1
+
+                    total = levelTotals[mismatches].get(motif, 0)
+
+                    if overlapping < total:
+                        covered[mismatches][location + 1:location + 1 + length] = stem
+
+            for mismatches in levels:
+                if type == 'coverage':
+                    counts[mismatches][length] = covered[mismatches]
+                else:
+                    counts[mismatches][length] = covered[mismatches].count('\x01')
+
+    return counts
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def findPartners(motifCounts, length, mismatches):
+    """
+    ==============================================================================================
+    SUMMARY: Finds the reverse complements (with mismatches) of every motif that occur in the sequence
+    PRE: assigned(motifCounts) (as returned by KMER.codeCounts), assigned(length), assigned(mismatches)
+    POST: Returns two dictionaries keyed by the code of each motif that has a partner: the set of
+          codes of its reverse complements that occur, and the total number of times they occur
+    ==============================================================================================
+    """
+
+    partners      = {}
+    totalPartners = {}
+
+    # list the reverse complements if there are few, otherwise look them up in a seed index
+    if neighborhoodSize(length, mismatches) <= ENUMERATION_LIMIT:
+        seedIndex = None
+    else:
+        seedIndex = SeedIndex(motifCounts, length, mismatches)
+
+    masks = DNA.mismatchMasks(length, mismatches)
+
+    for motif in motifCounts:
+
+        reverseComplement = DNA.reverseComplementCode(motif, length)
+
+        if seedIndex is None:
+            motifPartners = set(reverseComplement ^ mask for mask, distance in masks if reverseComplement ^ mask in motifCounts)
+        else:
+            motifPartners = seedIndex.matches(reverseComplement)
+
+        if len(motifPartners) > 0:
+            partners[motif]      = motifPartners
+            totalPartners[motif] = sum(motifCounts[partner] for partner in motifPartners)
+
+    return partners, totalPartners
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def findPartnerMismatches(motifCounts, length, mismatches):
+    """
+    ==============================================================================================
+    SUMMARY: Finds the reverse complements (with mismatches) of every motif that occur in the sequence,
+             and the number of mismatches of each
+    PRE: assigned(motifCounts) (as returned by KMER.codeCounts), assigned(length), assigned(mismatches)
+    POST: Returns a dictionary keyed by the code of each motif that has a partner, with a dictionary
+          from the code of each of its partners to the number of bases in which it differs from the
+          reverse complement of the motif as the value
+    ==============================================================================================
+    """
+
+    partnerMismatches = {}
+
+    # list the reverse complements if there are few, otherwise look them up in a seed index
+    if neighborhoodSize(length, mismatches) <= ENUMERATION_LIMIT:
+
+        masks = DNA.mismatchMasks(length, mismatches)
+
+        for motif in motifCounts:
+
+            reverseComplement = DNA.reverseComplementCode(motif, length)
+            motifMismatches   = {}
+
+            for mask, distance in masks:
+                if reverseComplement ^ mask in motifCounts:
+                    motifMismatches[reverseComplement ^ mask] = distance
+
+            if len(motifMismatches) > 0:
+                partnerMismatches[motif] = motifMismatches
+
+    else:
+
+        seedIndex = SeedIndex(motifCounts, length, mismatches)
+
+        for motif in motifCounts:
+
+            motifMismatches = seedIndex.distances(DNA.reverseComplementCode(motif, length))
+
+            if len(motifMismatches) > 0:
+                partnerMismatches[motif] = motifMismatches
+
+    return partnerMismatches
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def reverseComplementPartners(motif, length, mismatches):
+    """
+    ==============================================================================================
+    SUMMARY: Finds every code that would be a partner of a motif, whether it occurs or not
+    PRE: assigned(motif), assigned(length), assigned(mismatches)
+    POST: Returns a set (or, if there are too many to list, a MismatchNeighborhood) that contains
+          the codes within mismatches of the reverse complement of motif
+    ==============================================================================================
+    """
+
+    if neighborhoodSize(length, mismatches) <= ENUMERATION_LIMIT:
+        return DNA.reverseComplementMismatchCodes(motif, length, mismatches)
+
+    return MismatchNeighborhood(DNA.reverseComplementCode(motif, length), length, mismatches)
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def neighborhoodSize(length, mismatches):
+    """
+    ==============================================================================================
+    SUMMARY: Counts the motifs within mismatches of a motif of a given length
+    PRE: assigned(length), assigned(mismatches)
+    POST: Returns the sum over i from 0 to mismatches of (length choose i) * 3^i
+    ==============================================================================================
+    """
+
+    size   = 0
+    choose = 1
+
+    for i in xrange(0, mismatches + 1):
+
+        if i > length:
+            break
+
+        size  += choose * 3 ** i
+        choose = choose * (length - i) // (i + 1)
+
+    return size
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def hammingDistance(first, second, length):
+    """
+    ==============================================================================================
+    SUMMARY: Counts the bases in which two motifs differ
+    PRE: assigned(first), assigned(second) (codes of motifs of the same length), assigned(length)
+    POST: Returns the number of bases that differ
+    ==============================================================================================
+    """
+
+    # a base differs if either of its two bits differs; fold that onto the low bit of each base
+    difference = first ^ second
+    difference = (difference | (difference >> 1)) & LOW_BITS[length]
+
+    return bin(difference).count('1')
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+class MismatchNeighborhood(object):
+
+    __slots__ = ['code', 'length', 'mismatches']
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def __init__(self, code, length, mismatches):
+        """
+        ==============================================================================================
+        SUMMARY: Initializes mismatch neighborhood object
+        PRE: assigned(code), assigned(length), assigned(mismatches)
+        POST: Initializes a stand-in for the set of codes within mismatches of code, without listing them
+        ==============================================================================================
+        """
+
+        self.code       = code
+        self.length     = length
+        self.mismatches = mismatches
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def __contains__(self, code):
+        """
+        ==============================================================================================
+        SUMMARY: Overloads the in operator
+        PRE: assigned(code)
+        POST: Returns True if code is a motif (not -1) within self.mismatches of self.code
+        ==============================================================================================
+        """
+
+        return code >= 0 and hammingDistance(self.code, code, self.length) <= self.mismatches
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+class SeedIndex(object):
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def __init__(self, codes, length, mismatches):
+        """
+        ==============================================================================================
+        SUMMARY: Initializes seed index object
+        PRE: assigned(codes) (the distinct codes to index), assigned(length), assigned(mismatches)
+        POST: Splits the motif into mismatches + 1 blocks of bases and indexes the codes by the bases
+              in each block
+        ==============================================================================================
+        """
+
+        self.length     = length
+        self.mismatches = mismatches
+
+        # the bit masks of the blocks, as even as possible
+        numberOfBlocks = mismatches + 1
+        self.masks     = []
+
+        for block in xrange(numberOfBlocks):
+
+            first = block * length // numberOfBlocks
+            last  = (block + 1) * length // numberOfBlocks
+
+            self.masks.append(((1 << (2 * (last - first))) - 1) << (2 * (length - last)))
+
+        self.tables = []
+
+        for mask in self.masks:
+
+            table = {}
+
+            for code in codes:
+                seed = code & mask
+                if seed in table:
+                    table[seed].append(code)
+                else:
+                    table[seed] = [code]
+
+            self.tables.append(table)
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def matches(self, query):
+        """
+        ==============================================================================================
+        SUMMARY: Finds the indexed codes within self.mismatches of query
+        PRE: assigned(query)
+        POST: Returns a set of the indexed codes that differ from query in at most self.mismatches bases
+        ==============================================================================================
+        """
+
+        return set(self.distances(query))
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def distances(self, query):
+        """
+        ==============================================================================================
+        SUMMARY: Finds the indexed codes within self.mismatches of query, and how far they are from it
+        PRE: assigned(query)
+        POST: Returns a dictionary from each indexed code that differs from query in at most self.mismatches
+              bases to the number of bases in which it differs
+        ==============================================================================================
+        """
+
+        found = {}
+
+        for block in xrange(len(self.masks)):
+
+            mask = self.masks[block]
+
+            for code in self.tables[block].get(query & mask, ()):
+
+                # a code that also matches an earlier block has already been checked
+                earlier = False
+
+                for previous in xrange(block):
+                    if (code ^ query) & self.masks[previous] == 0:
+                        earlier = True
+                        break
+
+                if earlier:
+                    continue
+
+                distance = hammingDistance(code, query, self.length)
+
+                if distance <= self.mismatches:
+                    found[code] = distance
+
+        return found
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def overlappingPartners(motifCodes, location, length, motifPartners, step):
+    """
+    ==============================================================================================
+    SUMMARY: Counts the partners of the motif at location that share a base with it on one side
+    PRE: assigned(motifCodes), assigned(location) (0-based), assigned(length), assigned(motifPartners),
+         assigned(step) (1 for the right, -1 for the left)
+    POST: Returns the number of locations 1 to length - 1 away on that side whose code is in motifPartners
+    ==============================================================================================
+    """
+
+    overlapping = 0
+
+    for distance in xrange(1, length):
+
+        neighbor = location + step * distance
+
+        if neighbor < 0 or neighbor >= len(motifCodes):
+            break
+
+        if motifCodes[neighbor] in motifPartners:
+            overlapping += 1
+
+    return overlapping
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def countInvertedRepeatsInChunks(chunks, min, max, mismatches, type='pairings', map=itertools.imap, countCovered=None):
+    """
+    ==============================================================================================
+    SUMMARY: Counts the potential inverted repeats of a sequence that is read a chunk at a time
+    PRE: assigned(chunks) (a function that returns a new iterator of fasta.FastaChunks made with a margin of
+         at least 2 * max - 2), assigned(min), assigned(max), assigned(mismatches), optional(type),
+         optional(map) (a function like itertools.imap, for example the imap of a multiprocessing.Pool),
+         optional(countCovered) (a function like countCoveredBasesInChunks that counts the covered bases
+         of one stem-length for type 'nucleotides'; by default countCoveredBasesInChunks with map)
+    POST: Returns the same dictionary as countInvertedRepeats; the records of a multi-record file
+          are counted together, as if each were followed by a base other than A, C, G or T
+    ==============================================================================================
+    """
+
+    if countCovered is None:
+        countCovered = functools.partial(countCoveredBasesInChunks, map=map)
+
+    # every chunk is counted on its own, so they can be counted in any order (or at once) and added up
+    motifCounts, orderedOverlaps = mergeChunkMotifs(map(functools.partial(countChunkMotifs, min=min, max=max, mismatches=mismatches, type=type), chunks()), min, max)
+
+    counts = dict((length, 0) for length in xrange(min, max + 1))
+
+    for length in counts:
+
+        partners, totalPartners = findPartners(motifCounts[length], length, mismatches)
+
+        if type == 'pairings':
+
+            orderedPairings = 0
+            for motif in totalPartners:
+                orderedPairings += motifCounts[length][motif] * totalPartners[motif]
+
+            counts[length] = (orderedPairings - orderedOverlaps[length]) // 2
+
+        elif type == 'nucleotides':
+
+            # a second pass marks the bases covered by IRs now that the partners of every motif are known
+            counts[length] = countCovered(chunks, length, partners, totalPartners)
+
+    return counts
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def countCoveredBasesInChunks(chunks, length, partners, totalPartners, map=itertools.imap):
+    """
+    ==============================================================================================
+    SUMMARY: Counts the bases of a sequence read a chunk at a time that are covered by IRs of one stem-length
+    PRE: assigned(chunks) (as for countInvertedRepeatsInChunks), assigned(length), assigned(partners),
+         assigned(totalPartners) (as returned by findPartners for the whole sequence), optional(map)
+    POST: Returns the sum of countCoveredBases over the chunks
+    ==============================================================================================
+    """
+
+    return sum(map(functools.partial(countCoveredBases, length=length, partners=partners, totalPartners=totalPartners), chunks()))
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def countChunkMotifs(chunk, min, max, mismatches, type='pairings'):
+    """
+    ==============================================================================================
+    SUMMARY: Counts the motifs of stem-length min to max (inclusive) that start at the bases owned by a chunk
+    PRE: assigned(chunk) (a fasta.FastaChunk made with a margin of at least 2 * max - 2), assigned(min),
+         assigned(max), assigned(mismatches), optional(type)
+    POST: Returns two dictionaries keyed by stem-length: the number of times each motif code starts at an
+          owned base, and (for 'pairings') the number of ordered pairings of those motifs that share a base
+    ==============================================================================================
+    """
+
+    text = chunk.text
+
+    motifCounts = dict((length, {}) for length in xrange(min, max + 1))
+
+    # the pairings that share a base; a neighbor's code can only be a partner if it occurs, so the reverse
+    # complements do not have to be checked against the counts
+    orderedOverlaps    = dict((length, 0) for length in motifCounts)
+    reverseComplements = dict((length, {}) for length in motifCounts)
+
+    for length in motifCounts:
+
+        motifCodes        = KMER.encodeKmers(text, length)
+        lengthCounts      = motifCounts[length]
+        lengthComplements = reverseComplements[length]
+
+        # min and max are the stem-lengths here, so the end of the owned k-mers is found by hand
+        last = chunk.ownedStop
+        if last > len(motifCodes):
+            last = len(motifCodes)
+
+        for location in xrange(chunk.ownedStart, last):
+
+            motif = motifCodes[location]
+
+            if motif < 0:
+                continue
+
+            lengthCounts[motif] = lengthCounts.get(motif, 0) + 1
+
+            if type != 'pairings':
+                continue
+
+            if motif not in lengthComplements:
+                lengthComplements[motif] = reverseComplementPartners(motif, length, mismatches)
+
+            motifPartners = lengthComplements[motif]
+
+            if motif in motifPartners:
+                orderedOverlaps[length] += 1
+
+            orderedOverlaps[length] += 2 * overlappingPartners(motifCodes, location, length, motifPartners, 1)
+
+    return motifCounts, orderedOverlaps
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def mergeChunkMotifs(chunkResults, min, max):
+    """
+    ==============================================================================================
+    SUMMARY: Adds up the motif counts of the chunks of a sequence
+    PRE: assigned(chunkResults) (an iterator of what countChunkMotifs returned for each chunk), assigned(min),
+         assigned(max)
+    POST: Returns the two dictionaries of countChunkMotifs for the whole sequence
+    ==============================================================================================
+    """
+
+    motifCounts     = dict((length, {}) for length in xrange(min, max + 1))
+    orderedOverlaps = dict((length, 0) for length in motifCounts)
+
+    for chunkCounts, chunkOverlaps in chunkResults:
+
+        for length in motifCounts:
+
+            lengthCounts = motifCounts[length]
+
+            for motif, count in chunkCounts[length].iteritems():
+                lengthCounts[motif] = lengthCounts.get(motif, 0) + count
+
+            orderedOverlaps[length] += chunkOverlaps[length]
+
+    return motifCounts, orderedOverlaps
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def countCoveredBases(chunk, length, partners, totalPartners):
+    """
+    ==============================================================================================
+    SUMMARY: Counts the bases owned by a chunk that are covered by IRs of one stem-length
+    PRE: assigned(chunk) (a fasta.FastaChunk), assigned(length), assigned(partners), assigned(totalPartners)
+         (as returned by findPartners for the whole sequence)
+    POST: Returns the number of bases from chunk.ownedStart to chunk.ownedStop covered by a motif
+          with at least one partner that does not overlap it
+    ==============================================================================================
+    """
+
+    text = chunk.text
+
+    motifCodes = KMER.encodeKmers(text, length)
+
+    covered = bytearray(len(text))
+    stem    = '\x01' * length
+
+    # the motifs starting up to a stem-length before the owned bases also cover some of them
+    first = chunk.ownedStart - length + 1
+    if first < 0:
+        first = 0
+
+    for location in xrange(first, min(chunk.ownedStop, len(motifCodes))):
+
+        motif = motifCodes[location]
+
+        if motif not in partners:
+            continue
+
+        motifPartners = partners[motif]
+
+        overlapping = overlappingPartners(motifCodes, location, length, motifPartners, 1) + \
+                      overlappingPartners(motifCodes, location, length, motifPartners, -1)
+
+        if motif in motifPartners:
+            overlapping += 1
+
+        if overlapping < totalPartners[motif]:
+            covered[location:location + length] = stem
+
+    return covered[chunk.ownedStart:chunk.ownedStop].count('\x01')
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def findHairpins(codes, min, max, mismatches, minLoop, maxLoop):
+    """
+    ==============================================================================================
+    SUMMARY: Finds the hairpins with stem-length min to max (inclusive) and a loop of minLoop to maxLoop bases
+    PRE: assigned(codes) (a dictionary from each stem-length to KMER.encodeKmers(sequence, stem-length)),
+         assigned(min), assigned(max) (1 <= min <= max), assigned(mismatches), assigned(minLoop),
+         assigned(maxLoop) (0 <= minLoop <= maxLoop)
+    POST: Returns an array with HAIRPIN_FIELDS integers per hairpin (the starting location of the first
+          stem, 1-based like Sequence.motifs, the loop length, the stem-length and the number of
+          mismatches), sorted by start, stem-length and loop length; raises ValueError if the bounds
+          are out of order
+    ==============================================================================================
+    """
+
+    checkHairpinBounds(min, max, minLoop, maxLoop)
+
+    # the hairpins of each stem-length, already sorted by start and loop length
+    lengthHairpins = [findStemHairpins(codes[length], length, mismatches, minLoop, maxLoop) for length in xrange(min, max + 1)]
+
+    if len(lengthHairpins) == 1:
+        return lengthHairpins[0]
+
+    # merge the stem-lengths by start; at the same start the shorter stem-length comes first
+    packed = array(HAIRPIN_TYPE)
+
+    for start, length, offset in heapq.merge(*[hairpinStarts(hairpins) for hairpins in lengthHairpins]):
+        packed.extend(lengthHairpins[length - min][offset:offset + HAIRPIN_FIELDS])
+
+    return packed
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def checkHairpinBounds(min, max, minLoop, maxLoop):
+    """
+    ==============================================================================================
+    SUMMARY: Checks the stem-lengths and loop lengths of a hairpin search
+    PRE: assigned(min), assigned(max), assigned(minLoop), assigned(maxLoop)
+    POST: Raises ValueError unless 1 <= min <= max and 0 <= minLoop <= maxLoop
+    ==============================================================================================
+    """
+
+    if min < 1 or min > max or minLoop < 0 or minLoop > maxLoop:
+        raise ValueError('Invalid hairpin bounds: stem-length ' + str(min) + ' to ' + str(max) + ', loop ' + str(minLoop) + ' to ' + str(maxLoop))
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def findStemHairpins(motifCodes, length, mismatches, minLoop, maxLoop):
+    """
+    ==============================================================================================
+    SUMMARY: Finds the hairpins of one stem-length
+    PRE: assigned(motifCodes) (KMER.encodeKmers(sequence, length)), assigned(length), assigned(mismatches),
+         assigned(minLoop), assigned(maxLoop) (0 <= minLoop <= maxLoop)
+    POST: Returns an array of hairpins laid out like findHairpins, sorted by start and loop length
+    ==============================================================================================
+    """
+
+    hairpins = array(HAIRPIN_TYPE)
+
+    stems = len(motifCodes)
+
+    # the second stems that can pair with the stem at first, keyed by code: the ones that start
+    # minLoop to maxLoop bases after it ends
+    window = {}
+
+    for second in xrange(length + minLoop, length + maxLoop):
+        if second < stems and motifCodes[second] >= 0:
+            window.setdefault(motifCodes[second], deque()).append(second)
+
+    # list the reverse complements if there are fewer than the window holds, otherwise compare
+    # the reverse complement with every stem in the window
+    listPartners = neighborhoodSize(length, mismatches) <= maxLoop - minLoop + 1
+    masks        = DNA.mismatchMasks(length, mismatches)
+
+    for first in xrange(stems):
+
+        # the second stem leaving the window (it was in the window of the last first stem), and the one
+        # entering it
+        leaving  = first + length + minLoop - 1
+        entering = first + length + maxLoop
+
+        if first > 0 and leaving < stems and motifCodes[leaving] >= 0:
+            secondStems = window[motifCodes[leaving]]
+            secondStems.popleft()
+            if len(secondStems) == 0:
+                del window[motifCodes[leaving]]
+
+        if entering < stems and motifCodes[entering] >= 0:
+            window.setdefault(motifCodes[entering], deque()).append(entering)
+
+        motif = motifCodes[first]
+
+        if motif < 0 or len(window) == 0:
+            continue
+
+        reverseComplement = DNA.reverseComplementCode(motif, length)
+
+        if listPartners:
+            candidates = [(reverseComplement ^ mask, distance) for mask, distance in masks if reverseComplement ^ mask in window]
+        else:
+            candidates = [(partner, hammingDistance(partner, reverseComplement, length)) for partner in window]
+            candidates = [(partner, distance) for partner, distance in candidates if distance <= mismatches]
+
+        # the hairpins of one first stem are few (at most the size of the window), so they are sorted
+        # by loop length here and the array stays sorted
+        firstHairpins = []
+
+        for partner, distance in candidates:
+            for second in window[partner]:
+                firstHairpins.append((second - first - length, distance))
+
+        firstHairpins.sort()
+
+        for loop, distance in firstHairpins:
+            hairpins.extend((first + 1, loop, length, distance))
+
+    return hairpins
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def hairpinStarts(hairpins):
+    """
+    ==============================================================================================
+    SUMMARY: Lists the hairpins of one stem-length for merging
+    PRE: assigned(hairpins) (as returned by findStemHairpins)
+    POST: Yields (start, stem-length, offset in hairpins) for each hairpin, in order
+    ==============================================================================================
+    """
+
+    for offset in xrange(0, len(hairpins), HAIRPIN_FIELDS):
+        yield hairpins[offset], hairpins[offset + 2], offset
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def unpackHairpins(hairpins):
+    """
+    ==============================================================================================
+    SUMMARY: Splits an array of hairpins into one tuple per hairpin
+    PRE: assigned(hairpins) (as returned by findHairpins)
+    POST: Returns a list of (start, loop length, stem-length, mismatches) tuples
+    ==============================================================================================
+    """
+
+    return [tuple(hairpins[i:i + HAIRPIN_FIELDS]) for i in xrange(0, len(hairpins), HAIRPIN_FIELDS)]
+#-----------------------------------------------------------------------------------------------------------------#
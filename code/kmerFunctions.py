@@ -0,0 +1,385 @@
+"""
+-----------------------------------------------------------------------------------------------------------------
+kmerFunctions.py
+Programmer: Chris DeMolles
+
+Tested with Python 2.7.3
+
+This module encodes the k-mers of a sequence as integers instead of cutting them out as strings. Each base takes two
+bits (A = 0, C = 1, G = 2, T = 3), so a k-mer is a number from 0 to 4^k - 1 and the code of the next k-mer is found
+from the code of the previous one by shifting in one base. Any base other than A, C, G or T breaks the window: no
+k-mer containing it is reported.
+
+Counts are kept in a dense array indexed by code and starting locations (1-based, like Sequence) are kept in arrays
+of integers, so no string is allocated per k-mer. When numpy is installed, the k-mers of a whole batch of sequences
+are counted in one vectorized pass. countKmersInChunks counts a genome read a chunk at a time by the fasta module.
+-----------------------------------------------------------------------------------------------------------------
+"""
+
+from array import array
+import functools, itertools, string
+
+# numpy is only needed to count many sequences at once
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# every character that is not A, C, G or T is translated to 4
+BASE_CODES = string.maketrans('ACGT' + ''.join(chr(i) for i in xrange(256) if chr(i) not in 'ACGT'),
+                              '\x00\x01\x02\x03' + '\x04' * 252)
+
+BASES = 'ACGT'
+
+# array type used for codes and locations (a C int, so k can be at most 15)
+CODE_TYPE = 'i'
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def encodeBases(sequence):
+    """
+    ==============================================================================================
+    SUMMARY: Translates a sequence to an array of 2-bit base codes
+    PRE: assigned(sequence)
+    POST: Returns a bytearray with 0, 1, 2, 3 for A, C, G, T and 4 for any other character
+    ==============================================================================================
+    """
+
+    # a packed genome already stores its bases as codes
+    if hasattr(sequence, 'baseCodes'):
+        return sequence.baseCodes()
+
+    return bytearray(str(sequence).translate(BASE_CODES))
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def encodeKmers(sequence, k):
+    """
+    ==============================================================================================
+    SUMMARY: Finds the code of the k-mer starting at every location of the sequence
+    PRE: assigned(sequence), assigned(k) (1 <= k <= 15)
+    POST: Returns an array where element i is the code of the k-mer starting at location i + 1,
+          or -1 if that k-mer contains a base other than A, C, G or T
+    ==============================================================================================
+    """
+
+    bases = encodeBases(sequence)
+
+    codes = array(CODE_TYPE, [-1]) * max(0, len(bases) - k + 1)
+
+    mask  = (1 << (2 * k)) - 1
+    code  = 0
+    valid = 0
+
+    # roll the window along the sequence one base at a time
+    for i, base in enumerate(bases):
+
+        # a base other than A, C, G or T breaks the window
+        if base > 3:
+            valid = 0
+            continue
+
+        code   = ((code << 2) | base) & mask
+        valid += 1
+
+        if valid >= k:
+            codes[i - k + 1] = code
+
+    return codes
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def encodeKmerRange(sequence, min, max):
+    """
+    ==============================================================================================
+    SUMMARY: Finds the codes of the k-mers of length min to max (inclusive) in one pass over the sequence
+    PRE: assigned(sequence), assigned(min), assigned(max) (1 <= min <= max <= 15)
+    POST: Returns a dictionary with the length k as the key and encodeKmers(sequence, k) as the value
+    ==============================================================================================
+    """
+
+    bases = encodeBases(sequence)
+
+    lengths = range(min, max + 1)
+    codes   = dict((k, array(CODE_TYPE, [-1]) * (len(bases) - k + 1 if len(bases) >= k else 0)) for k in lengths)
+    masks   = dict((k, (1 << (2 * k)) - 1) for k in lengths)
+
+    code  = 0
+    valid = 0
+
+    # roll one window of the longest length; every shorter k-mer ending at the same base is its low bits
+    for i, base in enumerate(bases):
+
+        if base > 3:
+            valid = 0
+            continue
+
+        code   = ((code << 2) | base) & masks[max]
+        valid += 1
+
+        for k in lengths:
+
+            if valid < k:
+                break
+
+            codes[k][i - k + 1] = code & masks[k]
+
+    return codes
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def countKmers(sequence, k):
+    """
+    ==============================================================================================
+    SUMMARY: Counts the k-mers of the sequence
+    PRE: assigned(sequence), assigned(k) (1 <= k <= 15)
+    POST: Returns an array of length 4^k where element code is the number of times the k-mer
+          with that code occurs
+    ==============================================================================================
+    """
+
+    counts = array(CODE_TYPE, [0]) * (4 ** k)
+
+    mask  = (1 << (2 * k)) - 1
+    code  = 0
+    valid = 0
+
+    for base in encodeBases(sequence):
+
+        if base > 3:
+            valid = 0
+            continue
+
+        code   = ((code << 2) | base) & mask
+        valid += 1
+
+        if valid >= k:
+            counts[code] += 1
+
+    return counts
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def countKmersBatch(sequences, k):
+    """
+    ==============================================================================================
+    SUMMARY: Counts the k-mers of every sequence in a list at once
+    PRE: assigned(sequences), assigned(k) (1 <= k <= 15)
+    POST: Returns a len(sequences) x 4^k array where element [row, code] is the number of times
+          the k-mer with that code occurs in sequences[row] (a list of countKmers arrays if numpy
+          is not installed)
+    ==============================================================================================
+    """
+
+    if numpy is None:
+        return [countKmers(sequence, k) for sequence in sequences]
+
+    numberOfKmers = 4 ** k
+
+    # put the sequences end to end with a base that breaks the window between them, so no k-mer
+    # spans two sequences
+    bases = numpy.frombuffer('\x04'.join(str(sequence) for sequence in sequences).translate(BASE_CODES), dtype=numpy.uint8)
+
+    # find the row of every base from the offsets where each sequence starts
+    lengths = numpy.array([len(str(sequence)) + 1 for sequence in sequences], dtype=numpy.int64)
+    rows    = numpy.repeat(numpy.arange(len(sequences), dtype=numpy.int64), lengths)[:len(bases)]
+
+    numberOfWindows = len(bases) - k + 1
+
+    if len(sequences) == 0 or numberOfWindows <= 0:
+        return numpy.zeros((len(sequences), numberOfKmers), dtype=numpy.int64)
+
+    # build the code of every window and count the breaking bases in it at the same time
+    codes  = numpy.zeros(numberOfWindows, dtype=numpy.int64)
+    broken = numpy.zeros(numberOfWindows, dtype=numpy.int64)
+
+    for i in xrange(k):
+        window  = bases[i:i + numberOfWindows]
+        codes   = (codes << 2) | (window & 3)
+        broken += window > 3
+
+    valid = broken == 0
+
+    # count each (row, code) pair with a single bincount
+    counts = numpy.bincount(rows[:numberOfWindows][valid] * numberOfKmers + codes[valid], minlength=len(sequences) * numberOfKmers)
+
+    return counts.reshape(len(sequences), numberOfKmers)
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def countCodes(codes, k):
+    """
+    ==============================================================================================
+    SUMMARY: Counts the k-mers in an array of codes
+    PRE: assigned(codes) (as returned by encodeKmers), assigned(k)
+    POST: Returns an array of length 4^k where element code is the number of times code occurs
+    ==============================================================================================
+    """
+
+    counts = array(CODE_TYPE, [0]) * (4 ** k)
+
+    for code in codes:
+        if code >= 0:
+            counts[code] += 1
+
+    return counts
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def codeCounts(codes, k):
+    """
+    ==============================================================================================
+    SUMMARY: Counts the k-mers in an array of codes, keeping only the ones that occur
+    PRE: assigned(codes) (as returned by encodeKmers), assigned(k)
+    POST: Returns a dictionary with the code of each k-mer that occurs as the key and the number of
+          times it occurs as the value
+    ==============================================================================================
+    """
+
+    # a dense array is faster while 4^k is small next to the sequence; long k-mers mostly occur
+    # once, so they are counted straight into the dictionary
+    if 4 ** k <= 4 * len(codes) + 256:
+        counts = countCodes(codes, k)
+        return dict((code, counts[code]) for code in xrange(len(counts)) if counts[code] > 0)
+
+    counts = {}
+
+    for code in codes:
+        if code >= 0:
+            counts[code] = counts.get(code, 0) + 1
+
+    return counts
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def kmerLocations(codes):
+    """
+    ==============================================================================================
+    SUMMARY: Groups the starting locations of the k-mers by code
+    PRE: assigned(codes) (as returned by encodeKmers)
+    POST: Returns a dictionary with the code of the k-mer as the key and a sorted array of the
+          (1-based) starting locations of that k-mer as the value
+    ==============================================================================================
+    """
+
+    locations = {}
+
+    for i, code in enumerate(codes):
+
+        if code < 0:
+            continue
+
+        if code in locations:
+            locations[code].append(i + 1)
+        else:
+            locations[code] = array(CODE_TYPE, [i + 1])
+
+    return locations
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def indexKmers(sequence, min, max):
+    """
+    ==============================================================================================
+    SUMMARY: Finds the starting locations of all the k-mers of length min to max (inclusive)
+    PRE: assigned(sequence), assigned(min), assigned(max)
+    POST: Returns a dictionary with the length as the key and the value as a dictionary from the
+          code of each k-mer of that length to a sorted array of its starting locations
+    ==============================================================================================
+    """
+
+    index = {}
+
+    for k in xrange(min, max + 1):
+        index[k] = kmerLocations(encodeKmers(sequence, k))
+
+    return index
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def encodeKmer(motif):
+    """
+    ==============================================================================================
+    SUMMARY: Finds the code of a motif
+    PRE: assigned(motif) (only A, C, G and T)
+    POST: Returns the 2-bit code of motif
+    ==============================================================================================
+    """
+
+    code = 0
+
+    for base in encodeBases(motif):
+        code = (code << 2) | base
+
+    return code
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def decodeKmer(code, k):
+    """
+    ==============================================================================================
+    SUMMARY: Finds the motif of length k with the given code
+    PRE: assigned(code), assigned(k)
+    POST: Returns the motif as a string
+    ==============================================================================================
+    """
+
+    bases = []
+
+    for i in xrange(k):
+        bases.append(BASES[code & 3])
+        code >>= 2
+
+    bases.reverse()
+
+    return ''.join(bases)
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def countKmersInChunks(chunks, k, map=itertools.imap):
+    """
+    ==============================================================================================
+    SUMMARY: Counts the k-mers of a sequence that is read a chunk at a time
+    PRE: assigned(chunks) (fasta.FastaChunks made with a margin of at least k - 1), assigned(k),
+         optional(map) (a function like itertools.imap, for example the imap of a multiprocessing.Pool)
+    POST: Returns an array of length 4^k where element code is the number of times the k-mer with
+          that code starts at a base owned by one of the chunks (every k-mer of every record once)
+    ==============================================================================================
+    """
+
+    counts = array(CODE_TYPE, [0]) * (4 ** k)
+
+    # every chunk is counted on its own, so they can be counted in any order (or at once) and added up
+    for chunkCounts in map(functools.partial(countChunkKmers, k=k), chunks):
+
+        for code in xrange(len(counts)):
+            counts[code] += chunkCounts[code]
+
+    return counts
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def countChunkKmers(chunk, k):
+    """
+    ==============================================================================================
+    SUMMARY: Counts the k-mers that start at the bases owned by a chunk
+    PRE: assigned(chunk) (a fasta.FastaChunk made with a margin of at least k - 1), assigned(k)
+    POST: Returns an array of length 4^k like countKmers
+    ==============================================================================================
+    """
+
+    # the k-mers starting at the owned bases end at most k - 1 bases into the margin
+    return countKmers(chunk.text[chunk.ownedStart:chunk.ownedStop + k - 1], k)
+#-----------------------------------------------------------------------------------------------------------------#
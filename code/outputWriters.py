@@ -0,0 +1,270 @@
+"""
+-----------------------------------------------------------------------------------------------------------------
+outputWriters.py
+Programmer: Chris DeMolles
+
+Tested with Python 2.7.3
+
+This module writes the rows of count.py (a name, a kingdom, a list of integer counts and a type per sequence) in one
+of several formats. Every writer takes rows in batches with writeRows, and flush makes everything written so far
+usable, so the output of a run that stops part way through can still be read.
+
+TsvWriter writes a tab-separated value file, one write call per row.
+
+NpyWriter writes the counts as a matrix in the NumPy .npy format (<name>.npy, 32-bit integers, one row per
+sequence) next to a tab-separated metadata table (<name>_metadata.tsv, the name, kingdom and type of each row, in
+the same order) and the names of the columns (<name>_columns.txt, one per line). The matrix can be memory-mapped
+(numpy.load(fileName, mmap_mode='r')) without parsing any text. The .npy file is written directly, so NumPy is not
+needed to write it: the header is given a fixed size, and flush rewrites the number of rows in it after the rows
+themselves are on disk.
+-----------------------------------------------------------------------------------------------------------------
+"""
+
+from array import array
+import os, sys
+
+# size of the write buffer of every output file
+BUFFER_SIZE = 1 << 20
+
+# the .npy format: its magic string and version 1.0, a fixed size for the whole header (a multiple of 64 bytes, so
+# the matrix is aligned), and the type of the counts
+NPY_MAGIC       = '\x93NUMPY\x01\x00'
+NPY_HEADER_SIZE = 128
+NPY_TYPE        = 'i'
+NPY_DESCRIPTION = '<i4'
+
+
+class TsvWriter(object):
+
+    # the files a writer creates, as suffixes of the file name it is given
+    SUFFIXES = ['.tsv']
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def __init__(self, fileName, columns):
+        """
+        ==============================================================================================
+        SUMMARY: Initializes tab-separated value writer object
+        PRE: assigned(fileName) (without the extension), assigned(columns) (the names of the counts)
+        POST: Creates <fileName>.tsv and writes the heading
+        ==============================================================================================
+        """
+
+        self.fileName   = fileName + '.tsv'
+        self.outputFile = open(self.fileName, 'w', BUFFER_SIZE)
+
+        self.outputFile.write('\t'.join(['Name', 'Kingdom'] + list(columns) + ['Type']) + '\n')
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def writeRows(self, rows):
+        """
+        ==============================================================================================
+        SUMMARY: Writes rows to the file
+        PRE: assigned(rows) (a list of (name, kingdom, counts, type) tuples)
+        POST: Writes one line per row
+        ==============================================================================================
+        """
+
+        write = self.outputFile.write
+
+        for name, kingdom, counts, type in rows:
+            write(name + '\t' + kingdom + '\t' + '\t'.join(map(str, counts)) + '\t' + type + '\n')
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def flush(self):
+        """
+        ==============================================================================================
+        SUMMARY: Makes the rows written so far usable
+        PRE: None
+        POST: Writes the buffered rows to disk
+        ==============================================================================================
+        """
+
+        self.outputFile.flush()
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def close(self):
+        """
+        ==============================================================================================
+        SUMMARY: Closes the file
+        PRE: None
+        POST: Flushes and closes the file
+        ==============================================================================================
+        """
+
+        self.outputFile.close()
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+class NpyWriter(object):
+
+    SUFFIXES = ['.npy', '_metadata.tsv', '_columns.txt']
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def __init__(self, fileName, columns):
+        """
+        ==============================================================================================
+        SUMMARY: Initializes .npy matrix writer object
+        PRE: assigned(fileName) (without the extension), assigned(columns) (the names of the counts)
+        POST: Creates <fileName>.npy with an empty matrix, <fileName>_metadata.tsv with its heading and
+              <fileName>_columns.txt
+        ==============================================================================================
+        """
+
+        self.fileName = fileName + '.npy'
+        self.columns  = len(columns)
+        self.rows     = 0
+
+        columnsFile = open(fileName + '_columns.txt', 'w')
+        columnsFile.write(''.join(column + '\n' for column in columns))
+        columnsFile.close()
+
+        self.matrixFile = open(self.fileName, 'wb', BUFFER_SIZE)
+        self.writeHeader()
+
+        self.metadataFile = open(fileName + '_metadata.tsv', 'w', BUFFER_SIZE)
+        self.metadataFile.write('Row\tName\tKingdom\tType\n')
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def writeHeader(self):
+        """
+        ==============================================================================================
+        SUMMARY: Writes the .npy header for the rows written so far
+        PRE: assigned(self.matrixFile), assigned(self.rows), assigned(self.columns)
+        POST: Writes the header, padded to NPY_HEADER_SIZE bytes, at the start of the file and leaves the
+              file positioned at its end
+        ==============================================================================================
+        """
+
+        description = "{'descr': '" + NPY_DESCRIPTION + "', 'fortran_order': False, 'shape': (" + str(self.rows) + ", " + str(self.columns) + "), }"
+
+        # the header is padded with spaces and ends with a newline; its length is stored in two bytes
+        headerLength = NPY_HEADER_SIZE - len(NPY_MAGIC) - 2
+        header       = description.ljust(headerLength - 1) + '\n'
+
+        if len(header) != headerLength:
+            raise ValueError('The .npy header of ' + self.fileName + ' is too long')
+
+        self.matrixFile.seek(0)
+        self.matrixFile.write(NPY_MAGIC + chr(headerLength & 255) + chr(headerLength >> 8) + header)
+        self.matrixFile.seek(0, os.SEEK_END)
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def writeRows(self, rows):
+        """
+        ==============================================================================================
+        SUMMARY: Writes rows to the matrix and the metadata table
+        PRE: assigned(rows) (a list of (name, kingdom, counts, type) tuples, with one count per column)
+        POST: Appends the counts of the rows to the matrix and their names to the metadata table; the
+              header is not updated until flush
+        ==============================================================================================
+        """
+
+        counts = array(NPY_TYPE)
+
+        for name, kingdom, rowCounts, type in rows:
+
+            if len(rowCounts) != self.columns:
+                raise ValueError('A row of ' + self.fileName + ' has ' + str(len(rowCounts)) + ' counts instead of ' + str(self.columns))
+
+            counts.extend(rowCounts)
+
+            self.metadataFile.write(str(self.rows) + '\t' + name + '\t' + kingdom + '\t' + type + '\n')
+            self.rows += 1
+
+        # the matrix is little-endian
+        if sys.byteorder == 'big':
+            counts.byteswap()
+
+        counts.tofile(self.matrixFile)
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def flush(self):
+        """
+        ==============================================================================================
+        SUMMARY: Makes the rows written so far usable
+        PRE: None
+        POST: Writes the buffered rows to disk, then updates the number of rows in the header
+        ==============================================================================================
+        """
+
+        # the rows go to disk before the header counts them, so the header never counts rows that are missing
+        self.matrixFile.flush()
+        self.metadataFile.flush()
+
+        self.writeHeader()
+        self.matrixFile.flush()
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def close(self):
+        """
+        ==============================================================================================
+        SUMMARY: Closes the files
+        PRE: None
+        POST: Flushes and closes the matrix and the metadata table
+        ==============================================================================================
+        """
+
+        self.flush()
+
+        self.matrixFile.close()
+        self.metadataFile.close()
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+# the writer for each output format
+WRITERS = {'tsv': TsvWriter,
+           'npy': NpyWriter}
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def openWriter(format, fileName, columns):
+    """
+    ==============================================================================================
+    SUMMARY: Opens a writer for an output format
+    PRE: assigned(format) (a key of WRITERS), assigned(fileName) (without the extension), assigned(columns)
+    POST: Returns the writer for format, with its files created
+    ==============================================================================================
+    """
+
+    if format not in WRITERS:
+        raise ValueError('Unknown output format ' + str(format) + ' (expected one of ' + ', '.join(sorted(WRITERS)) + ')')
+
+    return WRITERS[format](fileName, columns)
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def removeOutput(fileName):
+    """
+    ==============================================================================================
+    SUMMARY: Removes the output files of an earlier run
+    PRE: assigned(fileName) (without the extension)
+    POST: Removes the files every writer would create for fileName, in any format; returns the names
+          of the files removed
+    ==============================================================================================
+    """
+
+    removed = []
+
+    for format in sorted(WRITERS):
+        for suffix in WRITERS[format].SUFFIXES:
+            if os.path.exists(fileName + suffix):
+                os.remove(fileName + suffix)
+                removed.append(fileName + suffix)
+
+    return removed
+#-----------------------------------------------------------------------------------------------------------------#
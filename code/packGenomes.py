@@ -0,0 +1,73 @@
+"""
+-----------------------------------------------------------------------------------------------------------------
+packGenomes.py
+Programmer: Chris DeMolles
+
+Tested with Python 2.7.3
+
+This script converts the genome (.fna) of every bug in the bug directory to the packed format of genomeStorage
+(.fna.packed, two bits per base). Bug reads the packed copy instead of the .fna.oneline copy once it exists. Genomes
+whose packed copy is newer than their .fna are skipped.
+
+With --index, the full-text index of every genome (.fna.fmi, see genomeIndex) is built as well, so Bug does not
+build it the first time a motif is queried. Indexes newer than their .fna are skipped in the same way.
+
+Usage: python packGenomes.py [--force] [--index]
+-----------------------------------------------------------------------------------------------------------------
+"""
+
+import database
+import genomeIndex
+import genomeStorage
+import os, sys
+
+
+def main():
+
+    force = '--force' in sys.argv[1:]
+    index = '--index' in sys.argv[1:]
+
+    bugDirectory = database.getBugDirectory()
+
+    fastaBytes  = 0
+    packedBytes = 0
+
+    for directory, subdirectories, fileNames in sorted(os.walk(bugDirectory)):
+
+        for fileName in sorted(fileNames):
+
+            if not fileName.endswith('.fna'):
+                continue
+
+            fastaFileName  = os.path.join(directory, fileName)
+            packedFileName = fastaFileName + '.packed'
+
+            # skip genomes that are already packed
+            if not force and os.path.exists(packedFileName) and os.path.getmtime(packedFileName) >= os.path.getmtime(fastaFileName):
+                print "Skipping", fileName, "..."
+            else:
+                print "Packing", fileName, "..."
+                length = genomeStorage.packFasta(fastaFileName, packedFileName)
+                print "Packed", length, "bases"
+
+            fastaBytes  += os.path.getsize(fastaFileName)
+            packedBytes += os.path.getsize(packedFileName)
+
+            if not index:
+                continue
+
+            indexFileName = fastaFileName + '.fmi'
+
+            # skip genomes that are already indexed
+            if not force and os.path.exists(indexFileName) and os.path.getmtime(indexFileName) >= os.path.getmtime(fastaFileName):
+                print "Skipping the index of", fileName, "..."
+            else:
+                print "Indexing", fileName, "..."
+                length = genomeIndex.buildIndex(genomeStorage.PackedGenome(packedFileName), indexFileName)
+                print "Indexed", length, "bases"
+
+    print "Packed", fastaBytes, "bytes of FASTA into", packedBytes, "bytes"
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+"""
+-----------------------------------------------------------------------------------------------------------------
+parallelCounting.py
+Programmer: Chris DeMolles
+
+Tested with Python 2.7.3
+
+This module counts the k-mers and potential inverted repeats of one long genome with several worker processes.
+The genome is cut into the same overlapping chunks as fasta.readChunks makes (each record on its own, with a margin
+of k - 1 or 2 * max - 2 bases), and each worker counts whole chunks with the functions kmerFunctions and irFunctions
+use for a genome read a chunk at a time. The per-chunk counts are added up in the main process, so the results are
+identical to counting in a single process.
+
+The bases are not sent to the workers. The genome (a genome storage backend, which is memory-mapped from its file,
+or a string) is made available to the module before the worker processes are forked, so they share it, and each
+chunk is sent as a SharedChunk holding only its coordinates; a worker cuts the bases of a chunk out of the shared
+genome when it counts it. For the bases covered by inverted repeats, the partners of every motif (found from the
+counts of the first pass) are shared the same way: they are made available before a second pool of workers is forked
+for each stem-length. Only the counts are pickled.
+-----------------------------------------------------------------------------------------------------------------
+"""
+
+import functools, itertools, multiprocessing
+import fasta
+import irFunctions as IR
+import kmerFunctions as KMER
+
+# the genome the chunks of this process are cut from (set before the workers are forked)
+_genome = None
+
+# the stem-length, partners and total partners the covered bases of a chunk are counted with (set before the
+# workers of the second pass are forked)
+_partners = None
+
+
+class SharedChunk(object):
+
+    # the same fields as fasta.FastaChunk, except that the text is cut from the shared genome when it is used
+    __slots__ = ['record', 'description', 'start', 'genomeStart', 'genomeStop', 'ownedStart', 'ownedStop']
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def __init__(self, record, start, genomeStart, genomeStop, ownedStart, ownedStop):
+        """
+        ==============================================================================================
+        SUMMARY: Initializes shared chunk object
+        PRE: assigned(record), assigned(start) (the location in the record of the first base of the chunk),
+             assigned(genomeStart), assigned(genomeStop) (its bases in the genome, 0-based, genomeStop
+             excluded), assigned(ownedStart), assigned(ownedStop) (the part of its text it owns)
+        POST: Initializes a chunk laid out like a fasta.FastaChunk
+        ==============================================================================================
+        """
+
+        self.record      = record
+        self.description = ''
+        self.start       = start
+        self.genomeStart = genomeStart
+        self.genomeStop  = genomeStop
+        self.ownedStart  = ownedStart
+        self.ownedStop   = ownedStop
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    @property
+    def text(self):
+        """
+        ==============================================================================================
+        SUMMARY: Returns the bases of the chunk
+        PRE: assigned(_genome) (the genome of this process)
+        POST: Returns the bases from genomeStart to genomeStop, cut out of the shared genome
+        ==============================================================================================
+        """
+
+        return _genome[self.genomeStart:self.genomeStop]
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def __getstate__(self):
+        """
+        ==============================================================================================
+        SUMMARY: Returns what is pickled when the chunk is sent to a worker
+        PRE: None
+        POST: Returns the coordinates of the chunk (never its bases)
+        ==============================================================================================
+        """
+
+        return tuple(getattr(self, name) for name in self.__slots__)
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def __setstate__(self, state):
+        """
+        ==============================================================================================
+        SUMMARY: Restores the chunk in a worker
+        PRE: assigned(state) (as returned by __getstate__)
+        POST: Sets the coordinates of the chunk
+        ==============================================================================================
+        """
+
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def sharedChunks(recordLengths, chunkSize, margin):
+    """
+    ==============================================================================================
+    SUMMARY: Lays out the chunks of a genome
+    PRE: assigned(recordLengths) (the number of bases of each record, laid end to end in the genome),
+         assigned(chunkSize), assigned(margin)
+    POST: Returns a list of SharedChunks, laid out in every record like fasta.readChunks would lay them out
+    ==============================================================================================
+    """
+
+    chunks = []
+    offset = 0
+
+    for record in xrange(len(recordLengths)):
+
+        for textStart, textStop, ownedStart, ownedStop in fasta.splitRanges(recordLengths[record], chunkSize, margin):
+            chunks.append(SharedChunk(record, textStart, offset + textStart, offset + textStop, ownedStart, ownedStop))
+
+        offset += recordLengths[record]
+
+    return chunks
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def startWorkers(genome, workers):
+    """
+    ==============================================================================================
+    SUMMARY: Shares a genome with a pool of worker processes
+    PRE: assigned(genome) (a string or genome storage backend), assigned(workers)
+    POST: Makes genome the genome of this process and returns a multiprocessing.Pool of workers
+          forked from it, or None if workers is 1 or less (the chunks are then counted here)
+    ==============================================================================================
+    """
+
+    global _genome
+
+    _genome = genome
+
+    if workers <= 1:
+        return None
+
+    return multiprocessing.Pool(workers)
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def stopWorkers(pool):
+    """
+    ==============================================================================================
+    SUMMARY: Stops the worker processes started by startWorkers
+    PRE: optional(pool)
+    POST: Waits for the workers to finish and lets go of the shared genome
+    ==============================================================================================
+    """
+
+    global _genome
+
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+    _genome = None
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def countKmersInParallel(genome, k, workers, recordLengths=None, chunkSize=1048576):
+    """
+    ==============================================================================================
+    SUMMARY: Counts the k-mers of a genome with several worker processes
+    PRE: assigned(genome) (a string or genome storage backend), assigned(k), assigned(workers),
+         optional(recordLengths) (the records laid end to end in genome; one record by default),
+         optional(chunkSize)
+    POST: Returns the same array as KMER.countKmersInChunks on the chunks of every record
+    ==============================================================================================
+    """
+
+    if recordLengths is None:
+        recordLengths = [len(genome)]
+
+    chunks = sharedChunks(recordLengths, chunkSize, k - 1)
+    pool   = startWorkers(genome, workers)
+
+    try:
+        return KMER.countKmersInChunks(chunks, k, pool.imap if pool is not None else itertools.imap)
+    finally:
+        stopWorkers(pool)
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def countInvertedRepeatsInParallel(genome, min, max, mismatches, workers, type='pairings', recordLengths=None, chunkSize=1048576):
+    """
+    ==============================================================================================
+    SUMMARY: Counts the potential inverted repeats of stem-length min to max (inclusive) of a genome with
+             several worker processes
+    PRE: assigned(genome) (a string or genome storage backend), assigned(min), assigned(max),
+         assigned(mismatches), assigned(workers), optional(type), optional(recordLengths) (the records
+         laid end to end in genome; one record by default), optional(chunkSize)
+    POST: Returns the same dictionary as IR.countInvertedRepeatsInChunks on the chunks of every record
+    ==============================================================================================
+    """
+
+    if recordLengths is None:
+        recordLengths = [len(genome)]
+
+    chunks = sharedChunks(recordLengths, chunkSize, 2 * max - 2)
+    pool   = startWorkers(genome, workers)
+
+    countCovered = functools.partial(countCoveredBasesInParallel, workers=workers)
+
+    try:
+        return IR.countInvertedRepeatsInChunks(lambda: chunks, min, max, mismatches, type, pool.imap if pool is not None else itertools.imap, countCovered)
+    finally:
+        stopWorkers(pool)
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def countCoveredBasesInParallel(chunks, length, partners, totalPartners, workers):
+    """
+    ==============================================================================================
+    SUMMARY: Counts the bases covered by IRs of one stem-length with several worker processes
+    PRE: assigned(chunks) (a function that returns the SharedChunks), assigned(length), assigned(partners),
+         assigned(totalPartners) (as returned by IR.findPartners for the whole genome), assigned(workers),
+         assigned(_genome)
+    POST: Returns the same count as IR.countCoveredBasesInChunks; the partners are shared with a pool of
+          workers forked after they are made available, instead of being sent with every chunk
+    ==============================================================================================
+    """
+
+    global _partners
+
+    _partners = (length, partners, totalPartners)
+
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+
+    try:
+        return sum((pool.imap if pool is not None else itertools.imap)(countSharedCoveredBases, chunks()))
+    finally:
+
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+        _partners = None
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def countSharedCoveredBases(chunk):
+    """
+    ==============================================================================================
+    SUMMARY: Counts the bases owned by a chunk that are covered by IRs, with the shared partners
+    PRE: assigned(chunk), assigned(_partners)
+    POST: Returns IR.countCoveredBases of the chunk with the stem-length and partners in _partners
+    ==============================================================================================
+    """
+
+    length, partners, totalPartners = _partners
+
+    return IR.countCoveredBases(chunk, length, partners, totalPartners)
+#-----------------------------------------------------------------------------------------------------------------#
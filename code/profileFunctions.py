@@ -0,0 +1,328 @@
+"""
+-----------------------------------------------------------------------------------------------------------------
+profileFunctions.py
+Programmer: Chris DeMolles
+
+Tested with Python 2.7.3
+
+This module profiles a whole genome along its length with a sliding window: the k-mer composition and the number
+of potential inverted repeats of every window of window bases, starting every step bases. Window i covers the
+bases from i * step to i * step + window - 1 (0-based); only whole windows are profiled.
+
+The windows are not counted one at a time. The counts of the current window are kept and moved along the genome:
+the motifs that leave the window on the left are taken away and the ones that enter it on the right are added, so
+each motif is added and taken away once no matter how much the windows overlap. For inverted repeats, a motif that
+enters adds one pairing for every partner already in the window, less the partners it overlaps (less than a
+stem-length to its left); a motif that leaves takes its pairings with it the same way. The counts of a window are
+the same as those of Sequence.countMotifs and Sequence.countInvertedRepeats on its bases.
+
+The profiles are compact arrays with a fixed number of integers per window. Motifs are the integer codes from
+kmerFunctions; the partners of a motif are listed from dnaFunctions, so the profiler is meant for short stems.
+-----------------------------------------------------------------------------------------------------------------
+"""
+
+from array import array
+from collections import defaultdict
+import dnaFunctions as DNA
+import kmerFunctions as KMER
+
+# array type of the profiles
+PROFILE_TYPE = 'i'
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def numberOfWindows(sequenceLength, window, step):
+    """
+    ==============================================================================================
+    SUMMARY: Counts the whole windows of a sequence
+    PRE: assigned(sequenceLength), assigned(window), assigned(step) (both at least 1)
+    POST: Returns the number of windows of window bases, starting every step bases, that fit in the sequence
+    ==============================================================================================
+    """
+
+    if sequenceLength < window:
+        return 0
+
+    return (sequenceLength - window) // step + 1
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def windowRanges(numberOfCodes, length, window, step):
+    """
+    ==============================================================================================
+    SUMMARY: Finds the motifs of each window
+    PRE: assigned(numberOfCodes) (the length of the sequence - length + 1), assigned(length), assigned(window),
+         assigned(step)
+    POST: Yields (first, stop) for each window: the motifs of the given length starting at first to
+          stop - 1 lie entirely in the window
+    ==============================================================================================
+    """
+
+    sequenceLength = numberOfCodes + length - 1
+
+    for i in xrange(numberOfWindows(sequenceLength, window, step)):
+
+        first = i * step
+
+        yield first, first + window - length + 1
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def profileKmers(codes, k, window, step):
+    """
+    ==============================================================================================
+    SUMMARY: Counts the k-mers of every window of a sequence
+    PRE: assigned(codes) (KMER.encodeKmers(sequence, k)), assigned(k), assigned(window) (at least k),
+         assigned(step)
+    POST: Returns an array with 4^k counts per window, in the order of dnaFunctions.allPossibleMotifs(k)
+    ==============================================================================================
+    """
+
+    profile = array(PROFILE_TYPE)
+    counts  = array(PROFILE_TYPE, [0]) * (4 ** k)
+
+    # the motifs in the current window start at low to high - 1
+    low  = 0
+    high = 0
+
+    for first, stop in windowRanges(len(codes), k, window, step):
+
+        # a window that does not overlap the last one starts from nothing
+        if first >= high:
+            counts = array(PROFILE_TYPE, [0]) * (4 ** k)
+            low    = first
+            high   = first
+
+        # take away the motifs that left on the left
+        while low < first:
+            if codes[low] >= 0:
+                counts[codes[low]] -= 1
+            low += 1
+
+        # add the motifs that entered on the right
+        while high < stop:
+            if codes[high] >= 0:
+                counts[codes[high]] += 1
+            high += 1
+
+        profile.extend(counts)
+
+    return profile
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def profileInvertedRepeats(codes, min, max, mismatches, window, step):
+    """
+    ==============================================================================================
+    SUMMARY: Counts the potential inverted repeats of stem-length min to max (inclusive) in every window of
+             a sequence
+    PRE: assigned(codes) (a dictionary from each stem-length to KMER.encodeKmers(sequence, stem-length)),
+         assigned(min), assigned(max), assigned(mismatches), assigned(window) (at least max), assigned(step)
+    POST: Returns an array with max - min + 1 counts per window (one per stem-length): the number of
+          pairings of a motif with a reverse complement (with up to mismatches mismatches) that lie in
+          the window and do not overlap
+    ==============================================================================================
+    """
+
+    lengths = range(min, max + 1)
+
+    profiles = []
+
+    for length in lengths:
+        profiles.append(profileStemLength(codes[length], length, mismatches, window, step))
+
+    # interleave the stem-lengths, so the counts of each window are together
+    profile = array(PROFILE_TYPE, [0]) * (len(profiles[0]) * len(lengths))
+
+    for i in xrange(len(lengths)):
+        profile[i::len(lengths)] = profiles[i]
+
+    return profile
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def profileStemLength(motifCodes, length, mismatches, window, step):
+    """
+    ==============================================================================================
+    SUMMARY: Counts the potential inverted repeats of one stem-length in every window of a sequence
+    PRE: assigned(motifCodes) (KMER.encodeKmers(sequence, length)), assigned(length), assigned(mismatches),
+         assigned(window), assigned(step)
+    POST: Returns an array with the number of pairings in each window
+    ==============================================================================================
+    """
+
+    profile = array(PROFILE_TYPE)
+
+    # the overlapping partners of each location, found once rather than each time it enters or leaves
+    leftOverlaps, rightOverlaps = overlapCounts(motifCodes, length, mismatches)
+
+    # the number of times each motif occurs in the current window, and the pairings among them
+    counts   = defaultdict(int)
+    pairings = 0
+
+    # the partners of each motif, listed once
+    partners = {}
+
+    low  = 0
+    high = 0
+
+    for first, stop in windowRanges(len(motifCodes), length, window, step):
+
+        if first >= high:
+            counts   = defaultdict(int)
+            pairings = 0
+            low      = first
+            high     = first
+
+        # a motif leaving on the left loses its pairings with the partners still in the window, except
+        # the ones that overlap it (less than a stem-length to its right)
+        while low < first:
+
+            motif = motifCodes[low]
+
+            if motif >= 0:
+
+                motifPartners = partners.get(motif)
+
+                if motifPartners is None:
+                    motifPartners = partners[motif] = tuple(DNA.reverseComplementMismatchCodes(motif, length, mismatches))
+
+                counts[motif] -= 1
+
+                for partner in motifPartners:
+                    pairings -= counts[partner]
+
+                if low + length <= high:
+                    pairings += rightOverlaps[low]
+                else:
+                    for neighbor in xrange(low + 1, high):
+                        if motifCodes[neighbor] in motifPartners:
+                            pairings += 1
+
+            low += 1
+
+        # a motif entering on the right pairs with the partners already in the window, except the ones
+        # that overlap it (less than a stem-length to its left)
+        while high < stop:
+
+            motif = motifCodes[high]
+
+            if motif >= 0:
+
+                motifPartners = partners.get(motif)
+
+                if motifPartners is None:
+                    motifPartners = partners[motif] = tuple(DNA.reverseComplementMismatchCodes(motif, length, mismatches))
+
+                for partner in motifPartners:
+                    pairings += counts[partner]
+
+                if high - length + 1 >= low:
+                    pairings -= leftOverlaps[high]
+                else:
+                    for neighbor in xrange(low, high):
+                        if motifCodes[neighbor] in motifPartners:
+                            pairings -= 1
+
+                counts[motif] += 1
+
+            high += 1
+
+        profile.append(pairings)
+
+    return profile
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def overlapCounts(motifCodes, length, mismatches):
+    """
+    ==============================================================================================
+    SUMMARY: Counts the partners of every motif that overlap it
+    PRE: assigned(motifCodes) (KMER.encodeKmers(sequence, length)), assigned(length), assigned(mismatches)
+    POST: Returns two arrays with an element per location: the number of partners of the motif there
+          that start less than a stem-length to its left, and to its right
+    ==============================================================================================
+    """
+
+    if KMER.numpy is not None:
+        return overlapCountsVectorized(motifCodes, length, mismatches)
+
+    leftOverlaps  = array(PROFILE_TYPE, [0]) * len(motifCodes)
+    rightOverlaps = array(PROFILE_TYPE, [0]) * len(motifCodes)
+
+    # the partners of each motif, listed once
+    partners = {}
+
+    # partnership is symmetric, so each pair is found once, from its right motif
+    for location in xrange(len(motifCodes)):
+
+        motif = motifCodes[location]
+
+        if motif < 0:
+            continue
+
+        motifPartners = partners.get(motif)
+
+        if motifPartners is None:
+            motifPartners = partners[motif] = DNA.reverseComplementMismatchCodes(motif, length, mismatches)
+
+        for neighbor in xrange(location - length + 1 if location >= length - 1 else 0, location):
+            if motifCodes[neighbor] in motifPartners:
+                leftOverlaps[location] += 1
+                rightOverlaps[neighbor] += 1
+
+    return leftOverlaps, rightOverlaps
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def overlapCountsVectorized(motifCodes, length, mismatches):
+    """
+    ==============================================================================================
+    SUMMARY: Counts the partners of every motif that overlap it with numpy
+    PRE: assigned(motifCodes), assigned(length), assigned(mismatches), numpy is installed
+    POST: Returns the same two arrays as overlapCounts
+    ==============================================================================================
+    """
+
+    numpy = KMER.numpy
+
+    codes = numpy.frombuffer(motifCodes, dtype=numpy.int32).astype(numpy.int64)
+    valid = codes >= 0
+
+    # the reverse complement of the motif at every location, found once per distinct motif
+    distinct, inverse = numpy.unique(codes[valid], return_inverse=True)
+
+    reverseComplements        = numpy.full(len(codes), -1, dtype=numpy.int64)
+    reverseComplements[valid] = numpy.array([DNA.reverseComplementCode(int(code), length) for code in distinct], dtype=numpy.int64)[inverse]
+
+    leftOverlaps  = numpy.zeros(len(codes), dtype=numpy.int32)
+    rightOverlaps = numpy.zeros(len(codes), dtype=numpy.int32)
+
+    for distance in xrange(1, length):
+
+        if distance >= len(codes):
+            break
+
+        left  = reverseComplements[:-distance]
+        right = codes[distance:]
+
+        # the number of bases in which the right motif differs from the reverse complement of the left one
+        difference = left ^ right
+        differing  = numpy.zeros(len(difference), dtype=numpy.int32)
+
+        for base in xrange(length):
+            differing += ((difference >> (2 * base)) & 3) != 0
+
+        partners = (left >= 0) & (right >= 0) & (differing <= mismatches)
+
+        leftOverlaps[distance:]  += partners
+        rightOverlaps[:-distance] += partners
+
+    return array(PROFILE_TYPE, leftOverlaps.tostring()), array(PROFILE_TYPE, rightOverlaps.tostring())
+#-----------------------------------------------------------------------------------------------------------------#
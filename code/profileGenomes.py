@@ -0,0 +1,127 @@
+"""
+-----------------------------------------------------------------------------------------------------------------
+profileGenomes.py
+Programmer: Chris DeMolles
+
+Tested with Python 2.7.3
+
+This script profiles every genome (.fna, or .fna.gz) in the bug directory along its length with a sliding window
+(see profileFunctions): the 4-mer composition and the number of potential inverted repeats of stem-length 3 to 5 in
+each window. The genomes are read straight from the bug directory, so the database is not needed.
+
+Each window is one row of the output (genome_profiles.npy with genome_profiles_metadata.tsv in the data directory
+by default), named <file prefix>_<first base>_<last base> (1-based) with the kingdom of its bug and the type
+'window'. The records of a genome with several of them are profiled as if they were joined end to end.
+
+Usage: python profileGenomes.py [--window N] [--step N] [--k K] [--stems MIN-MAX] [--mismatches D] [--format F]
+-----------------------------------------------------------------------------------------------------------------
+"""
+
+import argparse
+import database
+import genomeStorage
+import os
+import outputWriters
+import dnaFunctions as DNA
+import kmerFunctions as KMER
+import profileFunctions as PROFILE
+
+DEFAULT_WINDOW = 10000
+DEFAULT_STEP   = 1000
+
+DEFAULT_OUTPUT = 'genome_profiles'
+
+
+def main():
+
+    argumentParser = argparse.ArgumentParser(description='Profiles the k-mer composition and inverted repeat density of every genome in the bug directory with a sliding window.')
+    argumentParser.add_argument('--window', type=int, default=DEFAULT_WINDOW, help='bases in each window (default: ' + str(DEFAULT_WINDOW) + ')')
+    argumentParser.add_argument('--step', type=int, default=DEFAULT_STEP, help='bases from the start of one window to the start of the next (default: ' + str(DEFAULT_STEP) + ')')
+    argumentParser.add_argument('--k', type=int, default=4, help='length of the k-mers (default: 4)')
+    argumentParser.add_argument('--stems', default='3-5', help='range of stem-lengths of the inverted repeats, as MIN-MAX (default: 3-5)')
+    argumentParser.add_argument('--mismatches', type=int, default=0, help='number of mismatches of the inverted repeats (default: 0)')
+    argumentParser.add_argument('--format', action='append', choices=sorted(outputWriters.WRITERS), help='output format; may be given more than once (default: npy)')
+    argumentParser.add_argument('--output', default=DEFAULT_OUTPUT, help='name of the output files in the data directory, without the extension (default: ' + DEFAULT_OUTPUT + ')')
+    arguments = argumentParser.parse_args()
+
+    try:
+        stemMin, stemMax = [int(length) for length in arguments.stems.split('-')]
+    except ValueError:
+        argumentParser.error('--stems must be MIN-MAX')
+
+    if arguments.window < max(arguments.k, stemMax) or arguments.step < 1 or stemMin < 1 or stemMin > stemMax or max(arguments.k, stemMax) > 15:
+        argumentParser.error('the window must hold the longest motif, the step must be at least 1, and k and the stem-lengths must be from 1 to 15')
+
+    columns = DNA.allPossibleMotifs(arguments.k)
+
+    for length in xrange(stemMin, stemMax + 1):
+        if arguments.mismatches == 0:
+            columns.append('IRs_Stem_Len_' + str(length) + '_Perfect')
+        else:
+            columns.append('IRs_Stem_Len_' + str(length) + '_' + str(arguments.mismatches) + '_Mismatch')
+
+    dataDirectory = database.getDataDirectory()
+    bugDirectory  = database.getBugDirectory()
+
+    writers = [outputWriters.openWriter(format, os.path.join(dataDirectory, arguments.output), columns) for format in (arguments.format or ['npy'])]
+
+    for kingdom, prefix, fastaFileName in findGenomes(bugDirectory):
+
+        print "Profiling", prefix, "..."
+
+        genome = genomeStorage.loadGenome(fastaFileName)
+
+        # every motif length comes from the same pass over the genome
+        codes = KMER.encodeKmerRange(genome, min(arguments.k, stemMin), max(arguments.k, stemMax))
+
+        kmerProfile = PROFILE.profileKmers(codes[arguments.k], arguments.k, arguments.window, arguments.step)
+        irProfile   = PROFILE.profileInvertedRepeats(codes, stemMin, stemMax, arguments.mismatches, arguments.window, arguments.step)
+
+        kmerColumns = 4 ** arguments.k
+        irColumns   = stemMax - stemMin + 1
+
+        rows = []
+
+        for i in xrange(PROFILE.numberOfWindows(len(genome), arguments.window, arguments.step)):
+
+            first = i * arguments.step
+
+            counts = kmerProfile[i * kmerColumns:(i + 1) * kmerColumns].tolist() + irProfile[i * irColumns:(i + 1) * irColumns].tolist()
+
+            rows.append((prefix + '_' + str(first + 1) + '_' + str(first + arguments.window), kingdom, counts, 'window'))
+
+        for writer in writers:
+            writer.writeRows(rows)
+            writer.flush()
+
+        print "Profiled", len(rows), "windows"
+
+    for writer in writers:
+        writer.close()
+
+
+def findGenomes(bugDirectory):
+
+    genomes = []
+
+    for directory, subdirectories, fileNames in sorted(os.walk(bugDirectory)):
+
+        # the kingdom is the folder under the bug directory
+        kingdom = os.path.relpath(directory, bugDirectory).split(os.sep)[0]
+
+        for fileName in sorted(fileNames):
+
+            if fileName.endswith('.fna'):
+                prefix = fileName[:-len('.fna')]
+            elif fileName.endswith('.fna.gz') and fileName[:-len('.gz')] not in fileNames:
+                prefix = fileName[:-len('.fna.gz')]
+            else:
+                continue
+
+            genomes.append((kingdom, prefix, os.path.join(directory, prefix + '.fna')))
+
+    return genomes
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,382 @@
+"""
+-----------------------------------------------------------------------------------------------------------------
+resultCache.py
+Programmer: Chris DeMolles
+
+Tested with Python 2.7.3
+
+This module keeps the motif and inverted repeat counts of sequences, so a sequence that has been counted before (in
+this run or an earlier one) is not counted again. A result is keyed by a hash of the sequence and of the parameters
+it was counted with, so identical sequences (for example the RNA of duplicated rRNA operons) share one result no
+matter which bug or location they come from.
+
+Results are written to a SQLite file in the data directory (results_cache.sqlite, or cache_file_name under [files]
+in config.ini). New results and the times results were last used are written in batches by flush. When the file
+grows past max_megabytes (under [cache], 256 by default), the least recently used results are evicted. Setting
+max_megabytes to 0 keeps results in memory only. The most recently used results are also held in memory, up to
+memo_megabytes (under [cache], 32 by default) of their marshalled size; older ones are read back from the file.
+-----------------------------------------------------------------------------------------------------------------
+"""
+
+import atexit, hashlib, marshal, os, sqlite3, time
+from collections import OrderedDict
+import database
+
+# changing how anything is counted must change this, so old results are not used
+CACHE_VERSION = 2
+
+DEFAULT_CACHE_FILE_NAME = 'results_cache.sqlite'
+DEFAULT_MAX_MEGABYTES   = 256
+DEFAULT_MEMO_MEGABYTES  = 32
+
+# number of new results held before they are written to the file
+FLUSH_RESULTS = 1000
+
+# eviction brings the file down to this fraction of its limit, so it does not run on every flush
+EVICTION_TARGET = 0.9
+
+SCHEMA = ["CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value BLOB, size INTEGER, last_used REAL)",
+          "CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)"]
+
+_caches = {}
+
+
+class ResultCache(object):
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def __init__(self, fileName=None, maxBytes=DEFAULT_MAX_MEGABYTES << 20, maxMemoBytes=DEFAULT_MEMO_MEGABYTES << 20):
+        """
+        ==============================================================================================
+        SUMMARY: Initializes result cache object
+        PRE: optional(fileName) (None keeps results in memory only), optional(maxBytes), optional(maxMemoBytes)
+        POST: Initializes an empty cache; the file is opened the first time it is needed
+        ==============================================================================================
+        """
+
+        self.fileName     = fileName
+        self.maxBytes     = maxBytes
+        self.maxMemoBytes = maxMemoBytes
+
+        self.connection = None
+
+        # the most recently used results, keyed like the file, with the size of each (least recently
+        # used first), and their total size
+        self.memo      = OrderedDict()
+        self.memoBytes = 0
+
+        # results not yet written, and keys whose last use has not been written
+        self.pending = {}
+        self.used    = set()
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def key(self, function, parameters, sequence):
+        """
+        ==============================================================================================
+        SUMMARY: Finds the key of a result
+        PRE: assigned(function) (the name of what was counted), assigned(parameters) (a tuple), assigned(sequence)
+        POST: Returns the SHA-1 of the cache version, function, parameters and sequence as a hex string
+        ==============================================================================================
+        """
+
+        digest = hashlib.sha1(str(CACHE_VERSION) + '\t' + function + '\t' + repr(parameters) + '\n')
+        digest.update(str(sequence))
+
+        return digest.hexdigest()
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def get(self, function, parameters, sequence):
+        """
+        ==============================================================================================
+        SUMMARY: Looks up a result
+        PRE: assigned(function), assigned(parameters), assigned(sequence)
+        POST: Returns the stored result, or None if this sequence has not been counted with these parameters
+        ==============================================================================================
+        """
+
+        key = self.key(function, parameters, sequence)
+
+        if key in self.memo:
+
+            # move the result to the most recently used end
+            value, size    = self.memo.pop(key)
+            self.memo[key] = (value, size)
+
+            return value
+
+        # a result forgotten in memory before it was written is still queued
+        if key in self.pending:
+
+            value = marshal.loads(self.pending[key])
+
+            self.remember(key, value, len(self.pending[key]))
+
+            return value
+
+        connection = self.connect()
+
+        if connection is None:
+            return None
+
+        row = connection.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+
+        if row is None:
+            return None
+
+        value = marshal.loads(str(row[0]))
+
+        self.remember(key, value, len(row[0]))
+        self.used.add(key)
+
+        return value
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def put(self, function, parameters, sequence, value):
+        """
+        ==============================================================================================
+        SUMMARY: Stores a result
+        PRE: assigned(function), assigned(parameters), assigned(sequence), assigned(value) (made of numbers,
+             strings, lists, tuples and dictionaries)
+        POST: Keeps value in memory and queues it to be written to the file
+        ==============================================================================================
+        """
+
+        key  = self.key(function, parameters, sequence)
+        data = marshal.dumps(value)
+
+        self.remember(key, value, len(data))
+
+        if self.fileName is None:
+            return
+
+        self.pending[key] = data
+
+        if len(self.pending) >= FLUSH_RESULTS:
+            self.flush()
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def remember(self, key, value, size):
+        """
+        ==============================================================================================
+        SUMMARY: Holds a result in memory
+        PRE: assigned(key), assigned(value), assigned(size) (the size of the marshalled value)
+        POST: Makes value the most recently used result in memory and forgets the least recently used
+              ones until the results in memory are at most self.maxMemoBytes
+        ==============================================================================================
+        """
+
+        if key in self.memo:
+            self.memoBytes -= self.memo.pop(key)[1]
+
+        if size > self.maxMemoBytes:
+            return
+
+        self.memo[key]  = (value, size)
+        self.memoBytes += size
+
+        while self.memoBytes > self.maxMemoBytes:
+            self.memoBytes -= self.memo.popitem(last=False)[1][1]
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def connect(self):
+        """
+        ==============================================================================================
+        SUMMARY: Opens the cache file
+        PRE: None
+        POST: Returns the connection to the cache file (None if results are kept in memory only),
+              creating the file and its table the first time
+        ==============================================================================================
+        """
+
+        if self.fileName is None:
+            return None
+
+        if self.connection is None:
+
+            # worker processes share the file, so wait for each other's writes
+            self.connection = sqlite3.connect(self.fileName, timeout=60)
+            self.connection.execute("PRAGMA journal_mode = WAL")
+            self.connection.execute("PRAGMA synchronous = NORMAL")
+
+            for statement in SCHEMA:
+                self.connection.execute(statement)
+
+            self.connection.commit()
+
+        return self.connection
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def flush(self):
+        """
+        ==============================================================================================
+        SUMMARY: Writes the queued results and last uses to the cache file
+        PRE: None
+        POST: Writes everything queued in one transaction and evicts the least recently used results
+              if the file is over its limit
+        ==============================================================================================
+        """
+
+        if len(self.pending) == 0 and len(self.used) == 0:
+            return
+
+        connection = self.connect()
+        now        = time.time()
+
+        connection.executemany("INSERT OR REPLACE INTO results (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                               ((key, sqlite3.Binary(value), len(key) + len(value), now) for key, value in self.pending.iteritems()))
+
+        connection.executemany("UPDATE results SET last_used = ? WHERE key = ?", ((now, key) for key in self.used))
+
+        connection.commit()
+
+        self.pending = {}
+        self.used    = set()
+
+        self.evict()
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def evict(self):
+        """
+        ==============================================================================================
+        SUMMARY: Evicts the least recently used results from the cache file
+        PRE: None
+        POST: If the results in the file are larger than self.maxBytes, deletes the least recently used
+              ones until they are at most EVICTION_TARGET of it
+        ==============================================================================================
+        """
+
+        connection = self.connect()
+
+        totalBytes = connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+        if totalBytes <= self.maxBytes:
+            return
+
+        target = int(self.maxBytes * EVICTION_TARGET)
+
+        keys = []
+
+        for key, size in connection.execute("SELECT key, size FROM results ORDER BY last_used"):
+
+            if totalBytes <= target:
+                break
+
+            keys.append((key,))
+            totalBytes -= size
+
+        connection.executemany("DELETE FROM results WHERE key = ?", keys)
+        connection.commit()
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def close(self):
+        """
+        ==============================================================================================
+        SUMMARY: Closes the cache file
+        PRE: None
+        POST: Flushes the queued results and closes the connection
+        ==============================================================================================
+        """
+
+        self.flush()
+
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def getCache():
+    """
+    ==============================================================================================
+    SUMMARY: Returns the result cache of this process
+    PRE: None
+    POST: Returns the ResultCache for the file named in the configuration file, creating it the first time;
+          results are kept in memory only if there is no configuration file or max_megabytes is 0
+    ==============================================================================================
+    """
+
+    # like database connections, a cache inherited from the parent process is not used after a fork
+    pid = os.getpid()
+
+    if pid not in _caches:
+
+        _caches.clear()
+
+        parser = database.getConfig()
+
+        fileName     = None
+        maxBytes     = DEFAULT_MAX_MEGABYTES << 20
+        maxMemoBytes = DEFAULT_MEMO_MEGABYTES << 20
+
+        if parser.has_section('directories'):
+
+            cacheFileName = DEFAULT_CACHE_FILE_NAME
+
+            if parser.has_option('files', 'cache_file_name'):
+                cacheFileName = parser.get('files', 'cache_file_name')
+
+            if parser.has_option('cache', 'max_megabytes'):
+                maxBytes = parser.getint('cache', 'max_megabytes') << 20
+
+            if parser.has_option('cache', 'memo_megabytes'):
+                maxMemoBytes = parser.getint('cache', 'memo_megabytes') << 20
+
+            if maxBytes > 0:
+                fileName = os.path.join(database.getDataDirectory(), cacheFileName)
+
+        _caches[pid] = ResultCache(fileName, maxBytes, maxMemoBytes)
+
+    return _caches[pid]
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def setCache(cache):
+    """
+    ==============================================================================================
+    SUMMARY: Replaces the result cache of this process
+    PRE: assigned(cache) (a ResultCache, for example ResultCache(None) to start from an empty cache in memory)
+    POST: getCache returns cache in this process from now on
+    ==============================================================================================
+    """
+
+    _caches.clear()
+    _caches[os.getpid()] = cache
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def flushCache():
+    """
+    ==============================================================================================
+    SUMMARY: Writes the queued results of this process to the cache file
+    PRE: None
+    POST: Calls flush on the cache of this process if it has been created
+    ==============================================================================================
+    """
+
+    cache = _caches.get(os.getpid())
+
+    if cache is not None:
+        cache.flush()
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+# write whatever is left when the interpreter exits normally
+atexit.register(flushCache)
@@ -9,27 +9,45 @@ This module defines the Sequence class. The Sequence class stores information ab
 a starting location, ending location, the strand it's on, the type of sequence, and the name of the sequence.
 
 Methods include generating the motifs for the sequence and counting the number of inverted repeats for the sequence.
+
+A sequence can also be a view of a genome: only its coordinates are stored, and its bases are cut out of the genome
+(across the origin if start > end, and reverse complemented on the - strand) the first time they are used. The
+attributes are kept in slots, so a view takes a few dozen bytes until then.
 -----------------------------------------------------------------------------------------------------------------
 """
 
 import dnaFunctions as DNA
-import random, re
+import instrumentation as INSTRUMENT
+import irFunctions as IR
+import kmerFunctions as KMER
+import resultCache
+import shuffleFunctions as SHUFFLE
+import re
 
 
 class Sequence(object):
 
+    # the bases (None until a view of a genome is first used) and the genome they are cut from
+    __slots__ = ['bases', 'genome', 'start', 'end', 'strand', 'type', 'name']
+
     #-----------------------------------------------------------------------------------------------------------------#
-    def __init__(self, sequence, start=None, end=None, strand=None, type=None, name=None):
+    def __init__(self, sequence, start=None, end=None, strand=None, type=None, name=None, genome=None):
         """
         ==============================================================================================
         SUMMARY: Initializes sequence object
-        PRE: assigned(sequence), optional(start), optional(end), optional(strand), optional(type), optional(name)
+        PRE: assigned(sequence) (None for a view of genome), optional(start), optional(end), optional(strand),
+             optional(type), optional(name), optional(genome) (a string or genome storage backend)
         POST: Initializes a new sequence object with the provided parameters
         ==============================================================================================
         """
 
-        # assign the class members the following parameter data
-        self.sequence = sequence.strip()
+        # assign the class members the following parameter data (a genome storage backend from
+        # genomeStorage is kept as it is rather than being read into a string)
+        if isinstance(sequence, basestring):
+            sequence = sequence.strip()
+
+        self.bases    = sequence
+        self.genome   = genome
         self.start    = start
         self.end      = end
         self.strand   = strand
@@ -38,17 +56,79 @@ class Sequence(object):
     #-----------------------------------------------------------------------------------------------------------------#
 
 
+    #-----------------------------------------------------------------------------------------------------------------#
+    @classmethod
+    def fromGenome(cls, genome, start, end, strand, type=None, name=None):
+        """
+        ==============================================================================================
+        SUMMARY: Makes a view of the bases of a genome from start to end
+        PRE: assigned(genome) (a string or genome storage backend), assigned(start), assigned(end) (1-based,
+             inclusive; start > end for a sequence that crosses the origin), assigned(strand), optional(type),
+             optional(name)
+        POST: Returns a sequence that stores only its coordinates until its bases are used
+        ==============================================================================================
+        """
+
+        return cls(None, start, end, strand, type, name, genome)
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    @property
+    def sequence(self):
+        """
+        ==============================================================================================
+        SUMMARY: Returns the bases of the sequence
+        PRE: assigned(self.bases) or assigned(self.genome)
+        POST: Returns the bases, cutting them out of self.genome the first time for a view
+        ==============================================================================================
+        """
+
+        if self.bases is None and self.genome is not None:
+
+            genome = self.genome
+
+            # a sequence that crosses the origin of a circular genome is listed with start > end
+            if self.start <= self.end:
+                bases = genome[self.start - 1:self.end]
+            else:
+                bases = genome[self.start - 1:len(genome)] + genome[0:self.end]
+
+            if self.strand == '-':
+                bases = DNA.reverseComplement(bases)
+
+            self.bases = bases
+
+        return self.bases
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    @sequence.setter
+    def sequence(self, sequence):
+        """
+        ==============================================================================================
+        SUMMARY: Replaces the bases of the sequence
+        PRE: assigned(sequence)
+        POST: Sets the bases to sequence
+        ==============================================================================================
+        """
+
+        self.bases = sequence
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
     #-----------------------------------------------------------------------------------------------------------------#
     def __str__(self):
         """
         ==============================================================================================
         SUMMARY: Overloads the string casting operator
         PRE: assigned(self.sequence)
-        POST: Returns self.sequence
+        POST: Returns self.sequence as a string
         ==============================================================================================
         """
 
-        return self.sequence
+        return str(self.sequence)
     #-----------------------------------------------------------------------------------------------------------------#
 
 
@@ -58,10 +138,18 @@ class Sequence(object):
         ==============================================================================================
         SUMMARY: Returns the length of the sequence
         PRE: assigned(self.sequence)
-        POST: Returns the length of self.sequence
+        POST: Returns the length of self.sequence (found from the coordinates of a view whose bases
+              have not been used yet)
         ==============================================================================================
         """
 
+        if self.bases is None and self.genome is not None:
+
+            if self.start <= self.end:
+                return self.end - self.start + 1
+
+            return len(self.genome) - self.start + 1 + self.end
+
         return len(self.sequence)
     #-----------------------------------------------------------------------------------------------------------------#
 
@@ -72,14 +160,42 @@ class Sequence(object):
         ==============================================================================================
         SUMMARY: Overloads indexing and slicing operator
         PRE: assigned(self.sequence), assigned(key)
-        POST: Returns a new sequence initialized to self.sequence[key]
+        POST: Returns a new sequence initialized to self.sequence[key] using 1-based indexing (as if
+              a bogus character were at index 0)
         ==============================================================================================
         """
 
-        # add bogus character to beginning of sequence for 1-based indexing
-        section = 'X' + self.sequence
+        # shift the key instead of adding a bogus character to the beginning of the sequence, so only
+        # the bases asked for are copied
+        length = len(self.sequence) + 1
+
+        if isinstance(key, slice):
+
+            start, stop, step = key.indices(length)
+
+            if step == 1:
+
+                if stop <= start:
+                    return Sequence('')
+
+                # index 0 is the bogus character
+                if start == 0:
+                    return Sequence('X' + self.sequence[0:stop - 1])
+
+                return Sequence(self.sequence[start - 1:stop - 1])
+
+            return Sequence(''.join(self.sequence[i - 1] if i > 0 else 'X' for i in xrange(start, stop, step)))
 
-        return Sequence(section[key])
+        if key < 0:
+            key += length
+
+        if key < 0 or key >= length:
+            raise IndexError('string index out of range')
+
+        if key == 0:
+            return Sequence('X')
+
+        return Sequence(self.sequence[key - 1])
     #-----------------------------------------------------------------------------------------------------------------#
 
 
@@ -104,92 +220,115 @@ class Sequence(object):
 
 
     #-----------------------------------------------------------------------------------------------------------------#
-    def motifs(self, min, max):
+    def kmerIndex(self, min, max):
         """
         ==============================================================================================
-        SUMMARY: Finds all the motifs of length min to length max (inclusive)
+        SUMMARY: Finds the starting locations of the motifs of length min to length max (inclusive)
+        PRE: assigned(self.sequence), assigned(min), assigned(max)
+        POST: Returns a dictionary with the length as the key and the value as a dictionary from the
+              2-bit code of each motif of that length to an array of its starting locations
+        ==============================================================================================
+        """
+
+        return KMER.indexKmers(self.sequence, min, max)
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def kmerCodes(self, min, max):
+        """
+        ==============================================================================================
+        SUMMARY: Finds the codes of the motifs of length min to length max (inclusive) at every location
         PRE: assigned(self.sequence), assigned(min), assigned(max)
-        POST: Returns a dictionary with the key as the length of the motif and the value as each of
-              the motifs of that length
+        POST: Returns a dictionary with the length as the key and the value as an array of the 2-bit code
+              of the motif starting at each location (-1 if it contains a base other than A, C, G or T)
         ==============================================================================================
         """
 
-        # tack on a dummy character to the sequence so the actual first character in the sequence
-        # starts at index 1
-        section = 'X' + self.sequence
+        # every length is found in the same pass over the sequence
+        return KMER.encodeKmerRange(self.sequence, min, max)
+    #-----------------------------------------------------------------------------------------------------------------#
 
-        # get the length of the sequence
-        strandLength = len(section)
 
-        # start at the first character in the sequence
-        start  = 1
+    #-----------------------------------------------------------------------------------------------------------------#
+    @INSTRUMENT.timed('sequence.motifs', bases=INSTRUMENT.sequenceLength)
+    def motifs(self, min, max):
+        """
+        ==============================================================================================
+        SUMMARY: Finds all the motifs of length min to length max (inclusive)
+        PRE: assigned(self.sequence), assigned(min), assigned(max)
+        POST: Returns a dictionary with the key as the motif and the value as an array of the starting
+              locations of the motif (motifs containing a base other than A, C, G or T are skipped)
+        ==============================================================================================
+        """
 
         # initialize a blank dictionary to store all motifs of length min up to length max
         motifs = {}
-    
-        # while haven't traversed the entire genome
-        while start < len(section):
-        
-            # for i from min to max (inclusive)
-            for i in xrange(min, max + 1): 
-
-                # if the start is less than the length of the strand - i
-                if start <= strandLength - i:
-
-                    # cut from start to start + i to form the motif
-                    motif = section[start:start + i]
-
-                    # if the motif is already in the dictionary
-                    if motif in motifs:
-                        # append the starting location to the dictionary of motifs
-                        motifs[motif].append(start)
-                    # otherwise
-                    else:
-                        # initialize the list with start
-                        motifs[motif] = [start]
-        
-            # increment start
-            start = start + 1
-    
+
+        # encode the motifs as integers and only turn the distinct ones back into strings
+        for length, locations in self.kmerIndex(min, max).iteritems():
+            for code in locations:
+                motifs[KMER.decodeKmer(code, length)] = locations[code]
+
         return motifs
     #-----------------------------------------------------------------------------------------------------------------#
 
 
     #-----------------------------------------------------------------------------------------------------------------#
+    @INSTRUMENT.timed('sequence.getInvertedRepeats', bases=INSTRUMENT.sequenceLength)
     def getInvertedRepeats(self, min, max, mismatches, type='pairings'):
         """
         ==============================================================================================
         SUMMARY: Finds potential inverted repeats of stem-length min to max (inclusive) with mismatches
-        PRE: assigned(self.sequence), assigned(min), assigned(max), assigned(mismatches) (0 or 1)
+        PRE: assigned(self.sequence), assigned(min), assigned(max), assigned(mismatches)
         POST: Returns a dictionary with the key as the stem-length of the IR and the value as the
-              number of IRs of that stem-length
+              set of IRs of that stem-length: for 'pairings', the integer first * (len(self) + 1) + second
+              for motifs starting at first < second (1-based); for 'nucleotides', the locations of the
+              bases they cover
         ==============================================================================================
         """
 
         # initialize a blank dictionary to hold the inverted repeats
         irs = {}
 
-        # get the motifs from min to max
-        motifs = self.motifs(min, max)
+        # a pairing is identified by the locations of its two motifs packed in one integer
+        sequenceLength = len(self)
+        keyBase        = sequenceLength + 1
+
+        # get the motifs from min to max, grouped by length and encoded as integers
+        index = self.kmerIndex(min, max)
 
-        # loop over each motif in the list of motifs
-        for motif in motifs:
+        for length in index:
 
-            # make a set to store the potential inverted repeats
-            # using a set to avoid adding the same element multiple times
+            motifs = index[length]
+
+            # skip lengths that do not occur in the sequence
+            if len(motifs) == 0:
+                continue
+
+            # make a set to store the potential inverted repeats, or a flag per base (1-based, so one extra
+            # byte) for the nucleotides they cover
             invertedRepeats = set()
+            covered         = bytearray(keyBase)
+            stem            = '\x01' * length
+
+            # find the reverse complements (with up to mismatches mismatched base pairs) of each motif
+            # that occur in the sequence
+            partners, totalPartners = IR.findPartners(dict((motif, len(motifs[motif])) for motif in motifs), length, mismatches)
 
-            # take the reverse complement of the motif
-            reverseComplementMismatches = DNA.reverseComplementMismatches(motif, mismatches)
+            INSTRUMENT.peak('getInvertedRepeats.motifs', len(motifs))
+            # the entries of the partner sets, not the motifs that have partners
+            if INSTRUMENT.isEnabled():
+                INSTRUMENT.peak('getInvertedRepeats.partners', sum(len(motifPartners) for motifPartners in partners.itervalues()))
 
-            # for each reverse complement with one or more mismatched base pairs
-            for reverseComplement in reverseComplementMismatches:
+            # loop over each motif that has a reverse complement
+            for motif in partners:
 
-                # if the reverse complement is also in the dictionary, then we know we have a possible IR
-                if reverseComplement in motifs:
+                # get the location(s) where this motif occurs
+                motifLocations = motifs[motif]
 
-                    # get the location(s) where this motif occurs
-                    motifLocations = motifs[motif]
+                # for each reverse complement with zero or more mismatched base pairs
+                for reverseComplement in partners[motif]:
 
                     # get the location(s) where the reverse complement occurs
                     reverseComplementLocations = motifs[reverseComplement]
@@ -200,77 +339,96 @@ class Sequence(object):
                         # loop over each starting position in the list of location(s) where the reverse complement occurs
                         for reverseComplementLocation in reverseComplementLocations:
 
-                            # make sure there are no letters shared between the motifs
-                            if abs(reverseComplementLocation - motifLocation) >= len(motif):
+                            # make sure there are no letters shared between the motifs; every pairing is seen
+                            # from both of its motifs, so it is only kept from the one on the left
+                            if reverseComplementLocation - motifLocation >= length:
 
-                                # depending on what we want to report, add different things to the inverted repeats set
+                                # depending on what we want to report, add different things to the inverted repeats
                                 if type == 'pairings':
-
-                                    # construct a unique identifier for each motif and its reverse complement along with the starting locations
-                                    # this is to avoid counting the same thing multiple times
-                                    if motifLocation < reverseComplementLocation:
-                                        identifier = motif + '_' + reverseComplement + '_' + str(motifLocation) + '_' + str(reverseComplementLocation)
-                                    elif reverseComplementLocation < motifLocation:
-                                        identifier = reverseComplement + '_' + motif + '_' + str(reverseComplementLocation) + '_' + str(motifLocation)
-                                    else:
-                                        identifier = None
-
-                                    # add the identifier to the set of potential inverted repeats
-                                    # the data structure is a set so if the identifer is already in the set, it will not be added again
-                                    if identifier is not None:
-                                        invertedRepeats.add(identifier)
+                                    invertedRepeats.add(motifLocation * keyBase + reverseComplementLocation)
 
                                 elif type == 'nucleotides':
 
-                                    # get the locations of the nucleotides that make up this invertedRepeat
-                                    motifSpace = set(range(motifLocation, motifLocation + len(motif)))
-                                    reverseComplementSpace = set(range(reverseComplementLocation, reverseComplementLocation + len(reverseComplement)))
+                                    # flag the locations of the nucleotides that make up this inverted repeat
+                                    covered[motifLocation:motifLocation + length] = stem
+                                    covered[reverseComplementLocation:reverseComplementLocation + length] = stem
 
-                                    # add them to the set
-                                    invertedRepeats.update(motifSpace)
-                                    invertedRepeats.update(reverseComplementSpace)                                    
+            if type == 'nucleotides':
+                invertedRepeats = set(location for location in xrange(1, keyBase) if covered[location])
 
-            # get the length of the motif
-            key = len(motif)
+            INSTRUMENT.peak('getInvertedRepeats.set', len(invertedRepeats))
 
-            # if we've already begun counting IRs of length 2 * key
-            if key in irs:
-                # union the exisiting set with the generated set of inverted repeats
-                irs[key] = irs[key].union(invertedRepeats)
-            # otherwise
-            else:
-                # initialize and empty set
-                irs[key] = set()
+            irs[length] = invertedRepeats
 
         return irs
     #-----------------------------------------------------------------------------------------------------------------#
 
 
+    #-----------------------------------------------------------------------------------------------------------------#
+    def getInvertedRepeatCoverage(self, min, max, mismatches):
+        """
+        ==============================================================================================
+        SUMMARY: Finds the bases covered by potential inverted repeats of stem-length min to max (inclusive)
+        PRE: assigned(self.sequence), assigned(min), assigned(max), assigned(mismatches)
+        POST: Returns a dictionary with the key as the stem-length of the IR and the value as a bytearray of
+              len(self) + 1 flags: flag i is 1 if base i (1-based) is part of an IR of that stem-length
+        ==============================================================================================
+        """
+
+        # no pairing is listed, so memory stays proportional to the sequence however repetitive it is
+        return IR.countInvertedRepeatsByMismatches(self.kmerCodes(min, max), len(self), min, max, [mismatches], 'coverage')[mismatches]
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    def getHairpins(self, min, max, mismatches, minLoop, maxLoop):
+        """
+        ==============================================================================================
+        SUMMARY: Finds potential hairpins of stem-length min to max (inclusive) with a loop of minLoop to maxLoop bases
+        PRE: assigned(self.sequence), assigned(min), assigned(max), assigned(mismatches), assigned(minLoop),
+             assigned(maxLoop)
+        POST: Returns a list of (starting location of the first stem (1-based), loop length, stem-length,
+              mismatches) tuples, one per hairpin, sorted by start, stem-length and loop length; raises
+              ValueError unless 1 <= min <= max and 0 <= minLoop <= maxLoop
+        ==============================================================================================
+        """
+
+        IR.checkHairpinBounds(min, max, minLoop, maxLoop)
+
+        # only stems a bounded distance apart can form a hairpin, so the pairs are found in one pass with
+        # a window of the stems that end minLoop to maxLoop bases back
+        codes = self.kmerCodes(min, max)
+
+        return IR.unpackHairpins(IR.findHairpins(codes, min, max, mismatches, minLoop, maxLoop))
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
     #-----------------------------------------------------------------------------------------------------------------#
     def countMotifs(self, min, max, relativePercentages=False):
         """
         ==============================================================================================
         SUMMARY: Counts the number of motifs of length min to length max (inclusive)
         PRE: assigned(self.sequence), assigned(min), assigned(max), optional(relativePercentages)
-        POST: Returns a dictionary with the key as the length of the motif and the value as the number
-               of motifs of that length
+        POST: Returns a dictionary with the key as the motif and the value as the number of times
+              the motif occurs
         ==============================================================================================
         """
 
-        # initialize a blank dictionary to hold motif counts
-        motifCounts = {}
+        # a sequence counted before (in this run or an earlier one) is not counted again
+        cache       = resultCache.getCache()
+        motifCounts = cache.get('countMotifs', (min, max), self.sequence)
 
-        # get the motifs from min to max
-        motifs = self.motifs(min, max)
+        if motifCounts is None:
+            motifCounts = self.countMotifsUncached(min, max)
+            cache.put('countMotifs', (min, max), self.sequence, motifCounts)
 
-        # for each motif in motifs
-        for motif in motifs:
+        # copy the counts so the cached ones are not changed
+        motifCounts = dict(motifCounts)
 
-            # the number of motifs "motif" is the length of the list stored in motifs[motif]
-            motifCounts[motif] = len(motifs[motif])
+        # if we want relative percentages
+        if relativePercentages == True:
 
-            # if we want relative percentages
-            if relativePercentages == True:
+            for motif in motifCounts:
                 # divide the count by the length of the sequence
                 motifCounts[motif] = float(motifCounts[motif]) / len(self.sequence)
 
@@ -279,71 +437,160 @@ class Sequence(object):
 
 
     #-----------------------------------------------------------------------------------------------------------------#
+    def countMotifsUncached(self, min, max):
+        """
+        ==============================================================================================
+        SUMMARY: Counts the number of motifs of length min to length max (inclusive) without the result cache
+        PRE: assigned(self.sequence), assigned(min), assigned(max)
+        POST: Returns a dictionary with the key as the motif and the value as the number of times
+              the motif occurs
+        ==============================================================================================
+        """
+
+        # initialize a blank dictionary to hold motif counts
+        motifCounts = {}
+
+        # for each length from min to max
+        for length in xrange(min, max + 1):
+
+            # count the motifs of this length in an array indexed by their 2-bit code
+            counts = KMER.countKmers(self.sequence, length)
+
+            # only the motifs that occur are added to the dictionary
+            for code in xrange(len(counts)):
+
+                if counts[code] == 0:
+                    continue
+
+                motif = KMER.decodeKmer(code, length)
+                motifCounts[motif] = counts[code]
+
+        return motifCounts
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    @INSTRUMENT.timed('sequence.countInvertedRepeats', bases=INSTRUMENT.sequenceLength)
     def countInvertedRepeats(self, min, max, mismatches, relativePercentages=False, type='pairings'):
         """
         ==============================================================================================
         SUMMARY: Counts the number of potential inverted repeats from stem-length min to length max (inclusive)
         PRE: assigned(self.sequence), assigned(min), assigned(max), assigned(mismatches), optional(relativePercentages), optional(type)
         POST: Returns a dictionary with the key as the length of the stem and the value as the number
-               of IRs of that stem-length
+               of IRs of that stem-length ('pairings') or of bases covered by them ('nucleotides'); the
+               flags of the covered bases are returned by getInvertedRepeatCoverage instead
         ==============================================================================================
         """
 
-        # get the inverted repeats from min to max with mismatches of type
-        irIdentifiers = self.getInvertedRepeats(min, max, mismatches, type)
+        # the flags of type 'coverage' are as long as the sequence, so they are not counts to cache
+        if type == 'coverage':
+            raise ValueError("Type 'coverage' is not a count; use getInvertedRepeatCoverage for the covered bases")
+
+        # count the inverted repeats from min to max with mismatches of type without building them
+        # (the counts are the sizes of the sets returned by getInvertedRepeats); a sequence counted before
+        # with the same parameters is looked up in the result cache instead
+        cache       = resultCache.getCache()
+        parameters  = (min, max, mismatches, type)
+        countsOfIRs = cache.get('countInvertedRepeats', parameters, self.sequence)
 
-        # initialize a blank dictionary to hold the counts
-        countsOfIRs = {}
+        if countsOfIRs is None:
+            codes = self.kmerCodes(min, max)
+            countsOfIRs = IR.countInvertedRepeats(codes, len(self.sequence), min, max, mismatches, type)
+            cache.put('countInvertedRepeats', parameters, self.sequence, countsOfIRs)
 
-        # for each key in the inverted repeats
-        for key in irIdentifiers:
+        # copy the counts so the cached ones are not changed
+        countsOfIRs = dict(countsOfIRs)
 
-            # the number of IRs of that key is the length of the list stored in irIdentifiers[key]
-            countsOfIRs[key] = len(irIdentifiers[key])
+        # if we want relative percentages
+        if relativePercentages == True:
 
-            # if we want relative percentages
-            if relativePercentages == True:
+            # for each key in the inverted repeats
+            for key in countsOfIRs:
                 # divide the count by the length of the sequence
                 countsOfIRs[key] = float(countsOfIRs[key]) / len(self.sequence)
 
-        # add 0's to the dictionary for any inverted repeat that does not appear
-        for i in xrange(min, max+1):
-            if i not in countsOfIRs:
-                countsOfIRs[i] = 0
+        return countsOfIRs
+    #-----------------------------------------------------------------------------------------------------------------#
+
+
+    #-----------------------------------------------------------------------------------------------------------------#
+    @INSTRUMENT.timed('sequence.countInvertedRepeatsByMismatches', bases=INSTRUMENT.sequenceLength)
+    def countInvertedRepeatsByMismatches(self, min, max, mismatchLevels, relativePercentages=False, type='pairings'):
+        """
+        ==============================================================================================
+        SUMMARY: Counts the number of potential inverted repeats from stem-length min to max (inclusive) for
+                 several numbers of mismatches at once
+        PRE: assigned(self.sequence), assigned(min), assigned(max), assigned(mismatchLevels), optional(relativePercentages),
+             optional(type)
+        POST: Returns a dictionary with each number of mismatches as the key and the dictionary returned by
+              countInvertedRepeats for that number of mismatches as the value (type 'coverage' is not
+              accepted, as for countInvertedRepeats)
+        ==============================================================================================
+        """
+
+        if type == 'coverage':
+            raise ValueError("Type 'coverage' is not a count; use getInvertedRepeatCoverage for the covered bases")
+
+        # the motifs are encoded and their partners found once for every number of mismatches, instead
+        # of once per call to countInvertedRepeats
+        cache       = resultCache.getCache()
+        parameters  = (min, max, tuple(sorted(set(mismatchLevels))), type)
+        countsOfIRs = cache.get('countInvertedRepeatsByMismatches', parameters, self.sequence)
+
+        if countsOfIRs is None:
+            countsOfIRs = IR.countInvertedRepeatsByMismatches(self.kmerCodes(min, max), len(self.sequence), min, max, mismatchLevels, type)
+            cache.put('countInvertedRepeatsByMismatches', parameters, self.sequence, countsOfIRs)
+
+        # copy the counts so the cached ones are not changed
+        countsOfIRs = dict((mismatches, dict(countsOfIRs[mismatches])) for mismatches in countsOfIRs)
+
+        # if we want relative percentages, divide each count by the length of the sequence
+        if relativePercentages == True:
+            for mismatches in countsOfIRs:
+                for key in countsOfIRs[mismatches]:
+                    countsOfIRs[mismatches][key] = float(countsOfIRs[mismatches][key]) / len(self.sequence)
 
         return countsOfIRs
     #-----------------------------------------------------------------------------------------------------------------#
 
 
     #-----------------------------------------------------------------------------------------------------------------#
-    def shuffle(self):
+    def shuffle(self, seed=None, dinucleotide=False):
         """
         ==============================================================================================
         SUMMARY: Shuffles the sequence
-        PRE: assigned(self.sequence)
-        POST: Returns a new sequence with the shuffled version of this sequence
+        PRE: assigned(self.sequence), optional(seed), optional(dinucleotide)
+        POST: Returns a new sequence with the shuffled version of this sequence (the same for the same
+              seed); if dinucleotide is True, the pairs of neighboring bases are kept as well
         ==============================================================================================
         """
 
-        # convert the sequence to a list of characters
-        listOfChars = list(self.sequence)
+        shuffledSequence = SHUFFLE.shuffleReplicates(self.sequence, 1, seed, dinucleotide)[0]
 
-        # seed random
-        random.seed()
+        return Sequence(shuffledSequence)
+    #-----------------------------------------------------------------------------------------------------------------#
 
-        # for i from len(listOfCharacters) - 1 down to 0
-        for i in range(len(listOfChars) - 1, 0, -1):
 
-            # generate a random integer from 0 to i
-            j = random.randint(0, i)
+    #-----------------------------------------------------------------------------------------------------------------#
+    def testInvertedRepeats(self, min, max, mismatches, replicates=100, seed=None, dinucleotide=False, type='pairings'):
+        """
+        ==============================================================================================
+        SUMMARY: Tests whether the sequence has more potential inverted repeats than shuffles of it
+        PRE: assigned(self.sequence), assigned(min), assigned(max), assigned(mismatches), optional(replicates),
+             optional(seed), optional(dinucleotide), optional(type)
+        POST: Returns a dictionary with the stem-length as the key and a tuple of the observed count,
+              the z-score and the empirical p-value against replicates shuffles as the value
+        ==============================================================================================
+        """
 
-            # swap the ith and jth characters in listOfChars
-            temp = listOfChars[j]
-            listOfChars[j] = listOfChars[i]
-            listOfChars[i] = temp
+        observed   = self.countInvertedRepeats(min, max, mismatches, type=type)
+        nullCounts = SHUFFLE.nullInvertedRepeatCounts(self.sequence, min, max, mismatches, replicates, seed, dinucleotide, type)
 
-        # convert the list back to a string
-        shuffledSequence = ''.join(listOfChars)
+        results = {}
 
-        return Sequence(shuffledSequence)
+        for length in observed:
+            zScore, pValue  = SHUFFLE.significance(observed[length], nullCounts[length])
+            results[length] = (observed[length], zScore, pValue)
+
+        return results
     #-----------------------------------------------------------------------------------------------------------------#
@@ -0,0 +1,224 @@
+"""
+-----------------------------------------------------------------------------------------------------------------
+shuffleFunctions.py
+Programmer: Chris DeMolles
+
+Tested with Python 2.7.3
+
+This module builds a null model for motif and inverted repeat counts by shuffling sequences. Every function takes
+a seed, so the same seed always gives the same replicates.
+
+A mononucleotide shuffle keeps the number of each base. When numpy is installed, all the replicates of a sequence
+are made in one vectorized call (one random permutation per row of a matrix); otherwise each one is shuffled in turn.
+
+A dinucleotide shuffle (Altschul and Erickson, 1985) also keeps the number of each pair of neighboring bases, and the
+first and last base. It is done as in Kandel et al. (1996): the pairs are the edges of a graph on the bases, the last
+edge out of every base is picked so that the last edges form a random tree into the last base, the other edges are
+put in a random order, and the edges are walked from the first base (a random Eulerian path).
+
+The replicates are strings, which are counted straight away by kmerFunctions and irFunctions; no Sequence object is
+made for them. significance compares an observed count to the counts of the replicates.
+-----------------------------------------------------------------------------------------------------------------
+"""
+
+import math, random
+import irFunctions as IR
+import kmerFunctions as KMER
+
+# numpy is only needed to make many replicates at once
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# largest number of random numbers drawn at once when making replicates with numpy
+MAX_BATCH = 1 << 24
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def shuffleReplicates(sequence, replicates=1, seed=None, dinucleotide=False):
+    """
+    ==============================================================================================
+    SUMMARY: Makes shuffled replicates of a sequence
+    PRE: assigned(sequence), optional(replicates), optional(seed), optional(dinucleotide)
+    POST: Returns a list of replicates strings, each a shuffle of sequence that keeps its bases
+          (and, if dinucleotide is True, its pairs of neighboring bases)
+    ==============================================================================================
+    """
+
+    sequence = str(sequence)
+
+    if dinucleotide:
+
+        generator = random.Random(seed)
+
+        return [dinucleotideShuffle(sequence, generator) for i in xrange(replicates)]
+
+    if numpy is None:
+
+        generator = random.Random(seed)
+        shuffled  = []
+
+        for i in xrange(replicates):
+            bases = list(sequence)
+            generator.shuffle(bases)
+            shuffled.append(''.join(bases))
+
+        return shuffled
+
+    generator = numpy.random.RandomState(seed)
+    bases     = numpy.frombuffer(sequence, dtype=numpy.uint8)
+    shuffled  = []
+
+    # sorting a row of random numbers gives a random permutation of the row; the rows are made in
+    # batches so the matrix stays a reasonable size
+    batch = max(1, MAX_BATCH // max(1, len(sequence)))
+
+    for first in xrange(0, replicates, batch):
+
+        rows         = min(batch, replicates - first)
+        permutations = numpy.argsort(generator.random_sample((rows, len(sequence))), axis=1)
+
+        for row in bases[permutations]:
+            shuffled.append(row.tostring())
+
+    return shuffled
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def dinucleotideShuffle(sequence, generator):
+    """
+    ==============================================================================================
+    SUMMARY: Shuffles a sequence while keeping the number of each pair of neighboring bases
+    PRE: assigned(sequence) (a string), assigned(generator) (a random.Random)
+    POST: Returns a string with the same first and last base and the same pairs of neighboring
+          bases as sequence, chosen uniformly from all such strings
+    ==============================================================================================
+    """
+
+    if len(sequence) < 3:
+        return sequence
+
+    # the edges out of every base, in the order of the sequence
+    edges = {}
+
+    for i in xrange(len(sequence) - 1):
+        edges.setdefault(sequence[i], []).append(sequence[i + 1])
+
+    last = sequence[-1]
+
+    # pick the last edge out of every other base with a loop-erased random walk into the tree
+    # (Wilson's algorithm); the walk only ever moves along edges of the sequence
+    inTree   = set([last])
+    lastEdge = {}
+
+    for base in edges:
+
+        current = base
+
+        while current not in inTree:
+            lastEdge[current] = generator.randrange(len(edges[current]))
+            current           = edges[current][lastEdge[current]]
+
+        current = base
+
+        while current not in inTree:
+            inTree.add(current)
+            current = edges[current][lastEdge[current]]
+
+    # put the other edges out of every base in a random order, followed by its last edge
+    for base in edges:
+
+        baseEdges = edges[base]
+
+        if base in lastEdge:
+            final = baseEdges.pop(lastEdge[base])
+            generator.shuffle(baseEdges)
+            baseEdges.append(final)
+        else:
+            generator.shuffle(baseEdges)
+
+        # the edges are taken from the end of the list
+        baseEdges.reverse()
+
+    # walk the edges from the first base
+    shuffled = [sequence[0]]
+    current  = sequence[0]
+
+    for i in xrange(len(sequence) - 1):
+        current = edges[current].pop()
+        shuffled.append(current)
+
+    return ''.join(shuffled)
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def nullMotifCounts(sequence, k, replicates, seed=None, dinucleotide=False):
+    """
+    ==============================================================================================
+    SUMMARY: Counts the motifs of length k in shuffled replicates of a sequence
+    PRE: assigned(sequence), assigned(k), assigned(replicates), optional(seed), optional(dinucleotide)
+    POST: Returns the counts of KMER.countKmersBatch for the replicates, one row per replicate
+    ==============================================================================================
+    """
+
+    return KMER.countKmersBatch(shuffleReplicates(sequence, replicates, seed, dinucleotide), k)
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def nullInvertedRepeatCounts(sequence, min, max, mismatches, replicates, seed=None, dinucleotide=False, type='pairings'):
+    """
+    ==============================================================================================
+    SUMMARY: Counts the potential inverted repeats in shuffled replicates of a sequence
+    PRE: assigned(sequence), assigned(min), assigned(max), assigned(mismatches), assigned(replicates),
+         optional(seed), optional(dinucleotide), optional(type)
+    POST: Returns a dictionary with the stem-length as the key and a list of the count for each
+          replicate as the value
+    ==============================================================================================
+    """
+
+    nullCounts = dict((length, []) for length in xrange(min, max + 1))
+
+    for replicate in shuffleReplicates(sequence, replicates, seed, dinucleotide):
+
+        codes  = dict((length, KMER.encodeKmers(replicate, length)) for length in nullCounts)
+        counts = IR.countInvertedRepeats(codes, len(replicate), min, max, mismatches, type)
+
+        for length in nullCounts:
+            nullCounts[length].append(counts[length])
+
+    return nullCounts
+#-----------------------------------------------------------------------------------------------------------------#
+
+
+#-----------------------------------------------------------------------------------------------------------------#
+def significance(observed, nullCounts):
+    """
+    ==============================================================================================
+    SUMMARY: Compares an observed count to the counts of shuffled replicates
+    PRE: assigned(observed), assigned(nullCounts) (a list of counts, one per replicate)
+    POST: Returns the z-score of observed (None if the replicates do not vary) and the empirical
+          p-value of a count at least as large as observed, (1 + number at least as large) / (1 + replicates)
+    ==============================================================================================
+    """
+
+    replicates = len(nullCounts)
+
+    if replicates == 0:
+        return None, 1.0
+
+    mean     = float(sum(nullCounts)) / replicates
+    variance = sum((count - mean) ** 2 for count in nullCounts) / max(1, replicates - 1)
+
+    if variance > 0:
+        zScore = (observed - mean) / math.sqrt(variance)
+    else:
+        zScore = None
+
+    atLeast = sum(1 for count in nullCounts if count >= observed)
+
+    return zScore, float(1 + atLeast) / (1 + replicates)
+#-----------------------------------------------------------------------------------------------------------------#